@@ -2,113 +2,376 @@
 from typing import Tuple, List, Optional
 from grid import GridWorld, DynamicObstacle
 import search
+import hierarchy
+import heuristics
 import time
 import copy
+import json
+from collections import OrderedDict
 
 Pos = Tuple[int,int]
 
+class RouteCache:
+    """
+    Bounded LRU cache of planned routes. Keys hold the grid's uid plus the query and planner
+    settings; before every lookup the cache replays the grid's change log and drops only the
+    entries a change can affect:
+      - a new obstacle evicts routes that visit one of its (cell, time) pairs;
+      - a terrain change evicts routes through that cell, and if it made the cell cheaper or
+        passable, also failed queries and routes whose cost could beat the cached one via it.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._synced = {}  # grid uid -> last seen grid.version
+
+    def get(self, grid: GridWorld, key):
+        self.sync(grid)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry["path"]
+
+    def put(self, grid: GridWorld, key, path: List[Pos], start_time: int):
+        self.sync(grid)
+        self.entries[key] = {
+            "path": path,
+            "timed": {(p, start_time + i) for i, p in enumerate(path)},
+            "cells": set(path),
+            "cost": sum(grid.cost(p) for p in path[1:]),
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def sync(self, grid: GridWorld):
+        last = self._synced.get(grid.uid)
+        self._synced[grid.uid] = grid.version
+        if last is None or last == grid.version:
+            return
+        changes = grid.changes_since(last)
+        if changes is None:
+            self._evict(lambda key, entry: key[0] == grid.uid)
+            return
+        for ch in changes:
+            if ch.kind == "obstacle" and ch.cells is None:
+                # periodic obstacle: its (pos, t) pairs never end, so ask it about each route instead
+                at = ch.obstacle.position_at
+                self._evict(lambda key, entry: key[0] == grid.uid and any(at(t) == p for p, t in entry["timed"]))
+            elif ch.kind == "obstacle":
+                occupied = set(ch.cells)
+                self._evict(lambda key, entry: key[0] == grid.uid and not entry["timed"].isdisjoint(occupied))
+            else:
+                self._evict(lambda key, entry: key[0] == grid.uid and self._terrain_affects(key, entry, ch))
+
+    @staticmethod
+    def _terrain_affects(key, entry, change) -> bool:
+        if not entry["cells"].isdisjoint(change.cells):
+            return True
+        if not change.relaxed:
+            return False
+        if not entry["path"]:
+            return True
+        _, start, goal = key[:3]
+        # every step costs at least 1, so a detour through the changed region costs at least its
+        # step count: per axis |a - b| plus twice the gap between the region and the span [a, b]
+        r0, c0, r1, c1 = change.region
+        steps = 0
+        for a, b, lo, hi in ((start[0], goal[0], r0, r1), (start[1], goal[1], c0, c1)):
+            steps += abs(a - b) + 2 * max(0, lo - max(a, b), min(a, b) - hi)
+        return steps < entry["cost"]
+
+    def _evict(self, predicate):
+        stale = [k for k, e in self.entries.items() if predicate(k, e)]
+        for k in stale:
+            del self.entries[k]
+        self.invalidations += len(stale)
+
 class DeliveryAgent:
-    def __init__(self, grid: GridWorld, algo: str = "astar", replanner: str = "hill", planning_horizon: int = 200):
+    def __init__(self, grid: GridWorld, algo: str = "astar", replanner: str = "repair", planning_horizon: int = 200,
+                 compiled: bool = False, heuristic: str = "manhattan", cache_size: int = 0,
+                 cluster_size: int = 16, profile: bool = False, epsilon: float = 1.5, time_budget: float = None,
+                 repair_radius: int = 4, landmarks: int = 8):
         """
-        algo: 'bfs', 'ucs', 'astar'
-        replanner: 'hill' (greedy hill-climb) used when unpredictable obstacle appears
+        algo: 'bfs', 'ucs', 'astar', 'compact' (memory-bounded A* with wait actions) or
+              'sipp' (safe-interval path planning: earliest-arrival paths over obstacle-free intervals) or
+              'hpa' (hierarchical planner with a JPS fast path; near-optimal, for large static maps) or
+              'wastar' (weighted A*, cost <= epsilon x optimal) or
+              'ara' (anytime ARA*: starts at epsilon and tightens toward optimal until time_budget runs out)
+        replanner: used when an unpredictable obstacle appears. 'repair' (time-aware detour within
+                   repair_radius of the agent that rejoins the current plan; see search.local_repair) or
+                   'dstar' (D* Lite that keeps its search across surprises and repairs it incrementally)
         planning_horizon: max future timesteps to consider when planning
+        compiled: run the planners on the array-backed CompiledGrid (same paths, faster on large maps)
+        heuristic: 'manhattan', 'scaled' (manhattan x cheapest terrain cost), 'alt' (landmark lower bounds,
+                   tables built once per grid), 'differential' (the same bounds computed per state) or
+                   'field' (exact cost-to-go from GridWorld.distance_field, cached per goal); see heuristics.py
+        cache_size: max routes kept in the LRU RouteCache (0 disables caching)
+        cluster_size: side of the square clusters used by the 'hpa' planner
+        profile: run the bfs/ucs/astar planners with hot-path instrumentation (SearchProfile);
+                 follow_and_replan then rolls it up into logs["profile"]
+        epsilon: heuristic weight for 'wastar', starting weight for 'ara'
+        time_budget: default seconds per plan() for the 'astar', 'wastar' and 'ara' searches (None: no limit)
+        repair_radius: half-width of the box the 'repair' replanner searches around the agent
+        landmarks: landmark count of the 'alt' and 'differential' heuristics
         """
+        if replanner not in ("repair", "dstar"):
+            raise ValueError("Unknown replanner")
         self.grid = grid
         self.algo = algo
         self.replanner = replanner
         self.planning_horizon = planning_horizon
+        self.compiled = compiled
+        self.heuristic = heuristic
+        self.cluster_size = cluster_size
+        self.profile = profile
+        self.epsilon = epsilon
+        self.time_budget = time_budget
+        self.repair_radius = repair_radius
+        self.landmarks = landmarks
+        self._dstar = None
+        self._hpa = None
+        self.cache = RouteCache(cache_size) if cache_size > 0 else None
 
-    def plan(self, start: Pos, goal: Pos, start_time: int = 0):
+    def plan(self, start: Pos, goal: Pos, start_time: int = 0, time_budget: float = None, partial: bool = False):
         """
         Plan using the selected algorithm in a time-aware manner.
         Returns path (list of positions) and search stats.
+        time_budget/partial: seconds the 'astar'/'wastar'/'ara' search may run (default: self.time_budget),
+        and whether astar then returns its best partial path instead of [] (see search.astar_time_aware);
+        ARA* always returns its best path so far. Other algos run to completion.
         """
+        if time_budget is None:
+            time_budget = self.time_budget
+        if self.cache is None:
+            return self._plan(start, goal, start_time, time_budget, partial)
+        key = (self.grid.uid, tuple(start), tuple(goal), start_time,
+               self.algo, self.planning_horizon, self.compiled, self.heuristic, self.epsilon, self.landmarks,
+               self.cluster_size)
+        t0 = time.perf_counter()
+        path = self.cache.get(self.grid, key)
+        if path is not None:
+            stats = search.SearchStats()
+            stats.time_taken = time.perf_counter() - t0
+            return list(path), stats
+        path, stats = self._plan(start, goal, start_time, time_budget, partial)
+        if not stats.timed_out:
+            self.cache.put(self.grid, key, list(path), start_time)
+        return path, stats
+
+    def _plan(self, start: Pos, goal: Pos, start_time: int = 0, time_budget: float = None, partial: bool = False):
+        if self.algo in ("wastar", "ara"):
+            h = self._heuristic_for(goal) or search.manhattan
+            if isinstance(h, search.FieldHeuristic):
+                h = h.exact  # the bounds below need an admissible h
+            if self.algo == "ara":
+                return search.ara_star(self.grid, start, goal, start_time, max_time=self.planning_horizon,
+                                       heuristic=h, epsilon=self.epsilon, time_budget=time_budget)
+            return search.astar_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon,
+                                           heuristic=h, profile=self.profile, time_budget=time_budget,
+                                           partial=partial, weight=self.epsilon)
+        if self.algo == "astar" and self.heuristic == "field":
+            return self._plan_with_field(start, goal, start_time, time_budget, partial)
+        if self.algo == "hpa":
+            return self._plan_hierarchical(start, goal, start_time)
+        if self.algo == "sipp":
+            return search.sipp(self.grid, start, goal, start_time, max_time=self.planning_horizon)
+        if self.algo == "compact":
+            h = self._heuristic_for(goal)
+            return search.astar_compact(self.grid, start, goal, start_time, max_time=self.planning_horizon,
+                                       h=h.flat if h else None)
+        if self.compiled:
+            planners = {"bfs": search.bfs_compiled, "ucs": search.ucs_compiled, "astar": search.astar_compiled}
+            if self.algo not in planners:
+                raise ValueError("Unknown algo")
+            if self.algo == "astar" and self.heuristic != "manhattan":
+                return search.astar_compiled(self.grid.compile(), start, goal, start_time,
+                                             max_time=self.planning_horizon, h=self._heuristic_for(goal).flat)
+            return planners[self.algo](self.grid.compile(), start, goal, start_time, max_time=self.planning_horizon)
         if self.algo == "bfs":
-            return search.bfs_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon)
+            return search.bfs_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon,
+                                         profile=self.profile)
         elif self.algo == "ucs":
-            return search.ucs_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon)
+            return search.ucs_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon,
+                                         profile=self.profile)
         elif self.algo == "astar":
-            return search.astar_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon)
+            return search.astar_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon,
+                                           heuristic=self._heuristic_for(goal) or search.manhattan,
+                                           profile=self.profile, time_budget=time_budget, partial=partial)
         else:
             raise ValueError("Unknown algo")
 
-    def follow_and_replan(self, start: Pos, goal: Pos, dynamic_unpredictable: bool = False, max_steps: int = 1000):
+    def _heuristic_for(self, goal: Pos):
+        """The configured heuristic for one goal (None for manhattan, the planners' default)."""
+        params = {"landmarks": self.landmarks} if self.heuristic in ("alt", "differential") else {}
+        return heuristics.for_goal(self.grid, self.heuristic, goal, **params)
+
+    def _plan_with_field(self, start: Pos, goal: Pos, start_time: int, time_budget: float = None,
+                         partial: bool = False):
+        h = search.FieldHeuristic(self.grid, goal)
+        if start_time > self.grid.reservations.horizon:
+            # no scheduled obstacles ahead: the optimal route is a table lookup
+            stats = search.SearchStats()
+            t0 = time.perf_counter()
+            path = search.follow_field(self.grid, h.field, start)
+            stats.time_taken = time.perf_counter() - t0
+            if len(path) - 1 <= self.planning_horizon + 1:
+                return path, stats
+        if self.compiled:
+            return search.astar_compiled(self.grid.compile(), start, goal, start_time,
+                                         max_time=self.planning_horizon, h=h.flat)
+        return search.astar_time_aware(self.grid, start, goal, start_time,
+                                       max_time=self.planning_horizon, heuristic=h, profile=self.profile,
+                                       time_budget=time_budget, partial=partial)
+
+    def _plan_hierarchical(self, start: Pos, goal: Pos, start_time: int):
+        if start_time > self.grid.reservations.horizon:
+            if self._hpa is None or self._hpa.grid is not self.grid or self._hpa.size != self.cluster_size:
+                self._hpa = hierarchy.HierarchicalPlanner(self.grid, self.cluster_size)
+            path, stats = self._hpa.plan(start, goal)
+            if len(path) - 1 <= self.planning_horizon + 1:
+                return path, stats
+        # scheduled obstacles ahead (or too long a route): the abstraction is static, fall back
+        return search.astar_time_aware(self.grid, start, goal, start_time, max_time=self.planning_horizon)
+
+    def _dstar_replan(self, current: Pos, goal: Pos, t: int):
+        """
+        Repairs the persistent D* Lite search: cells next to `current` that are occupied at t+1
+        become blocked, previously blocked cells that cleared are released.
+        """
+        if self._dstar is None or self._dstar.goal != goal:
+            self._dstar = search.DStarLite(self.grid, current, goal)
+        self._dstar.move_to(current)
+        blocked = {n for n in self.grid.neighbors(current) if self.grid.occupied_at(n, t+1)}
+        self._dstar.set_blocked(blocked)
+        return self._dstar.plan(current)
+
+    def follow_and_replan(self, start: Pos, goal: Pos, dynamic_unpredictable: bool = False, max_steps: int = 1000,
+                          surprises=None):
         """
         Simulate the agent executing the plan step-by-step. If the next cell is occupied unexpectedly,
         perform replanning with either time-aware planner (if deterministic schedule known) or local replanner.
-        Returns log dict with metrics and history.
+        surprises: optional generator of unpredictable obstacles (see simulation.SurpriseGenerator).
+        Returns log dict with metrics and history. For long runs use run() (or simulation.py), which
+        streams the same events without keeping them.
         """
+        hits0, misses0 = (self.cache.hits, self.cache.misses) if self.cache else (0, 0)
+        logs = self._follow(start, goal, dynamic_unpredictable, max_steps, surprises)
+        logs["cache_hits"] = self.cache.hits - hits0 if self.cache else 0
+        logs["cache_misses"] = self.cache.misses - misses0 if self.cache else 0
+        if self.profile:
+            logs["profile"] = rollup_profiles(logs["plans"])
+        return logs
+
+    def _follow(self, start: Pos, goal: Pos, dynamic_unpredictable: bool, max_steps: int, surprises=None):
         history = []
         logs = {
             "plans": [],
             "total_nodes_expanded": 0,
             "total_plan_time": 0.0,
             "final_path": [],
-            "success": False
+            "success": False,
+            "surprises": 0
         }
+        for ev in self.run(start, goal, dynamic_unpredictable, max_steps, surprises):
+            kind = ev["event"]
+            if kind == "step":
+                history.append(ev["pos"])
+            elif kind == "plan":
+                stats = ev["stats"]
+                logs["total_nodes_expanded"] += stats.nodes_expanded
+                logs["total_plan_time"] += stats.time_taken
+                # failed local attempts only count toward the totals
+                if ev["path"] or ev["source"] == "plan":
+                    logs["plans"].append({"time": ev["t"], "path": ev["path"], "stats": stats.as_dict()})
+            elif kind == "surprise":
+                logs["surprises"] += 1
+            elif kind == "end":
+                logs["success"] = ev["success"]
+        logs["final_path"] = history
+        return logs
 
+    def run(self, start: Pos, goal: Pos, dynamic_unpredictable: bool = False, max_steps: int = 1000,
+            surprises=None, start_time: int = 0):
+        """
+        The execution loop of follow_and_replan as a stream of event dicts, nothing retained:
+          {"event": "plan", "t", "path", "stats", "source": 'plan' | 'repair' | 'dstar'}
+              (a local replanner's failed attempt has path [])
+          {"event": "surprise", "t", "obstacle"}  an unpredictable obstacle just appeared
+          {"event": "step", "t", "pos"}           the agent is at pos at time t
+          {"event": "end", "t", "pos", "success"}
+        surprises: callable (grid, t, pos, next_pos) -> new DynamicObstacles, called before every
+        move; they are added to the grid and handled like dynamic_unpredictable obstacles.
+        """
+        unpredictable = dynamic_unpredictable or surprises is not None
         current = start
-        t = 0
+        t = start_time
         plan, stats = self.plan(current, goal, start_time=t)
-        logs["plans"].append({"time": t, "path": plan, "stats": stats.__dict__})
-        logs["total_nodes_expanded"] += stats.nodes_expanded
-        logs["total_plan_time"] += stats.time_taken
+        yield {"event": "plan", "t": t, "path": plan, "stats": stats, "source": "plan"}
 
         if not plan:
-            return logs
+            yield {"event": "end", "t": t, "pos": current, "success": False}
+            return
 
         # iterate following plan
         step_idx = 1  # next index to move to in plan
         for step in range(max_steps):
             # if reached goal
             if current == goal:
-                logs["success"] = True
-                logs["final_path"] = history[:]
-                return logs
+                break
 
             # if plan exhausted or next step mismatch, replan
             if step_idx >= len(plan):
                 # need to replan from current
                 plan, stats = self.plan(current, goal, start_time=t)
-                logs["plans"].append({"time": t, "path": plan, "stats": stats.__dict__})
-                logs["total_nodes_expanded"] += stats.nodes_expanded
-                logs["total_plan_time"] += stats.time_taken
+                yield {"event": "plan", "t": t, "path": plan, "stats": stats, "source": "plan"}
                 step_idx = 1
                 if not plan:
                     break
 
             next_pos = plan[step_idx]
+            if surprises is not None:
+                for obstacle in surprises(self.grid, t, current, next_pos):
+                    self.grid.add_dynamic_obstacle(obstacle)
+                    yield {"event": "surprise", "t": t, "obstacle": obstacle}
 
-            # If dynamic_unpredictable is True, a "surprise" obstacle may appear at the next cell at this time
-            if dynamic_unpredictable and self.grid.occupied_at(next_pos, t+1):
-                # unexpected block -> try local replanner (greedy hill climb)
-                local = []
-                if self.replanner == "hill":
-                    local = search.greedy_hill_climb(self.grid, current, goal)
-                # if local found a route, follow it (no time-awareness here)
-                if local:
+            # If unpredictable, a "surprise" obstacle may appear at the next cell at this time
+            if unpredictable and self.grid.occupied_at(next_pos, t+1):
+                # unexpected block -> try local replanner
+                if self.replanner == "repair":
+                    local, stats = search.local_repair(self.grid, plan, step_idx - 1, t, self.repair_radius)
+                elif self.replanner == "dstar":
+                    local, stats = self._dstar_replan(current, goal, t)
+                else:
+                    raise ValueError("Unknown replanner")
+                # if local found a route, follow it (D* Lite routes are not time-aware)
+                if len(local) > 1:
                     # adopt local route as new plan
                     plan = [current] + local[1:]
                     step_idx = 1
-                    logs["plans"].append({"time": t, "path": plan, "stats": {"nodes_expanded": 0, "time_taken": 0}})
+                    next_pos = plan[step_idx]
+                    yield {"event": "plan", "t": t, "path": plan, "stats": stats, "source": self.replanner}
                 else:
+                    yield {"event": "plan", "t": t, "path": [], "stats": stats, "source": self.replanner}
                     # fallback: try time-aware replanning (A*)
                     plan, stats = self.plan(current, goal, start_time=t)
-                    logs["plans"].append({"time": t, "path": plan, "stats": stats.__dict__})
-                    logs["total_nodes_expanded"] += stats.nodes_expanded
-                    logs["total_plan_time"] += stats.time_taken
+                    yield {"event": "plan", "t": t, "path": plan, "stats": stats, "source": "plan"}
                     step_idx = 1
                     if not plan:
                         break
+                    next_pos = plan[step_idx] if len(plan) > 1 else current
 
             # If deterministic schedule: just ensure cell isn't occupied at arrival
             if self.grid.occupied_at(next_pos, t+1):
                 # must replan now (should not happen if planner had correct schedule, but robust)
                 plan, stats = self.plan(current, goal, start_time=t)
-                logs["plans"].append({"time": t, "path": plan, "stats": stats.__dict__})
-                logs["total_nodes_expanded"] += stats.nodes_expanded
-                logs["total_plan_time"] += stats.time_taken
+                yield {"event": "plan", "t": t, "path": plan, "stats": stats, "source": "plan"}
                 step_idx = 1
                 if not plan:
                     break
@@ -116,11 +379,38 @@ class DeliveryAgent:
 
             # execute move
             current = next_pos
-            history.append(current)
             t += 1
             step_idx += 1
+            yield {"event": "step", "t": t, "pos": current}
 
-        # out of steps
-        logs["final_path"] = history
-        logs["success"] = (current == goal)
-        return logs
+        yield {"event": "end", "t": t, "pos": current, "success": current == goal}
+
+def rollup_profiles(plans) -> dict:
+    """Sums the SearchProfile counters and timings of all plans; peak_* fields take the max."""
+    total = {}
+    for p in plans:
+        for k, v in p["stats"].get("profile", {}).items():
+            total[k] = max(total.get(k, 0), v) if k.startswith("peak_") else total.get(k, 0) + v
+    return total
+
+def write_metrics(logs: dict, file_path: str, **labels):
+    """
+    Appends follow_and_replan logs to a JSON Lines file for a metrics pipeline: one flat record
+    per plan (kind="plan", profile fields as "profile.<name>") and one kind="run" summary.
+    labels (e.g. map="large", algo="astar") are copied into every record.
+    """
+    with open(file_path, "a") as f:
+        for i, p in enumerate(logs["plans"]):
+            record = dict(labels, kind="plan", index=i, time=p["time"], path_len=len(p["path"]))
+            for k, v in p["stats"].items():
+                if isinstance(v, dict):
+                    record.update({f"{k}.{name}": x for name, x in v.items()})
+                else:
+                    record[k] = v
+            f.write(json.dumps(record) + "\n")
+        summary = dict(labels, kind="run", success=bool(logs.get("success")), plans=len(logs["plans"]),
+                       path_len=len(logs.get("final_path", [])),
+                       total_nodes_expanded=logs["total_nodes_expanded"],
+                       total_plan_time=logs["total_plan_time"])
+        summary.update({f"profile.{k}": v for k, v in logs.get("profile", {}).items()})
+        f.write(json.dumps(summary) + "\n")
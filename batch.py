@@ -0,0 +1,66 @@
+# batch.py
+import os
+from multiprocessing import Pool, shared_memory
+from typing import Iterable, Iterator, List, Tuple
+import numpy as np
+from grid import GridWorld, DynamicObstacle
+from agent import DeliveryAgent
+
+Pos = Tuple[int, int]
+
+# per-process state set up once by _init_worker
+_worker = {}
+
+def _normalize(query) -> Tuple[Pos, Pos, int]:
+    start, goal = tuple(query[0]), tuple(query[1])
+    start_time = int(query[2]) if len(query) > 2 else 0
+    return start, goal, start_time
+
+def _init_worker(shm_name: str, shape, dtype: str, schedules, agent_kwargs):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    obstacles = [DynamicObstacle.from_json(o) for o in schedules]
+    grid = GridWorld(arr, obstacles, copy=False)
+    _worker["shm"] = shm  # keep the mapping alive for the life of the worker
+    _worker["agent"] = DeliveryAgent(grid, **agent_kwargs)
+
+def _plan_one(item):
+    idx, (start, goal, start_time) = item
+    path, stats = _worker["agent"].plan(start, goal, start_time)
+    return idx, path, stats
+
+def plan_batch(grid: GridWorld, queries: Iterable, algo: str = "astar", workers: int = None,
+               chunksize: int = None, **agent_kwargs) -> Iterator[Tuple[int, List[Pos], object]]:
+    """
+    Plans many (start, goal[, start_time]) queries against one grid and yields
+    (query index, path, stats) as each result finishes, in completion order.
+
+    The cost array is copied once into shared memory and mapped by every worker process, so
+    workers never unpickle the grid; obstacle schedules are sent once per worker at startup.
+    Extra keyword arguments (planning_horizon, compiled, heuristic, ...) go to DeliveryAgent.
+    workers=1 plans in the calling process.
+    """
+    items = [(i, _normalize(q)) for i, q in enumerate(queries)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) <= 1:
+        agent = DeliveryAgent(grid, algo=algo, **agent_kwargs)
+        for idx, (start, goal, start_time) in items:
+            path, stats = agent.plan(start, goal, start_time)
+            yield idx, path, stats
+        return
+
+    arr = np.ascontiguousarray(grid.grid)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    try:
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        schedules = [o.to_json() for o in grid.dynamic_obstacles]
+        kwargs = dict(agent_kwargs, algo=algo)
+        if chunksize is None:
+            chunksize = max(1, len(items) // (workers * 8))
+        with Pool(workers, initializer=_init_worker,
+                  initargs=(shm.name, arr.shape, arr.dtype.str, schedules, kwargs)) as pool:
+            for result in pool.imap_unordered(_plan_one, items, chunksize=chunksize):
+                yield result
+    finally:
+        shm.close()
+        shm.unlink()
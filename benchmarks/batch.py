@@ -0,0 +1,33 @@
+# benchmarks/batch.py
+# Throughput of plan_batch as the number of worker processes grows.
+# Run from the repo root: python -m benchmarks.batch --queries 10000 --workers 1 2 4 8
+import argparse
+import random
+import time
+from grid import GridWorld
+from batch import plan_batch
+
+def random_queries(grid: GridWorld, count: int, seed: int):
+    rng = random.Random(seed)
+    free = [(r, c) for r in range(grid.rows) for c in range(grid.cols) if grid.passable((r, c))]
+    return [(rng.choice(free), rng.choice(free)) for _ in range(count)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", default="maps/large.txt")
+    parser.add_argument("--algo", default="astar")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    grid = GridWorld.from_file(args.map)
+    queries = random_queries(grid, args.queries, args.seed)
+    base = None
+    for w in args.workers:
+        t0 = time.perf_counter()
+        solved = sum(1 for _, path, _ in plan_batch(grid, queries, args.algo, workers=w) if path)
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        print(f"workers={w:<3} {elapsed:8.3f}s  {len(queries) / elapsed:10.1f} queries/s  "
+              f"scaling {base / elapsed:5.2f}x  solved {solved}/{len(queries)}")
@@ -0,0 +1,50 @@
+# benchmarks/compiled.py
+# Dict-based planners vs the array-backed *_compiled planners on a large seeded grid.
+# Run from the repo root: python -m benchmarks.compiled --size 500
+import argparse
+import time
+import numpy as np
+from grid import GridWorld
+import search
+
+def random_grid(size: int, density: float, seed: int):
+    rng = np.random.default_rng(seed)
+    grid = np.ones((size, size), dtype=int)
+    grid[rng.random((size, size)) < 0.05] = 3
+    grid[rng.random((size, size)) < density] = -1
+    grid[0, 0] = grid[-1, -1] = 1
+    return grid
+
+def best_of(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    gw = GridWorld(random_grid(args.size, args.density, args.seed))
+    t0 = time.perf_counter()
+    cg = gw.compile()
+    print(f"compile: {time.perf_counter() - t0:.3f}s for {cg.n} cells")
+    goal = (args.size - 1, args.size - 1)
+    horizon = 4 * args.size
+    # time-expanded UCS/BFS blow up over long horizons, so they get a shorter query
+    near = (args.size // 5, args.size // 5)
+    cases = [
+        ("astar", search.astar_time_aware, search.astar_compiled, goal),
+        ("ucs", search.ucs_time_aware, search.ucs_compiled, near),
+    ]
+    for name, plain, compiled, target in cases:
+        t_plain, (p1, s1) = best_of(lambda: plain(gw, (0, 0), target, 0, horizon), args.repeats)
+        t_comp, (p2, s2) = best_of(lambda: compiled(cg, (0, 0), target, 0, horizon), args.repeats)
+        print(f"{name:>6}: dict {t_plain:.3f}s  compiled {t_comp:.3f}s  speedup {t_plain / t_comp:.1f}x  "
+              f"nodes {s1.nodes_expanded}/{s2.nodes_expanded}  same path: {p1 == p2}")
@@ -0,0 +1,43 @@
+# benchmarks/fleet.py
+# Cooperative planning of a whole fleet within one time budget: agents routed, failed (no path,
+# parked at their start) and skipped (budget ran out), wall time, nodes and a conflict check.
+# Run from the repo root: python -m benchmarks.fleet --agents 100 200 300 --budget 5
+import argparse
+import random
+from grid import GridWorld
+from multiagent import AgentTask, CooperativePlanner, find_conflicts
+from benchmarks.compiled import random_grid
+
+def random_tasks(grid: GridWorld, count: int, seed: int):
+    """count agents with distinct random free starts and distinct random free goals."""
+    rng = random.Random(seed)
+    free = [(int(r), int(c)) for r, c in zip(*(grid.grid != -1).nonzero())]
+    count = min(count, len(free))
+    return [AgentTask(f"a{i}", s, g) for i, (s, g) in enumerate(zip(rng.sample(free, count), rng.sample(free, count)))]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--maps", nargs="+", default=["maps/large.txt", "random:64", "random:128"],
+                        help="map files or random:<size>")
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 200, 300])
+    parser.add_argument("--budget", type=float, default=5.0, help="seconds per planning round")
+    parser.add_argument("--order", default="distance", choices=["distance", "traffic", "priority", "given"])
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'map':>16} {'agents':>7} {'routed':>7} {'failed':>7} {'skipped':>8} {'time s':>7} "
+          f"{'nodes':>9} {'conflicts':>10}")
+    for name in args.maps:
+        if name.startswith("random:"):
+            gw = GridWorld(random_grid(int(name.split(":")[1]), args.density, args.seed))
+        else:
+            gw = GridWorld.from_file(name)
+        for count in args.agents:
+            tasks = random_tasks(gw, count, args.seed)
+            planner = CooperativePlanner(gw, time_budget=args.budget, order=args.order)
+            paths, stats = planner.plan(tasks)
+            failed, skipped = len(planner.failed), len(planner.skipped)
+            conflicts = len(find_conflicts(paths))
+            print(f"{name:>16} {len(tasks):>7} {len(tasks) - failed - skipped:>7} {failed:>7} {skipped:>8} "
+                  f"{stats.time_taken:>7.2f} {stats.nodes_expanded:>9} {conflicts:>10}", flush=True)
@@ -0,0 +1,62 @@
+# benchmarks/heuristics.py
+# A* with each heuristic on a seeded map whose cheapest terrain costs more than 1 (plus a few
+# high-cost regions), over many random queries: one-time table build, nodes expanded and time.
+# Run from the repo root: python -m benchmarks.heuristics --size 120 --queries 20
+import argparse
+import time
+import numpy as np
+from grid import GridWorld
+import heuristics
+import search
+
+def terrain_map(size: int, density: float, seed: int, base: int = 2):
+    """Terrain costs base..base+3 with a few square high-cost regions (cost 9) and random walls."""
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(base, base + 4, size=(size, size))
+    for _ in range(max(1, size // 20)):
+        r, c = rng.integers(0, size, 2)
+        k = int(rng.integers(size // 10, size // 4 + 1))
+        grid[r:r + k, c:c + k] = 9
+    grid[rng.random((size, size)) < density] = -1
+    return grid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=120)
+    parser.add_argument("--density", type=float, default=0.15)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--landmarks", type=int, default=8)
+    parser.add_argument("--compiled", action="store_true", help="astar_compiled with flat tables instead of astar_time_aware")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    gw = GridWorld(terrain_map(args.size, args.density, args.seed))
+    rng = np.random.default_rng(args.seed + 1)
+    free = np.argwhere(gw.grid != -1)
+    queries = []
+    while len(queries) < args.queries:
+        s, g = (tuple(int(v) for v in free[i]) for i in rng.choice(len(free), 2, replace=False))
+        if np.isfinite(gw.distance_field(g)[s]):
+            queries.append((s, g))
+    horizon = 4 * args.size
+    gw._distance_fields.clear()  # the field rows below pay for their own fields
+
+    print(f"{'heuristic':>13} {'build ms':>9} {'nodes':>9} {'ms/query':>9} {'cost':>8}")
+    for kind in ("manhattan", "scaled", "alt", "differential", "field"):
+        params = {"landmarks": args.landmarks} if kind in ("alt", "differential") else {}
+        t0 = time.perf_counter()
+        if kind in heuristics.KINDS:
+            heuristics.get(gw, kind, **params)
+        build = time.perf_counter() - t0
+        nodes = cost = 0
+        t0 = time.perf_counter()
+        for s, g in queries:
+            h = heuristics.for_goal(gw, kind, g, **params)
+            if args.compiled:
+                path, stats = search.astar_compiled(gw.compile(), s, g, max_time=horizon, h=h.flat if h else None)
+            else:
+                path, stats = search.astar_time_aware(gw, s, g, max_time=horizon, heuristic=h or search.manhattan)
+            nodes += stats.nodes_expanded
+            cost += sum(gw.cost(p) for p in path[1:])
+        elapsed = time.perf_counter() - t0
+        print(f"{kind:>13} {1000 * build:>9.1f} {nodes:>9} {1000 * elapsed / len(queries):>9.2f} {cost:>8}")
@@ -0,0 +1,54 @@
+# benchmarks/hierarchy.py
+# Query latency of flat A*, JPS and the hierarchical planner on growing uniform-cost maps.
+# Build time (HPA abstraction + jump tables) is reported separately: it is paid once per map,
+# and edits only rebuild the clusters around them.
+# Run from the repo root: python -m benchmarks.hierarchy --sizes 128 256 512
+import argparse
+import random
+import time
+from grid import GridWorld
+import hierarchy
+from benchmarks.compiled import random_grid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--cluster", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'build s':>8} {'astar ms':>9} {'jps ms':>8} {'hpa ms':>8} "
+          f"{'astar nodes':>12} {'jps nodes':>10} {'hpa nodes':>10} {'hpa/opt cost':>13}")
+    for size in args.sizes:
+        base = random_grid(size, args.density, args.seed)
+        base[base > 1] = 1
+        gw = GridWorld(base)
+        rng = random.Random(args.seed)
+        free = [(int(r), int(c)) for r, c in zip(*(base != -1).nonzero())]
+        t0 = time.perf_counter()
+        hpa = hierarchy.HierarchicalPlanner(gw, args.cluster)
+        tables = hierarchy.JumpTables(gw)
+        build = time.perf_counter() - t0
+        totals = {"astar": [0.0, 0], "jps": [0.0, 0], "hpa": [0.0, 0]}
+        opt_cost = hpa_cost = 0
+        for _ in range(args.queries):
+            start, goal = rng.choice(free), rng.choice(free)
+            bounds = (0, size - 1, 0, size - 1)
+            for name, run in (("astar", lambda: hierarchy._bounded_astar(gw, start, goal, bounds)),
+                              ("jps", lambda: hierarchy.jps(gw, start, goal, tables=tables)),
+                              ("hpa", lambda: hpa.plan(start, goal))):
+                t0 = time.perf_counter()
+                path, stats = run()
+                totals[name][0] += time.perf_counter() - t0
+                totals[name][1] += stats.nodes_expanded
+                if name == "jps":
+                    opt_cost += len(path)
+                elif name == "hpa":
+                    hpa_cost += len(path)
+        ms = {k: 1000 * v[0] / args.queries for k, v in totals.items()}
+        nodes = {k: v[1] // args.queries for k, v in totals.items()}
+        ratio = hpa_cost / opt_cost if opt_cost else float('nan')
+        print(f"{size:>6} {build:>8.2f} {ms['astar']:>9.1f} {ms['jps']:>8.1f} {ms['hpa']:>8.1f} "
+              f"{nodes['astar']:>12} {nodes['jps']:>10} {nodes['hpa']:>10} {ratio:>13.3f}")
@@ -0,0 +1,64 @@
+# benchmarks/loadgen.py
+# Concurrent load against the asyncio PlanningService: `concurrency` clients send `requests` plan
+# requests drawn from a pool of distinct queries (a --repeat fraction of them duplicates, so
+# concurrent duplicates coalesce) and record end-to-end latency per request.
+# Run from the repo root: python -m benchmarks.loadgen --size 200 --requests 400 --concurrency 32 --deadline 0.5
+import argparse
+import asyncio
+import random
+import time
+import numpy as np
+from grid import GridWorld
+from service import PlanningService
+from benchmarks.compiled import random_grid
+
+async def run_load(service: PlanningService, queries, concurrency: int, deadline: float, partial: bool):
+    """Returns per-request (latency seconds, found, timed_out) in completion order."""
+    pending = iter(queries)
+    results = []
+
+    async def client():
+        for start, goal in pending:
+            t0 = time.perf_counter()
+            path, stats = await service.plan(start, goal, deadline=deadline, partial=partial)
+            results.append((time.perf_counter() - t0, bool(path) and path[-1] == goal, stats.timed_out))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results
+
+async def main(args):
+    gw = GridWorld(random_grid(args.size, args.density, args.seed))
+    rng = random.Random(args.seed)
+    free = [(int(r), int(c)) for r, c in zip(*(gw.grid != -1).nonzero())]
+    distinct = [(rng.choice(free), rng.choice(free)) for _ in range(max(1, int(args.requests * (1 - args.repeat))))]
+    queries = distinct + [rng.choice(distinct) for _ in range(args.requests - len(distinct))]
+    rng.shuffle(queries)
+    async with PlanningService(gw, workers=args.workers, processes=not args.threads, algo=args.algo,
+                               planning_horizon=4 * args.size) as service:
+        await service.plan(*queries[0])  # start the pool before the clock runs
+        service.requests = 0
+        t0 = time.perf_counter()
+        results = await run_load(service, queries, args.concurrency, args.deadline, args.partial)
+        wall = time.perf_counter() - t0
+        latency = np.array([r[0] for r in results]) * 1000
+        print(f"requests {len(results)}  concurrency {args.concurrency}  workers {service.workers}  "
+              f"throughput {len(results) / wall:.1f}/s")
+        print(f"latency ms  p50 {np.percentile(latency, 50):.1f}  p90 {np.percentile(latency, 90):.1f}  "
+              f"p99 {np.percentile(latency, 99):.1f}  max {latency.max():.1f}")
+        print(f"found {sum(r[1] for r in results)}  timed out {sum(r[2] for r in results)}  "
+              f"coalesced {service.coalesced}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--repeat", type=float, default=0.3, help="fraction of requests repeating an earlier query")
+    parser.add_argument("--deadline", type=float, default=None, help="seconds per request")
+    parser.add_argument("--partial", action="store_true", help="return best partial paths on timeout")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", action="store_true", help="thread pool instead of processes")
+    parser.add_argument("--algo", default="astar")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+# benchmarks/map_loading.py
+# Load time and memory of text maps (np.loadtxt) vs the binary format (read into memory, or
+# memory-mapped). Each loader runs in a fresh interpreter so peak RSS is not shared between them.
+# Run from the repo root: python -m benchmarks.map_loading --size 4000
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from grid import GridWorld
+from benchmarks.compiled import random_grid
+
+def peak_rss_kb() -> int:
+    # VmHWM is reset on exec; ru_maxrss would inherit the (large) peak of the parent process
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def measure(path: str, mode: str):
+    base = peak_rss_kb()
+    t0 = time.perf_counter()
+    if mode == "loadtxt":
+        grid = GridWorld.from_file(path)
+    else:
+        grid = GridWorld.from_binary(path, mmap=(mode == "mmap"))
+    load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    free = int((grid.grid != -1).sum())  # touches every page
+    scan = time.perf_counter() - t0
+    peak = peak_rss_kb()
+    return {"load_s": load, "scan_s": scan, "rss_mb": (peak - base) / 1024, "free": free}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        txt, binary = os.path.join(tmp, "map.txt"), os.path.join(tmp, "map.gridb")
+        grid = random_grid(args.size, 0.2, args.seed)
+        np.savetxt(txt, grid, fmt="%d")
+        GridWorld(grid, copy=False).to_binary(binary)
+        print(f"{args.size}x{args.size}: text {os.path.getsize(txt) / 2**20:.1f} MB, "
+              f"binary {os.path.getsize(binary) / 2**20:.1f} MB")
+        print(f"{'loader':>10} {'load s':>9} {'full scan s':>12} {'peak RSS MB':>12}")
+        for path, mode in ((txt, "loadtxt"), (binary, "read"), (binary, "mmap")):
+            out = subprocess.run([sys.executable, "-m", "benchmarks.map_loading", "--measure", path, mode],
+                                 capture_output=True, text=True, check=True).stdout
+            r = json.loads(out)
+            print(f"{mode:>10} {r['load_s']:>9.4f} {r['scan_s']:>12.4f} {r['rss_mb']:>12.1f}")
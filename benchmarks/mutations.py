@@ -0,0 +1,85 @@
+# benchmarks/mutations.py
+# Live traffic updates on a large map: small closures, reopenings and cost changes. Compares
+# rebuilding the GridWorld (and its compiled view and the goal's distance field or ALT tables)
+# per update with the incremental mutation API, which patches them in place; every few updates
+# both variants run the same query to check they agree.
+# Run from the repo root: python -m benchmarks.mutations --size 500 --updates 300
+import argparse
+import time
+import numpy as np
+from grid import GridWorld
+import heuristics
+import search
+from benchmarks.heuristics import terrain_map
+
+def updates(size: int, count: int, seed: int):
+    """(kind, top_left, bottom_right, value) traffic events: closures, reopenings, congestion."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(count):
+        r, c = (int(v) for v in rng.integers(0, size - 3, 2))
+        h, w = (int(v) for v in rng.integers(0, 3, 2))
+        kind = rng.choice(["close", "open", "cost"])
+        out.append((kind, (r, c), (r + h, c + w), int(rng.integers(2, 9)) if kind == "cost" else 2))
+    return out
+
+def apply(gw: GridWorld, event):
+    kind, tl, br, value = event
+    with gw.batch():
+        if kind == "close":
+            gw.set_rect(tl, br, -1)
+        elif kind == "open":
+            cells = [(r, c) for r in range(tl[0], br[0] + 1) for c in range(tl[1], br[1] + 1)]
+            gw.unblock(cells, value)
+        else:
+            gw.set_rect(tl, br, value)
+
+def prepare(gw: GridWorld, goal, alt: bool):
+    """Everything a query needs besides the search: the compiled view and the goal's heuristic table."""
+    gw.compile()
+    if alt:
+        return heuristics.for_goal(gw, "alt", goal, landmarks=8)
+    return search.FieldHeuristic(gw, goal)
+
+def query(gw: GridWorld, h, goal, horizon: int):
+    path, _ = search.astar_compiled(gw.compile(), (0, 0), goal, max_time=horizon, h=h.flat)
+    return sum(gw.cost(p) for p in path[1:]) if path else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--heuristic", default="field", choices=["field", "alt"])
+    parser.add_argument("--check-every", type=int, default=50, help="compare a full query of both variants")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = terrain_map(args.size, 0.15, args.seed)
+    goal = (args.size - 1, args.size - 1)
+    base[0, 0] = base[goal] = 2
+    events = updates(args.size, args.updates, args.seed)
+    horizon = 4 * args.size
+    alt = args.heuristic == "alt"
+
+    gw = GridWorld(base)        # mutated in place
+    shadow = GridWorld(base)    # only holds the current costs for the rebuild variant
+    prepare(gw, goal, alt)
+    t_inc = t_full = 0.0
+    for i, ev in enumerate(events, 1):
+        t0 = time.perf_counter()
+        apply(gw, ev)
+        h_inc = prepare(gw, goal, alt)
+        t1 = time.perf_counter()
+        apply(shadow, ev)
+        t2 = time.perf_counter()
+        fresh = GridWorld(shadow.grid)
+        h_full = prepare(fresh, goal, alt)
+        t_full += time.perf_counter() - t2
+        t_inc += t1 - t0
+        if i % args.check_every == 0:
+            assert query(gw, h_inc, goal, horizon) == query(fresh, h_full, goal, horizon)
+
+    n = len(events)
+    print(f"{args.size}x{args.size}, {n} updates, heuristic {args.heuristic} (compiled view + goal table kept current)")
+    print(f"incremental: {1000 * t_inc / n:8.2f} ms/update ({60 * n / t_inc:8.0f} per minute)")
+    print(f"rebuild:     {1000 * t_full / n:8.2f} ms/update ({60 * n / t_full:8.0f} per minute)")
@@ -0,0 +1,66 @@
+# benchmarks/occupancy.py
+# Planning time on maps/large.txt as the number of scheduled obstacles grows.
+# Run from the repo root: python -m benchmarks.occupancy
+import argparse
+import random
+import time
+from grid import GridWorld, DynamicObstacle
+import search
+
+class LinearScanGridWorld(GridWorld):
+    """Baseline: the original per-obstacle scan in occupied_at."""
+    def occupied_at(self, pos, t):
+        for obs in self.dynamic_obstacles:
+            p = obs.position_at(t)
+            if p is not None and tuple(p) == tuple(pos):
+                return True
+        return False
+
+def random_schedules(grid: GridWorld, count: int, length: int, seed: int):
+    """Random-walk obstacle schedules over passable cells."""
+    rng = random.Random(seed)
+    free = [(r, c) for r in range(grid.rows) for c in range(grid.cols) if grid.passable((r, c))]
+    obstacles = []
+    for i in range(count):
+        pos = rng.choice(free)
+        path = [pos]
+        for _ in range(length - 1):
+            nbrs = list(grid.neighbors(pos))
+            if nbrs:
+                pos = rng.choice(nbrs)
+            path.append(pos)
+        obstacles.append(DynamicObstacle(f"v{i}", path, start_time=rng.randrange(length)))
+    return obstacles
+
+def run(map_file, counts, start, goal, length, repeats, seed):
+    base = GridWorld.from_file(map_file)
+    print(f"{'obstacles':>10} {'indexed (s)':>12} {'linear (s)':>12} {'nodes':>8} {'path':>6}")
+    for n in counts:
+        obstacles = random_schedules(base, n, length, seed)
+        # keep start and goal clear so every size is solvable in principle
+        obstacles = [o for o in obstacles if start not in o.path and goal not in o.path]
+        timings = {}
+        for name, cls in (("indexed", GridWorld), ("linear", LinearScanGridWorld)):
+            gw = cls(base.grid, [])
+            for o in obstacles:
+                gw.add_dynamic_obstacle(o)
+            best = float('inf')
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                path, stats = search.astar_time_aware(gw, start, goal)
+                best = min(best, time.perf_counter() - t0)
+            timings[name] = (best, stats.nodes_expanded, len(path))
+        best, nodes, plen = timings["indexed"]
+        print(f"{n:>10} {best:>12.5f} {timings['linear'][0]:>12.5f} {nodes:>8} {plen:>6}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", default="maps/large.txt")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--start", type=int, nargs=2, default=[0, 0])
+    parser.add_argument("--goal", type=int, nargs=2, default=[19, 19])
+    parser.add_argument("--length", type=int, default=60, help="timesteps per obstacle schedule")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.map, args.counts, tuple(args.start), tuple(args.goal), args.length, args.repeats, args.seed)
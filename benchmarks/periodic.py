@@ -0,0 +1,59 @@
+# benchmarks/periodic.py
+# A day of looping traffic: every obstacle drives a short cycle over and over. Compares loading it
+# as expanded one-shot schedules (the whole day unrolled into path lists) with periodic obstacles
+# (one stored cycle each): build time, traced memory, and A* / compiled A* queries at mid-day.
+# Run from the repo root: python -m benchmarks.periodic --obstacles 200 --day 86400
+import argparse
+import time
+import tracemalloc
+from grid import GridWorld, DynamicObstacle
+import search
+from benchmarks.occupancy import random_schedules
+
+def build(base: GridWorld, cycles, day: int, periodic: bool):
+    if periodic:
+        obstacles = [DynamicObstacle(o.id, o.path, o.start_time, period=len(o.path), end_time=day) for o in cycles]
+    else:
+        obstacles = [DynamicObstacle(o.id, [o.path[i % len(o.path)] for i in range(day - o.start_time + 1)], o.start_time)
+                     for o in cycles]
+    return GridWorld(base.grid, obstacles)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", default="maps/large.txt")
+    parser.add_argument("--obstacles", type=int, default=200)
+    parser.add_argument("--cycle", type=int, default=60, help="timesteps per loop")
+    parser.add_argument("--day", type=int, default=86400, help="timesteps the schedule covers")
+    parser.add_argument("--start", type=int, nargs=2, default=[0, 0])
+    parser.add_argument("--goal", type=int, nargs=2, default=[19, 19])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = GridWorld.from_file(args.map)
+    start, goal = tuple(args.start), tuple(args.goal)
+    # closed loops (there and back), kept off the start and goal cells
+    cycles = []
+    for o in random_schedules(base, args.obstacles, args.cycle // 2, args.seed):
+        if start not in o.path and goal not in o.path:
+            o.path = o.path + o.path[-2:0:-1]
+            o.start_time %= len(o.path)
+            cycles.append(o)
+    noon = args.day // 2
+    print(f"{len(cycles)} looping obstacles, {args.day} timesteps, query at t={noon}")
+    print(f"{'schedule':>10} {'build s':>8} {'memory MB':>10} {'astar ms':>9} {'compiled ms':>12} {'path':>5}")
+    for periodic in (False, True):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        gw = build(base, cycles, args.day, periodic)
+        built = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        path, _ = search.astar_time_aware(gw, start, goal, start_time=noon)
+        plain = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        cpath, _ = search.astar_compiled(gw.compile(), start, goal, start_time=noon)
+        compiled = time.perf_counter() - t0
+        assert len(cpath) == len(path)
+        print(f"{'periodic' if periodic else 'expanded':>10} {built:>8.2f} {peak / 2**20:>10.1f} "
+              f"{1000 * plain:>9.1f} {1000 * compiled:>12.1f} {len(path):>5}")
@@ -0,0 +1,99 @@
+# benchmarks/render.py
+# Rendering cost on a large map with many scheduled obstacles: the old cell-by-cell ASCII printer
+# and per-waypoint matplotlib plot against render.py's array-built frames, then a long simulated
+# run exported as a GIF. Run from the repo root: python -m benchmarks.render --size 300 --steps 3000
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from grid import GridWorld
+import render
+from benchmarks.compiled import random_grid
+from benchmarks.occupancy import random_schedules
+
+def legacy_ascii(grid: GridWorld, agent_pos=None, goal=None, occupied_positions=None) -> str:
+    """main.print_ascii before render.py, returning its text instead of printing it."""
+    lines = []
+    for r in range(grid.rows):
+        line = ""
+        for c in range(grid.cols):
+            if agent_pos == (r, c):
+                ch = "A"
+            elif goal == (r, c):
+                ch = "G"
+            elif grid.grid[r, c] == -1:
+                ch = "#"
+            elif occupied_positions and (r, c) in occupied_positions:
+                ch = "X"
+            elif grid.grid[r, c] == 1:
+                ch = "."
+            else:
+                ch = str(int(grid.grid[r, c]))
+            line += ch + " "
+        lines.append(line)
+    return "\n".join(lines)
+
+def legacy_plot(grid: GridWorld, path, out_file):
+    """main.visualize_path before render.py: one ax.plot call per obstacle waypoint."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(6, 6))
+    ax.imshow(grid.grid.copy(), cmap='gray_r', origin='upper')
+    for obs in grid.dynamic_obstacles:
+        for p in obs.path:
+            ax.plot(p[1], p[0], marker='x')
+    if path:
+        ax.plot([p[1] for p in path], [p[0] for p in path], marker='o', linestyle='-')
+    plt.savefig(out_file)
+    plt.close(fig)
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=300)
+    parser.add_argument("--obstacles", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=3000, help="timesteps of the animated run")
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-legacy-plot", action="store_true", help="the old plot takes minutes on big maps")
+    args = parser.parse_args()
+
+    grid = GridWorld(random_grid(args.size, 0.2, args.seed))
+    for o in random_schedules(grid, args.obstacles, args.size, args.seed):
+        grid.add_dynamic_obstacle(o)
+    waypoints = sum(len(o.path) for o in grid.dynamic_obstacles)
+    occupied = {tuple(p) for p in render.obstacle_cells(grid, 10).tolist()}
+    print(f"{args.size}x{args.size} map, {len(grid.dynamic_obstacles)} obstacles, {waypoints} waypoints")
+
+    old, t_old = timed(legacy_ascii, grid, (0, 0), (1, 1), occupied)
+    new, t_new = timed(render.ascii_frame, grid, (0, 0), (1, 1), occupied)
+    assert old == new
+    print(f"ascii      legacy {1000 * t_old:9.1f} ms   vectorized {1000 * t_new:9.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.skip_legacy_plot:
+            _, t_old = timed(legacy_plot, grid, [], os.path.join(tmp, "old.png"))
+        _, t_frame = timed(render.render_frame, grid, t=10, scale=2)
+        _, t_new = timed(lambda: render.save_image(render.render_frame(grid, t=10, scale=2),
+                                                   os.path.join(tmp, "new.png")))
+        old_ms = "skipped" if args.skip_legacy_plot else f"{1000 * t_old:9.1f} ms"
+        print(f"png        legacy {old_ms}   frame {1000 * t_frame:7.1f} ms, with save {1000 * t_new:7.1f} ms")
+
+        # a random walk of one vehicle through the obstacle field, recorded like a simulation
+        rng = np.random.default_rng(args.seed)
+        rec = render.FrameRecorder()
+        rec.agents["agent"] = 0
+        pos = (0, 0)
+        for t in range(1, args.steps + 1):
+            nxt = list(grid.neighbors(pos))
+            pos = nxt[rng.integers(len(nxt))] if nxt else pos
+            rec.steps.extend((t, 0, pos[0], pos[1]))
+        out = os.path.join(tmp, "run.gif")
+        frames, t_anim = timed(render.export_animation, grid, rec, out, start={"agent": (0, 0)},
+                               stride=args.stride, scale=1)
+        print(f"animation  {frames} frames in {t_anim:.2f} s ({1000 * t_anim / frames:.2f} ms/frame), "
+              f"{os.path.getsize(out) / 2**20:.1f} MB")
@@ -0,0 +1,81 @@
+# benchmarks/replanning.py
+# Nodes expanded over a long route with frequent surprise blockages:
+# full A* replanning from scratch vs incremental D* Lite repairs.
+# Run from the repo root: python -m benchmarks.replanning --tile 5
+import argparse
+import random
+import numpy as np
+from grid import GridWorld
+import search
+
+def walk(start, goal, replan, set_blocked, rate: float, duration: int, seed: int, max_steps: int):
+    """
+    Follows the current plan. With probability `rate` per step the next cell gets blocked for
+    `duration` steps; the walker then replans (or waits in place if no route exists).
+    """
+    rng = random.Random(seed)
+    current, expanded, replans = start, 0, 0
+    blocked = {}  # cell -> time it clears
+    path, nodes = replan(current)
+    expanded += nodes
+    idx = 1
+    for t in range(max_steps):
+        if current == goal:
+            break
+        cleared = [c for c, until in blocked.items() if until <= t]
+        for c in cleared:
+            del blocked[c]
+        if cleared:
+            set_blocked(current, set(blocked))
+        if not path or idx >= len(path):
+            path, nodes = replan(current)
+            expanded += nodes
+            idx = 1
+            continue
+        nxt = path[idx]
+        if nxt != goal and (nxt in blocked or rng.random() < rate):
+            blocked[nxt] = t + duration
+            set_blocked(current, set(blocked))
+            path, nodes = replan(current)
+            expanded += nodes
+            replans += 1
+            idx = 1
+            continue
+        current = nxt
+        idx += 1
+    return current == goal, expanded, replans
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", default="maps/large.txt")
+    parser.add_argument("--tile", type=int, default=5, help="tile the map N x N times for a longer route")
+    parser.add_argument("--rate", type=float, default=0.1, help="surprise probability per step")
+    parser.add_argument("--duration", type=int, default=5, help="steps a surprise blockage lasts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = np.tile(np.loadtxt(args.map, dtype=int), (args.tile, args.tile))
+    start, goal = (0, 0), (base.shape[0] - 1, base.shape[1] - 1)
+    max_steps = 4 * base.size
+
+    gw = GridWorld(base)
+    def astar_replan(pos):
+        path, stats = search.astar_time_aware(gw, pos, goal, max_time=base.size)
+        return path, stats.nodes_expanded
+    def astar_block(pos, cells):
+        gw.grid[...] = base
+        for c in cells:
+            gw.grid[c] = -1
+    ok, nodes, replans = walk(start, goal, astar_replan, astar_block, args.rate, args.duration, args.seed, max_steps)
+    print(f"A* from scratch : reached={ok} replans={replans} nodes={nodes}")
+
+    gw2 = GridWorld(base)
+    dstar = search.DStarLite(gw2, start, goal)
+    def dstar_replan(pos):
+        path, stats = dstar.plan(pos)
+        return path, stats.nodes_expanded
+    def dstar_block(pos, cells):
+        dstar.move_to(pos)
+        dstar.set_blocked(cells)
+    ok, nodes2, replans = walk(start, goal, dstar_replan, dstar_block, args.rate, args.duration, args.seed, max_steps)
+    print(f"D* Lite repairs : reached={ok} replans={replans} nodes={nodes2}  ({nodes / max(nodes2, 1):.1f}x fewer)")
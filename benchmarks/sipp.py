@@ -0,0 +1,38 @@
+# benchmarks/sipp.py
+# Expansions of time-expanded A* vs SIPP as obstacle schedules get longer. The map has a wall
+# with a single gap that a parked vehicle blocks for the whole schedule, plus random traffic.
+# Run from the repo root: python -m benchmarks.sipp --size 60
+import argparse
+import numpy as np
+from grid import GridWorld, DynamicObstacle
+import search
+from benchmarks.compiled import random_grid
+from benchmarks.occupancy import random_schedules
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=60)
+    parser.add_argument("--obstacles", type=int, default=40)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 200, 300])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = random_grid(args.size, 0.15, args.seed)
+    base[base > 1] = 1  # SIPP minimizes arrival time; keep terrain uniform so both optimize the same thing
+    gap = (args.size // 2, args.size // 2)
+    base[gap[0], :] = -1
+    base[gap] = 1
+    start, goal = (0, 0), (args.size - 1, args.size - 1)
+    print(f"{'schedule':>9} {'astar nodes':>12} {'compact nodes':>14} {'sipp nodes':>11} {'arrival a*/compact/sipp':>24}")
+    for length in args.lengths:
+        gw = GridWorld(base)
+        gw.add_dynamic_obstacle(DynamicObstacle("parked", [gap] * length, start_time=0))
+        for o in random_schedules(gw, args.obstacles, length, args.seed):
+            if start not in o.path and goal not in o.path:
+                gw.add_dynamic_obstacle(o)
+        horizon = 2 * length + 4 * args.size
+        p1, s1 = search.astar_time_aware(gw, start, goal, max_time=horizon)
+        p2, s2 = search.astar_compact(gw, start, goal, max_time=horizon)
+        p3, s3 = search.sipp(gw, start, goal, max_time=horizon)
+        arrivals = "/".join(str(len(p) - 1) if p else "-" for p in (p1, p2, p3))
+        print(f"{length:>9} {s1.nodes_expanded:>12} {s2.nodes_expanded:>14} {s3.nodes_expanded:>11} {arrivals:>24}")
@@ -0,0 +1,149 @@
+# benchmarks/suite.py
+# In-process benchmark harness: seeded synthetic maps, direct planner calls with warmup and
+# repeats, wall-time percentiles, nodes expanded and tracemalloc peak memory, written as JSON
+# so two runs (e.g. two commits) can be diffed with --compare.
+# Run from the repo root:
+#   python -m benchmarks.suite --out before.json
+#   python -m benchmarks.suite --out after.json
+#   python -m benchmarks.suite --compare before.json after.json
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from grid import GridWorld
+import search
+from benchmarks.compiled import random_grid
+from benchmarks.occupancy import random_schedules
+
+# name -> planner(grid, start, goal, max_time); every entry calls search.py directly
+PLANNERS = {
+    "bfs": lambda g, s, t, h: search.bfs_time_aware(g, s, t, max_time=h),
+    "ucs": lambda g, s, t, h: search.ucs_time_aware(g, s, t, max_time=h),
+    "astar": lambda g, s, t, h: search.astar_time_aware(g, s, t, max_time=h),
+    "bfs_compiled": lambda g, s, t, h: search.bfs_compiled(g.compile(), s, t, max_time=h),
+    "ucs_compiled": lambda g, s, t, h: search.ucs_compiled(g.compile(), s, t, max_time=h),
+    "astar_compiled": lambda g, s, t, h: search.astar_compiled(g.compile(), s, t, max_time=h),
+    "compact": lambda g, s, t, h: search.astar_compact(g, s, t, max_time=h),
+    "sipp": lambda g, s, t, h: search.sipp(g, s, t, max_time=h),
+    "wastar": lambda g, s, t, h: search.astar_time_aware(g, s, t, max_time=h, weight=1.5),
+    # a fixed expansion budget, not wall time, so cost and nodes do not depend on machine load
+    "ara": lambda g, s, t, h: search.ara_star(g, s, t, max_time=h, max_expansions=20000),
+}
+
+def make_scenario(size: int, density: float, obstacles: int, span: int, seed: int):
+    """
+    Seeded size x size map with a start->goal query across a span x span corner window; the
+    moving obstacles random-walk inside that window so they actually interact with the route.
+    """
+    grid = random_grid(size, density, seed)
+    span = min(span, size - 1)
+    start, goal = (0, 0), (span, span)
+    grid[goal] = 1
+    window = GridWorld(grid[:span + 1, :span + 1])
+    dyn = [o for o in random_schedules(window, obstacles, 2 * span + 2, seed)
+           if start not in o.path and goal not in o.path]
+    return GridWorld(grid, dyn), start, goal
+
+def run_case(planner, grid, start, goal, horizon, warmup: int, repeats: int):
+    for _ in range(warmup):
+        planner(grid, start, goal, horizon)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        path, stats = planner(grid, start, goal, horizon)
+        times.append(time.perf_counter() - t0)
+    # one extra traced run: tracemalloc slows allocation down, so it is kept out of the timings
+    tracemalloc.start()
+    planner(grid, start, goal, horizon)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "found": bool(path),
+        "path_len": len(path),
+        "cost": sum(grid.cost(p) for p in path[1:]),
+        "nodes_expanded": stats.nodes_expanded,
+        "time_min": min(times),
+        "time_p50": float(np.percentile(times, 50)),
+        "time_p90": float(np.percentile(times, 90)),
+        "time_max": max(times),
+        "peak_memory": peak,
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def run_suite(sizes, algos, density, obstacles, span, warmup, repeats, seed):
+    results = []
+    for i, size in enumerate(sizes):
+        grid, start, goal = make_scenario(size, density, obstacles, span, seed + i)
+        horizon = 4 * (goal[0] + goal[1]) + 20
+        for algo in algos:
+            row = {"size": size, "density": density, "obstacles": len(grid.dynamic_obstacles),
+                   "seed": seed + i, "algo": algo}
+            row.update(run_case(PLANNERS[algo], grid, start, goal, horizon, warmup, repeats))
+            results.append(row)
+            print(f"{size:>6} {algo:>15} {row['nodes_expanded']:>10} {1000 * row['time_p50']:>10.2f} "
+                  f"{1000 * row['time_p90']:>10.2f} {row['peak_memory'] / 2**20:>9.2f}", flush=True)
+    return results
+
+def compare(old_file: str, new_file: str, threshold: float) -> int:
+    """Prints per-case ratios; returns the number of regressions (slower p50 or changed nodes/cost)."""
+    with open(old_file) as f:
+        old = {(r["size"], r["algo"]): r for r in json.load(f)["results"]}
+    with open(new_file) as f:
+        new = {(r["size"], r["algo"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"{'size':>6} {'algo':>15} {'p50 ratio':>10} {'mem ratio':>10} {'nodes':>16}  note")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        ratio = b["time_p50"] / a["time_p50"] if a["time_p50"] else float('inf')
+        mem = b["peak_memory"] / a["peak_memory"] if a["peak_memory"] else float('inf')
+        notes = []
+        if ratio > 1 + threshold:
+            notes.append("SLOWER")
+        if b["nodes_expanded"] != a["nodes_expanded"]:
+            notes.append("nodes changed")
+        if (b["found"], b["cost"]) != (a["found"], a["cost"]):
+            notes.append("result changed")
+        regressions += bool(notes)
+        nodes = f"{a['nodes_expanded']}->{b['nodes_expanded']}"
+        print(f"{key[0]:>6} {key[1]:>15} {ratio:>10.2f} {mem:>10.2f} {nodes:>16}  {', '.join(notes)}")
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]:>6} {key[1]:>15}  only in {'old' if key in old else 'new'}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200, 1000, 2000])
+    parser.add_argument("--algos", nargs="+", default=["astar", "astar_compiled", "compact", "sipp"],
+                        choices=sorted(PLANNERS))
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--obstacles", type=int, default=20, help="moving obstacles per map")
+    parser.add_argument("--span", type=int, default=120, help="query spans a span x span window")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown flagged by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    print(f"{'size':>6} {'algo':>15} {'nodes':>10} {'p50 ms':>10} {'p90 ms':>10} {'peak MB':>9}")
+    results = run_suite(args.sizes, args.algos, args.density, args.obstacles, args.span,
+                        args.warmup, args.repeats, args.seed)
+    with open(args.out, "w") as f:
+        json.dump({"env": environment(), "config": vars(args), "results": results}, f, indent=1)
+    print(f"Saved {len(results)} results to {args.out}")
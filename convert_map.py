@@ -0,0 +1,25 @@
+# convert_map.py
+# Converts a text map (plus an optional dynamic .json schedule) into the binary map format
+# read by GridWorld.from_binary / GridWorld.from_file.
+# Usage: python convert_map.py maps/large.txt maps/large.gridb --dynamic maps/dynamic.json
+import argparse
+import numpy as np
+from grid import GridWorld, _load_schedule
+
+def read_text_map(file_path: str) -> np.ndarray:
+    """Parses a whitespace-separated text map row by row (avoids np.loadtxt's per-token overhead)."""
+    with open(file_path, 'r') as f:
+        rows = [np.array(line.split(), dtype=np.int64) for line in f if line.strip()]
+    return np.vstack(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("src", help="text map (txt)")
+    parser.add_argument("dst", help="output binary map")
+    parser.add_argument("--dynamic", default=None, help="dynamic obstacle json schedule to embed")
+    parser.add_argument("--dtype", default=None, help="cost dtype (default: smallest integer type that fits)")
+    args = parser.parse_args()
+
+    grid = GridWorld(read_text_map(args.src), _load_schedule(args.dynamic), copy=False)
+    grid.to_binary(args.dst, dtype=args.dtype)
+    print(f"Wrote {args.dst}: {grid.rows}x{grid.cols}, {len(grid.dynamic_obstacles)} scheduled obstacles")
@@ -1,74 +1,47 @@
 # experiments.py
-import subprocess
-import pandas as pd
+# Runs each algorithm in-process on the bundled maps as a sweep (see sweep.py: process pool,
+# per-cell checkpoint, columnar results) and plots the median planning time over several
+# repeats. For synthetic maps, percentiles, peak memory and regression diffs use the benchmark
+# suite: python -m benchmarks.suite
+import numpy as np
 import matplotlib.pyplot as plt
-
-maps = [
-    ("maps/small.txt", (0,0), (4,4)),
-    ("maps/medium.txt", (0,0), (9,9)),
-    ("maps/large.txt", (0,0), (19,19))
-]
-
-algos = ["bfs", "ucs", "astar"]
-
-results = []
-
-for map_file, start, goal in maps:
-    for algo in algos:
-        # run main.py as subprocess
-        cmd = [
-            "python", "main.py",
-            "--map", map_file,
-            "--algo", algo,
-            "--start", str(start[0]), str(start[1]),
-            "--goal", str(goal[0]), str(goal[1])
-        ]
-        print("Running:", " ".join(cmd))
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        out = proc.stdout
-
-        # parse outputs (very simple parsing)
-        lines = out.splitlines()
-        success = "Success: True" in out
-        final_path_len = 0
-        for line in lines:
-            if line.startswith("Final path length"):
-                final_path_len = int(line.split(":")[-1].strip())
-
-        nodes = 0
-        time_taken = 0.0
-        for line in lines:
-            if "Total nodes expanded" in line:
-                nodes = int(line.split(":")[-1].strip())
-            if "Total planning time" in line:
-                time_taken = float(line.split(":")[-1].strip())
-
-        results.append({
-            "Map": map_file,
-            "Algo": algo,
-            "Success": success,
-            "PathLen": final_path_len,
-            "Nodes": nodes,
-            "Time": time_taken
-        })
-
-# save to CSV
-df = pd.DataFrame(results)
-df.to_csv("experiment_results.csv", index=False)
-print("\nSaved results to experiment_results.csv")
-print(df)
-
-## plot nodes expanded
-df.pivot(index="Map", columns="Algo", values="Nodes").plot(kind="bar")
-plt.ylabel("Nodes Expanded")
-plt.title("Nodes Expanded by Algo & Map")
-plt.savefig("nodes_vs_map.png")
-plt.close()
-
-# plot planning time
-df.pivot(index="Map", columns="Algo", values="Time").plot(kind="bar")
-plt.ylabel("Planning Time (s)")
-plt.title("Planning Time by Algo & Map")
-plt.savefig("time_vs_map.png")
-plt.close()
-
+import sweep
+
+spec = {
+    "map": [
+        {"file": "maps/small.txt", "start": [0,0], "goal": [4,4]},
+        {"file": "maps/medium.txt", "start": [0,0], "goal": [9,9]},
+        {"file": "maps/large.txt", "start": [0,0], "goal": [19,19]},
+    ],
+    "algo": ["bfs", "ucs", "astar"],
+    "warmup": 1,
+    "repeats": 5,
+}
+
+def bar_chart(columns, value: str, ylabel: str, title: str, out_file: str):
+    maps, algos, table = sweep.pivot(columns, "map", "algo", value)
+    width = 0.8 / len(algos)
+    x = np.arange(len(maps))
+    fig, ax = plt.subplots()
+    for j, algo in enumerate(algos):
+        ax.bar(x + j * width, table[:, j], width, label=algo)
+    ax.set_xticks(x + width * (len(algos) - 1) / 2, maps)
+    ax.set_xlabel("Map")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend(title="Algo")
+    fig.savefig(out_file)
+    plt.close(fig)
+
+if __name__ == "__main__":
+    # a fresh checkpoint each time: the sweep measures the current code
+    records = list(sweep.run_sweep(spec))
+    columns = sweep.save_results(records, "experiment_results.npz")
+    print("\nSaved results to experiment_results.npz")
+    print(f"{'Map':<16} {'Algo':<6} {'Success':<8} {'PathLen':>7} {'Nodes':>7} {'Time (s)':>10}")
+    for i in np.lexsort((columns["algo"], columns["map"])):
+        print(f"{columns['map'][i]:<16} {columns['algo'][i]:<6} {str(columns['success'][i]):<8} "
+              f"{columns['path_len'][i]:>7} {columns['nodes'][i]:>7} {columns['plan_time'][i]:>10.6f}")
+
+    bar_chart(columns, "nodes", "Nodes Expanded", "Nodes Expanded by Algo & Map", "nodes_vs_map.png")
+    bar_chart(columns, "plan_time", "Planning Time (s)", "Planning Time by Algo & Map", "time_vs_map.png")
@@ -1,46 +1,382 @@
 # grid.py
 import numpy as np
 import json
-from typing import List, Tuple, Dict
+import struct
+import itertools
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Set, Optional
 
 Pos = Tuple[int, int]
 
+# Binary map layout (little-endian): a 64-byte header, the cost array in C order starting at
+# byte 64, then an optional UTF-8 JSON schedule in the same format as the dynamic .json files.
+# The header holds MAP_MAGIC, the NumPy dtype string of the costs, rows, cols and schedule length.
+MAP_MAGIC = b"GRIDMAP1"
+_MAP_HEADER = struct.Struct("<8s8sQQQ")
+_MAP_DATA_OFFSET = 64
+
 class DynamicObstacle:
-    def __init__(self, oid: str, path: List[Pos], start_time: int = 0):
+    """
+    A scheduled vehicle: at time start_time + i it is at path[i].
+    period: the path is driven again every `period` steps (period == len(path) loops it without a
+            pause; a longer period leaves the map empty between runs). Only one cycle is stored,
+            so a schedule repeating all day costs no more memory than a single run.
+    end_time: last timestep the obstacle is on the map (None: until the path ends, or forever
+              for periodic obstacles).
+    """
+    def __init__(self, oid: str, path: List[Pos], start_time: int = 0, period: int = None, end_time: int = None):
         self.id = oid
         self.path = [tuple(p) for p in path]
         self.start_time = int(start_time)
+        self.period = int(period) if period is not None else None
+        self.end_time = int(end_time) if end_time is not None else None
+        if self.period is not None and self.period < len(self.path):
+            raise ValueError(f"obstacle {oid}: period {period} is shorter than its path ({len(self.path)} steps)")
+
+    @classmethod
+    def from_json(cls, o: dict) -> "DynamicObstacle":
+        """One entry of a schedule's "moving_obstacles" list. "loop": true repeats the path back to back."""
+        period = o.get("period")
+        if period is None and o.get("loop"):
+            period = len(o["path"])
+        return cls(o["id"], o["path"], o.get("start_time", 0), period, o.get("end_time"))
+
+    def to_json(self) -> dict:
+        o = {"id": self.id, "path": [list(p) for p in self.path], "start_time": self.start_time}
+        if self.period is not None:
+            o["period"] = self.period
+        if self.end_time is not None:
+            o["end_time"] = self.end_time
+        return o
+
+    @property
+    def last_time(self) -> float:
+        """Last timestep the obstacle can be on the map (inf for an endless periodic schedule)."""
+        if self.end_time is not None:
+            return self.end_time
+        return float('inf') if self.period is not None else self.start_time + len(self.path) - 1
 
     def position_at(self, t: int):
         idx = t - self.start_time
-        if idx < 0 or idx >= len(self.path):
+        if idx < 0 or t > self.last_time:
             return None
-        return self.path[idx]
+        if self.period is not None:
+            idx %= self.period
+        return self.path[idx] if idx < len(self.path) else None
+
+class GridChange:
+    """
+    One recorded mutation of a GridWorld, so caches can refresh only what it touched.
+    kind: 'obstacle' (cells holds the (pos, t) pairs a new obstacle occupies; for a periodic
+          obstacle, whose pairs never end, cells is None and obstacle.position_at answers) or
+          'terrain' (cells holds positions whose cost changed, old/new their costs before and
+          after, region the (r0, c0, r1, c1) inclusive box around them).
+    relaxed: True if the change can make routes cheaper (a cost decrease or an unblocked cell).
+    """
+    def __init__(self, version: int, kind: str, cells, relaxed: bool = False, obstacle: "DynamicObstacle" = None,
+                 old: List[int] = None, new: List[int] = None, region: Tuple[int, int, int, int] = None):
+        self.version = version
+        self.kind = kind
+        self.cells = cells
+        self.relaxed = relaxed
+        self.obstacle = obstacle
+        self.old = old
+        self.new = new
+        self.region = region
+
+def _parse_schedule(j) -> List[DynamicObstacle]:
+    return [DynamicObstacle.from_json(o) for o in j.get("moving_obstacles", [])]
+
+def _load_schedule(dynamic_json: Optional[str]) -> List[DynamicObstacle]:
+    # 'unpredictable' means the caller simulates surprises itself (no schedule here)
+    if not dynamic_json or dynamic_json.strip().lower() == "unpredictable":
+        return []
+    with open(dynamic_json, 'r') as f:
+        return _parse_schedule(json.load(f))
+
+class ReservationTable:
+    """
+    Space-time index of reserved cells: time -> set of flat cell ids (r * cols + c).
+    Lets occupancy checks run in O(1) instead of scanning every obstacle schedule.
+    Multi-agent planning also uses edge reservations (a move between two cells during one step,
+    so agents cannot swap places) and parking (a cell held from some time on, e.g. an agent
+    that stays at its goal); both are empty for plain obstacle schedules.
+
+    Periodic obstacles are kept compactly as cycles: (period, end) -> phase t % period -> cell ->
+    first timestep the cell is taken at that phase. is_reserved answers for any t; the
+    array-backed planners, which read `cells` directly, first call materialize(lo, hi) to expand
+    the cycles over their own search window, so memory follows the queries, not the schedule.
+    """
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.cells: Dict[int, Set[int]] = {}
+        self.edges: Dict[int, Set[Tuple[int, int]]] = {}  # t -> {(from cell, to cell)} moving t -> t+1
+        self.parked: Dict[int, int] = {}                   # cell -> first parked timestep
+        self.latest: Dict[int, int] = {}                   # cell -> last reserved timestep
+        self.horizon = -1  # last timestep with any reservation (inf once something is parked or loops forever)
+        self.cycles: Dict[Tuple[int, float], Dict[int, Dict[int, int]]] = {}
+        self.materialized: Set[int] = set()  # timesteps whose cycles are expanded into `cells`
+        self._by_cell = None
+
+    def cell_id(self, pos: Pos) -> int:
+        return pos[0] * self.cols + pos[1]
+
+    def reserve(self, pos: Pos, t: int):
+        r, c = pos
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            return
+        cell = r * self.cols + c
+        occ = self.cells.get(t)
+        if occ is None:
+            occ = self.cells[t] = set()
+        occ.add(cell)
+        if t > self.latest.get(cell, -1):
+            self.latest[cell] = t
+        if t > self.horizon:
+            self.horizon = t
+        self._by_cell = None
+
+    def reserve_path(self, path: List[Pos], start_time: int = 0):
+        for i, p in enumerate(path):
+            self.reserve(p, start_time + i)
+
+    def add_obstacle(self, obstacle: "DynamicObstacle"):
+        """Reserves an obstacle's schedule: expanded per timestep if it is finite, as a cycle if periodic."""
+        if obstacle.period is None:
+            path = obstacle.path
+            if obstacle.end_time is not None:
+                path = path[:max(obstacle.end_time - obstacle.start_time + 1, 0)]
+            self.reserve_path(path, obstacle.start_time)
+            return
+        period, start, end = obstacle.period, obstacle.start_time, obstacle.last_time
+        phases = self.cycles.setdefault((period, end), {})
+        for i, p in enumerate(obstacle.path):
+            first = start + i
+            if first > end or not (0 <= p[0] < self.rows and 0 <= p[1] < self.cols):
+                continue
+            cell = self.cell_id(p)
+            at_phase = phases.setdefault(first % period, {})
+            at_phase[cell] = min(first, at_phase.get(cell, first))
+            self.latest[cell] = max(self.latest.get(cell, -1), end)
+            # timesteps already expanded get the new cycle too
+            for t in self.materialized:
+                if first <= t <= end and t % period == first % period:
+                    self.cells.setdefault(t, set()).add(cell)
+        self.horizon = max(self.horizon, end)
+        self._by_cell = None
+
+    def materialize(self, lo: int, hi: int):
+        """Expands the periodic cycles into `cells` for the timesteps lo..hi."""
+        if not self.cycles:
+            return
+        new = [t for t in range(max(lo, 0), hi + 1) if t not in self.materialized]
+        for t in new:
+            for (period, end), phases in self.cycles.items():
+                at_phase = phases.get(t % period)
+                if at_phase and t <= end:
+                    occ = [cell for cell, first in at_phase.items() if first <= t]
+                    if occ:
+                        self.cells.setdefault(t, set()).update(occ)
+            self.materialized.add(t)
+        if new:
+            self._by_cell = None
+
+    def reserve_edge(self, a: Pos, b: Pos, t: int):
+        """Reserves the move a -> b between t and t+1."""
+        self.edges.setdefault(t, set()).add((self.cell_id(a), self.cell_id(b)))
+
+    def park(self, pos: Pos, t: int):
+        """Holds pos from time t on (for every later timestep)."""
+        cell = self.cell_id(pos)
+        self.parked[cell] = min(t, self.parked.get(cell, t))
+        self.horizon = float('inf')
+
+    def unpark(self, pos: Pos):
+        self.parked.pop(self.cell_id(pos), None)
+
+    def is_reserved(self, pos: Pos, t: int) -> bool:
+        cell = pos[0] * self.cols + pos[1]
+        occ = self.cells.get(t)
+        if occ is not None and cell in occ:
+            return True
+        if self.parked and self.parked.get(cell, t + 1) <= t:
+            return True
+        if self.cycles and t not in self.materialized:
+            for (period, end), phases in self.cycles.items():
+                first = phases.get(t % period, {}).get(cell)
+                if first is not None and first <= t <= end:
+                    return True
+        return False
+
+    def forget_before(self, t: int):
+        """Drops reservations of timesteps before t (a simulation that never looks back keeps memory flat)."""
+        for table in (self.cells, self.edges):
+            for old in [k for k in table if k < t]:
+                del table[old]
+        self.materialized = {k for k in self.materialized if k >= t}
+        self._by_cell = None
+
+    def times_by_cell(self) -> Dict[int, List[int]]:
+        """
+        The same index inverted: flat cell id -> sorted reserved timesteps. Cached until the next reserve.
+        Periodic obstacles are included at materialized timesteps only.
+        """
+        if self._by_cell is None:
+            by_cell: Dict[int, List[int]] = {}
+            for t in sorted(self.cells):
+                for cell in self.cells[t]:
+                    by_cell.setdefault(cell, []).append(t)
+            self._by_cell = by_cell
+        return self._by_cell
+
+def _relax_distance_field(grid: np.ndarray, goals, init: np.ndarray = None) -> np.ndarray:
+    """
+    Multi-source cost-to-go by repeated directional sweeps. Along a row, the best value reachable
+    by walking right is d[c] = min_{k>=c}(d[k] + P[k]) - P[c] with P the inclusive prefix sum of
+    entry costs, i.e. one reversed cumulative minimum; the other three directions are analogous.
+    Walls get a finite entry cost larger than any real path so the prefix sums stay finite.
+    Each round propagates along whole rows and columns, so the number of rounds is bounded by the
+    number of turns in the optimal paths rather than their length.
+    init: a field whose finite values are costs of real paths under the current terrain (e.g. the
+    field from before some cells got cheaper); the sweeps then only propagate the improvements.
+    """
+    passable = grid != -1
+    big = float(grid[passable].sum() + 1)
+    w = np.where(passable, grid, big).astype(float)
+    dist = np.full(grid.shape, big) if init is None else np.where(np.isfinite(init) & passable, init, big)
+    for g in goals:
+        if passable[g]:
+            dist[g] = 0.0
+    P1 = np.cumsum(w, axis=1)
+    Q1 = P1 - w
+    P0 = np.cumsum(w, axis=0)
+    Q0 = P0 - w
+    while True:
+        d = np.minimum.accumulate((dist + P1)[:, ::-1], axis=1)[:, ::-1] - P1
+        d = np.minimum(d, np.minimum.accumulate(d - Q1, axis=1) + Q1)
+        d = np.minimum(d, np.minimum.accumulate((d + P0)[::-1], axis=0)[::-1] - P0)
+        d = np.minimum(d, np.minimum.accumulate(d - Q0, axis=0) + Q0)
+        np.minimum(d, big, out=d)
+        if np.array_equal(d, dist):
+            break
+        dist = d
+    dist[(dist >= big) | ~passable] = np.inf
+    return dist
+
+def _update_field(grid: np.ndarray, goals, field: np.ndarray, ids: np.ndarray, old: np.ndarray,
+                  new: np.ndarray) -> np.ndarray:
+    """
+    Brings a distance field up to date after the cells `ids` (flat) changed cost from old to new;
+    `grid` already holds the new costs. Cells whose optimal route entered a dearer or blocked cell
+    (found by walking the relation field[u] == old entry cost of w + field[w] back from the changed
+    cells, a whole frontier per NumPy step) are reset; every other value is still the cost of a
+    real route, so warm-started sweeps only have to fill in the reset cells and spread the
+    cheaper or reopened ones.
+    """
+    rows, cols = grid.shape
+    field = field.copy()
+    flat = field.ravel()
+    tighter = (new == -1) | ((old != -1) & (new > old))
+    if tighter.any():
+        entry = grid.ravel().astype(float)
+        entry[ids] = old
+        entry[entry == -1] = np.inf
+        frontier = ids[tighter & np.isfinite(flat[ids])]
+        stale = np.zeros(flat.size, dtype=bool)
+        stale[frontier] = True
+        while frontier.size:
+            r, c = np.divmod(frontier, cols)
+            found = []
+            for dr, dc in CompiledGrid.MOVES:
+                nr, nc = r + dr, c + dc
+                ok = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+                u, w = nr[ok] * cols + nc[ok], frontier[ok]
+                found.append(u[~stale[u] & (flat[u] == entry[w] + flat[w])])
+            frontier = np.unique(np.concatenate(found))
+            stale[frontier] = True
+        flat[stale] = np.inf
+    return _relax_distance_field(grid, goals, init=field)
 
 class GridWorld:
-    def __init__(self, grid: np.ndarray, dynamic_obstacles: List[DynamicObstacle]=None):
+    _uids = itertools.count()
+    change_log_size = 4096
+
+    def __init__(self, grid: np.ndarray, dynamic_obstacles: List[DynamicObstacle]=None, copy: bool = True):
         """
         grid: 2D numpy array: -1 => static obstacle, >=1 => terrain cost
         dynamic_obstacles: list of DynamicObstacle
+        copy: set False to wrap an existing array (e.g. one backed by shared memory) without copying it
         """
-        self.grid = np.array(grid)
+        self.grid = np.array(grid) if copy else np.asarray(grid)
         self.rows, self.cols = self.grid.shape
         self.dynamic_obstacles = dynamic_obstacles or []
+        self.reservations = ReservationTable(self.rows, self.cols)
+        for obs in self.dynamic_obstacles:
+            self.reservations.add_obstacle(obs)
+        # the lazy caches below are shared by every agent on this grid, including thread-pool workers
+        self._cache_lock = threading.RLock()
+        self._compiled = None
+        self._distance_fields = OrderedDict()
+        self.distance_field_cache_size = 32
+        self._heuristics = {}  # heuristics.py tables (landmark distances etc.), built on first use
+        self._batch_depth = 0
+        self._pending = []  # (flat ids, old costs) of mutations not yet committed
+        self.uid = next(GridWorld._uids)
+        self.version = 0
+        self.changes = deque(maxlen=self.change_log_size)
 
     @classmethod
     def from_file(cls, file_path: str, dynamic_json: str = None):
+        with open(file_path, 'rb') as f:
+            if f.read(len(MAP_MAGIC)) == MAP_MAGIC:
+                return cls.from_binary(file_path, dynamic_json)
         grid = np.loadtxt(file_path, dtype=int)
-        dyn = []
-        if dynamic_json:
-            if dynamic_json.strip().lower() == "unpredictable":
-                # caller will handle unpredictable mode (no schedule here)
-                dyn = []
+        return cls(grid, _load_schedule(dynamic_json))
+
+    @classmethod
+    def from_binary(cls, file_path: str, dynamic_json: str = None, mmap: bool = True):
+        """
+        Loads a map written by to_binary. With mmap the cost array is memory-mapped copy-on-write:
+        loading is near-instant, processes opening the same file share its pages, and set_cost
+        edits stay private to this GridWorld (the file is never modified).
+        Obstacles from dynamic_json are added to the ones stored in the file.
+        """
+        with open(file_path, 'rb') as f:
+            magic, dtype, rows, cols, schedule_len = _MAP_HEADER.unpack(f.read(_MAP_HEADER.size))
+            if magic != MAP_MAGIC:
+                raise ValueError(f"{file_path} is not a binary map")
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+            if mmap:
+                grid = np.memmap(f, dtype=dtype, mode='c', offset=_MAP_DATA_OFFSET, shape=(rows, cols))
             else:
-                with open(dynamic_json, 'r') as f:
-                    j = json.load(f)
-                for o in j.get("moving_obstacles", []):
-                    dyn.append(DynamicObstacle(o["id"], o["path"], o.get("start_time", 0)))
-        return cls(grid, dyn)
+                f.seek(_MAP_DATA_OFFSET)
+                grid = np.fromfile(f, dtype=dtype, count=rows * cols).reshape(rows, cols)
+            dyn = []
+            if schedule_len:
+                f.seek(_MAP_DATA_OFFSET + rows * cols * dtype.itemsize)
+                dyn = _parse_schedule(json.loads(f.read(schedule_len).decode()))
+        return cls(grid, dyn + _load_schedule(dynamic_json), copy=False)
+
+    def to_binary(self, file_path: str, dtype=None, schedule: bool = True):
+        """
+        Writes the map in the binary format read by from_binary. dtype defaults to the smallest
+        signed integer type holding every cost; schedule=False leaves the obstacle section out.
+        """
+        if dtype is None:
+            top = int(self.grid.max()) if self.grid.size else 0
+            dtype = next(t for t in (np.int8, np.int16, np.int32, np.int64) if top <= np.iinfo(t).max)
+        dtype = np.dtype(dtype).newbyteorder('<')
+        payload = b""
+        if schedule and self.dynamic_obstacles:
+            payload = json.dumps({"moving_obstacles": [o.to_json() for o in self.dynamic_obstacles]}).encode()
+        with open(file_path, 'wb') as f:
+            header = _MAP_HEADER.pack(MAP_MAGIC, dtype.str.encode(), self.rows, self.cols, len(payload))
+            f.write(header.ljust(_MAP_DATA_OFFSET, b"\0"))
+            np.ascontiguousarray(self.grid, dtype=dtype).tofile(f)
+            f.write(payload)
 
     def in_bounds(self, pos: Pos) -> bool:
         r, c = pos
@@ -60,15 +396,260 @@ class GridWorld:
             if self.in_bounds(new) and self.passable(new):
                 yield new
 
+    def compile(self) -> "CompiledGrid":
+        """
+        Returns the flat array-backed view of this grid used by the *_compiled planners.
+        Built once and cached.
+        """
+        with self._cache_lock:
+            if self._compiled is None:
+                self._compiled = CompiledGrid(self)
+            return self._compiled
+
+    def distance_field(self, goals) -> np.ndarray:
+        """
+        Exact static cost-to-go from every cell to the nearest of `goals` (a position or a list of
+        positions), where entering a cell costs its terrain value and dynamic obstacles are ignored.
+        Blocked and unreachable cells are inf. Fields are cached per goal set (LRU).
+        """
+        if len(goals) == 2 and not isinstance(goals[0], (tuple, list)):
+            goals = [goals]
+        key = tuple(sorted(tuple(g) for g in goals))
+        with self._cache_lock:
+            field = self._distance_fields.get(key)
+            if field is not None:
+                self._distance_fields.move_to_end(key)
+                return field
+            field = _relax_distance_field(self.grid, key)
+            self._distance_fields[key] = field
+            if len(self._distance_fields) > self.distance_field_cache_size:
+                self._distance_fields.popitem(last=False)
+            return field
+
     def occupied_at(self, pos: Pos, t: int) -> bool:
         """
         Returns True if any dynamic obstacle occupies `pos` at time t.
+        Backed by the reservation table, so the cost does not grow with the number of obstacles.
         """
-        for obs in self.dynamic_obstacles:
-            p = obs.position_at(t)
-            if p is not None and tuple(p) == tuple(pos):
-                return True
-        return False
+        if not self.in_bounds(pos):
+            return False
+        return self.reservations.is_reserved(pos, t)
 
     def add_dynamic_obstacle(self, obstacle: DynamicObstacle):
         self.dynamic_obstacles.append(obstacle)
+        self.reservations.add_obstacle(obstacle)
+        if obstacle.period is not None:
+            self._record("obstacle", None, obstacle=obstacle)
+        else:
+            self._record("obstacle", [(p, t) for t, p in enumerate(obstacle.path, obstacle.start_time)
+                                      if t <= obstacle.last_time], obstacle=obstacle)
+
+    def forget_before(self, t: int):
+        """
+        Drops obstacles that left the map before t and the reservations of earlier timesteps.
+        Nothing is recorded in the change log: only queries about the past are affected.
+        """
+        self.dynamic_obstacles = [o for o in self.dynamic_obstacles if o.last_time >= t]
+        self.reservations.forget_before(t)
+
+    def set_cost(self, pos: Pos, value: int):
+        """Changes the terrain cost of one cell (-1 blocks it)."""
+        self.set_cells([pos], value)
+
+    def set_cells(self, cells, values):
+        """
+        Sets the terrain cost of many cells: cells is a sequence of (r, c) or an n x 2 array, values
+        one cost for all of them or one per cell (-1 blocks a cell).
+        """
+        cells = self._cell_array(cells)
+        self._assign(cells[:, 0], cells[:, 1], values)
+
+    def set_rect(self, top_left: Pos, bottom_right: Pos, value):
+        """Sets every cell of the rectangle between the two corners (both inclusive) to value."""
+        (r0, c0), (r1, c1) = self._cell_array([top_left, bottom_right]).tolist()
+        r, c = np.mgrid[r0:r1 + 1, c0:c1 + 1]
+        self._assign(r.ravel(), c.ravel(), value)
+
+    def block(self, cells):
+        """Closes cells (cost -1)."""
+        self.set_cells(cells, -1)
+
+    def unblock(self, cells, cost: int = 1):
+        """Reopens the blocked cells among `cells` with the given cost; passable cells keep theirs."""
+        cells = self._cell_array(cells)
+        cells = cells[self.grid[cells[:, 0], cells[:, 1]] == -1]
+        self._assign(cells[:, 0], cells[:, 1], cost)
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups mutations into one change: inside `with grid.batch():` every set_* / block / unblock
+        writes the cost array at once, but the version bump, the change log entry and the refresh
+        of derived state (compiled grid, cached distance fields) happen once when the outermost
+        batch ends, for the cells whose cost actually differs from before the batch.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._commit()
+
+    def _cell_array(self, cells) -> np.ndarray:
+        """cells as an n x 2 int array; any cell off the map is a ValueError (NumPy would wrap negatives)."""
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        outside = (cells[:, 0] < 0) | (cells[:, 0] >= self.rows) | (cells[:, 1] < 0) | (cells[:, 1] >= self.cols)
+        if outside.any():
+            raise ValueError(f"cell {tuple(cells[outside][0].tolist())} is outside the {self.rows}x{self.cols} grid")
+        return cells
+
+    def _assign(self, rows: np.ndarray, cols: np.ndarray, values):
+        values = np.asarray(values)
+        if np.any((values < 1) & (values != -1)):
+            raise ValueError("terrain costs are -1 (blocked) or >= 1")
+        if not rows.size:
+            return
+        top = int(values.max())
+        if top > np.iinfo(self.grid.dtype).max:
+            # a narrow map (e.g. int8 from to_binary) would wrap the cost: widen it (a private copy)
+            wide = next(t for t in (np.int16, np.int32, np.int64) if top <= np.iinfo(t).max)
+            self.grid = np.array(self.grid, dtype=np.promote_types(self.grid.dtype, wide))
+        self._pending.append((rows * self.cols + cols, self.grid[rows, cols].copy()))
+        self.grid[rows, cols] = values
+        if not self._batch_depth:
+            self._commit()
+
+    def _commit(self):
+        """Records the pending mutations as one terrain change and refreshes derived state incrementally."""
+        if not self._pending:
+            return
+        ids = np.concatenate([p[0] for p in self._pending])
+        old = np.concatenate([p[1] for p in self._pending])
+        self._pending = []
+        ids, first = np.unique(ids, return_index=True)  # keep each cell's cost from before the batch
+        old = old[first].astype(np.int64)
+        r, c = np.divmod(ids, self.cols)
+        new = self.grid[r, c].astype(np.int64)
+        changed = new != old
+        if not changed.any():
+            return
+        ids, old, new, r, c = ids[changed], old[changed], new[changed], r[changed], c[changed]
+        with self._cache_lock:
+            if self._compiled is not None:
+                self._compiled.update(ids, old, new)
+            for key, field in self._distance_fields.items():
+                self._distance_fields[key] = _update_field(self.grid, key, field, ids, old, new)
+        relaxed = bool(np.any((new != -1) & ((old == -1) | (new < old))))
+        region = (int(r.min()), int(c.min()), int(r.max()), int(c.max()))
+        self._record("terrain", list(zip(r.tolist(), c.tolist())), relaxed,
+                     old=old.tolist(), new=new.tolist(), region=region)
+
+    def _record(self, kind: str, cells, relaxed: bool = False, obstacle: DynamicObstacle = None, **terrain):
+        self.version += 1
+        self.changes.append(GridChange(self.version, kind, cells, relaxed, obstacle, **terrain))
+
+    def changes_since(self, version: int) -> Optional[List[GridChange]]:
+        """Changes after `version`, oldest first, or None if the log no longer reaches back that far."""
+        if version == self.version:
+            return []
+        if not self.changes or self.changes[0].version > version + 1:
+            return None
+        return [ch for ch in self.changes if ch.version > version]
+
+
+class CompiledGrid:
+    """
+    Flat view of a GridWorld for the hot search loops.
+    Cells are int ids (r * cols + c). Neighbors are stored CSR-style: the neighbors of
+    cell i are nbr_ids[nbr_offsets[i]:nbr_offsets[i+1]], in the same move order as
+    GridWorld.neighbors. `cost` is a contiguous copy of the terrain costs.
+    The reservation table is shared with the source grid, so obstacles added later are seen.
+    """
+    MOVES = [(1,0),(-1,0),(0,1),(0,-1)]
+
+    def __init__(self, grid: GridWorld):
+        self.rows, self.cols = grid.rows, grid.cols
+        self.n = self.rows * self.cols
+        self.reservations = grid.reservations
+        arr = np.asarray(grid.grid)
+        self.cost = np.ascontiguousarray(arr, dtype=np.int64).ravel()
+
+        ids = np.arange(self.n, dtype=np.int64).reshape(self.rows, self.cols)
+        passable = arr != -1
+        table = np.full((self.rows, self.cols, len(self.MOVES)), -1, dtype=np.int64)
+        for k, (dr, dc) in enumerate(self.MOVES):
+            # destination window for every source cell that stays in bounds
+            src_r = slice(max(0, -dr), self.rows - max(0, dr))
+            src_c = slice(max(0, -dc), self.cols - max(0, dc))
+            dst_r = slice(max(0, dr), self.rows + min(0, dr))
+            dst_c = slice(max(0, dc), self.cols + min(0, dc))
+            table[src_r, src_c, k] = np.where(passable[dst_r, dst_c], ids[dst_r, dst_c], -1)
+        table = table.reshape(self.n, len(self.MOVES))
+        valid = table >= 0
+        self._nbr_ids = table[valid]
+        self._nbr_offsets = np.concatenate(([0], np.cumsum(valid.sum(axis=1))))
+
+        # Python-side mirrors: scalar indexing into lists is much cheaper than into NumPy
+        flat = self._nbr_ids.tolist()
+        offs = self._nbr_offsets.tolist()
+        self.adjacency = [tuple(flat[offs[i]:offs[i+1]]) for i in range(self.n)]
+        self.cost_list = self.cost.tolist()
+
+    @property
+    def nbr_ids(self) -> np.ndarray:
+        if self._nbr_ids is None:
+            self._build_csr()
+        return self._nbr_ids
+
+    @property
+    def nbr_offsets(self) -> np.ndarray:
+        if self._nbr_offsets is None:
+            self._build_csr()
+        return self._nbr_offsets
+
+    def _build_csr(self):
+        self._nbr_ids = np.fromiter(itertools.chain.from_iterable(self.adjacency), dtype=np.int64)
+        self._nbr_offsets = np.concatenate(([0], np.cumsum([len(a) for a in self.adjacency]))).astype(np.int64)
+
+    def update(self, ids: np.ndarray, old: np.ndarray, new: np.ndarray):
+        """
+        Applies terrain changes of the cells `ids` (called by GridWorld when it commits a mutation):
+        costs are patched in place, and only cells next to a cell that was blocked or unblocked get
+        their adjacency rebuilt. The CSR arrays are rebuilt lazily if someone reads them.
+        """
+        self.cost[ids] = new
+        cost_list = self.cost_list
+        for i, v in zip(ids.tolist(), new.tolist()):
+            cost_list[i] = v
+        flipped = ids[(old == -1) != (new == -1)]
+        if not flipped.size:
+            return
+        rows, cols = self.rows, self.cols
+        r, c = np.divmod(flipped, cols)
+        touched = {int(i) for i in flipped}
+        for dr, dc in self.MOVES:
+            nr, nc = r + dr, c + dc
+            ok = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+            touched.update((nr[ok] * cols + nc[ok]).tolist())
+        for i in touched:
+            ir, ic = divmod(i, cols)
+            nbrs = []
+            for dr, dc in self.MOVES:
+                nr, nc = ir + dr, ic + dc
+                if 0 <= nr < rows and 0 <= nc < cols and cost_list[nr * cols + nc] != -1:
+                    nbrs.append(nr * cols + nc)
+            self.adjacency[i] = tuple(nbrs)
+        self._nbr_ids = self._nbr_offsets = None
+
+    def cell_id(self, pos: Pos) -> int:
+        return pos[0] * self.cols + pos[1]
+
+    def pos_of(self, cell: int) -> Pos:
+        return (cell // self.cols, cell % self.cols)
+
+    def manhattan_to(self, goal: Pos) -> List[int]:
+        """Manhattan distance from every cell to `goal`, as a flat list indexed by cell id."""
+        r = np.abs(np.arange(self.rows) - goal[0])
+        c = np.abs(np.arange(self.cols) - goal[1])
+        return (r[:, None] + c[None, :]).ravel().tolist()
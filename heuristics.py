@@ -0,0 +1,260 @@
+# heuristics.py
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+from grid import GridWorld, _relax_distance_field, _update_field
+import search
+
+Pos = Tuple[int, int]
+
+# Every heuristic here is admissible and consistent for the time-aware planners: it bounds the
+# static cost-to-go (entering a cell costs its terrain value), and dynamic obstacles only add to that.
+
+class ScaledManhattan:
+    """
+    Manhattan distance times the cheapest passable terrain cost: every step costs at least that,
+    so on maps whose cheapest terrain is above 1 it is a much tighter bound than plain manhattan.
+    for_goal is evaluated per state; the flat table is only built (and kept for the last
+    goal_cache_size goals) when a compiled planner asks for it.
+    """
+    goal_cache_size = 16
+
+    def __init__(self, grid: GridWorld):
+        self.rows, self.cols = grid.rows, grid.cols
+        self._goals: "OrderedDict[Pos, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()  # shared by thread-pool workers through the grid's cache
+        self.update(grid, None)
+
+    def update(self, grid: GridWorld, changed):
+        arr = np.asarray(grid.grid)
+        passable = arr[arr != -1]
+        self.min_cost = int(passable.min()) if passable.size else 1
+        with self._lock:
+            self._goals.clear()
+
+    def __call__(self, pos: Pos, goal: Pos) -> int:
+        return self.min_cost * (abs(pos[0] - goal[0]) + abs(pos[1] - goal[1]))
+
+    def table(self, goal: Pos) -> List[int]:
+        with self._lock:
+            flat = self._goals.get(goal)
+            if flat is None:
+                r = np.abs(np.arange(self.rows) - goal[0])
+                c = np.abs(np.arange(self.cols) - goal[1])
+                flat = self._goals[goal] = (self.min_cost * (r[:, None] + c[None, :])).ravel().tolist()
+                if len(self._goals) > self.goal_cache_size:
+                    self._goals.popitem(last=False)
+            else:
+                self._goals.move_to_end(goal)
+            return flat
+
+    def for_goal(self, goal: Pos) -> "_Lazy":
+        return _Lazy(self, tuple(goal))
+
+class GoalTable:
+    """A per-cell heuristic for one goal: h(pos, goal) lookups and the flat list the compiled planners take."""
+    def __init__(self, flat: List[float], cols: int):
+        self.flat = flat
+        self.cols = cols
+
+    def __call__(self, pos: Pos, goal: Pos = None) -> float:
+        return self.flat[pos[0] * self.cols + pos[1]]
+
+def select_landmarks(grid: GridWorld, count: int, seed: int = 0, probes: int = 4):
+    """
+    Farthest-point landmark placement in the map's largest connected region (found from a few
+    random probe cells): the first landmark is the cell of that region farthest from the probe,
+    each next one the cell farthest from all landmarks chosen so far. Small walled-off pockets get
+    none; their cells just see h = 0 from the table. Returns the landmarks and their
+    count x cells table of cost-to-landmark distances (inf: unreachable).
+    """
+    arr = np.asarray(grid.grid)
+    cells = np.flatnonzero(arr.ravel() != -1)
+    if not cells.size:
+        return [], np.empty((0, arr.size))
+    rng = np.random.default_rng(seed)
+    probe = None
+    for cell in rng.choice(cells, size=min(probes, cells.size), replace=False).tolist():
+        if probe is not None and np.isfinite(probe[cell]):
+            continue  # same region as the probe we have
+        d = _relax_distance_field(arr, [divmod(cell, grid.cols)]).ravel()
+        if probe is None or np.isfinite(d).sum() > np.isfinite(probe).sum():
+            probe = d
+    region = np.isfinite(probe)
+    score = np.where(region, probe, -np.inf)
+    landmarks, rows = [], []
+    nearest = np.full(arr.size, np.inf)
+    for _ in range(min(count, int(region.sum()))):
+        lm = divmod(int(np.argmax(score)), grid.cols)
+        d = _relax_distance_field(arr, [lm]).ravel()
+        landmarks.append(lm)
+        rows.append(d)
+        nearest = np.minimum(nearest, d)
+        score = np.where(region, nearest, -np.inf)
+        score[[grid.cols * r + c for r, c in landmarks]] = -np.inf
+    return landmarks, np.vstack(rows)
+
+class LandmarkHeuristic:
+    """
+    ALT heuristic (A*, Landmarks, Triangle inequality; Goldberg & Harrelson 2005). For every
+    landmark L the table holds d(x -> L) for all cells; since entering a cell costs its terrain
+    value, d(L -> x) = d(x -> L) - cost(L) + cost(x), so one table per landmark gives both
+    directions and
+        h(n) = max_L max(d(n -> L) - d(g -> L), d(L -> g) - d(L -> n))
+    Built once per grid (see get). for_goal(goal) evaluates the bound for every
+    cell at once with NumPy and keeps the last goal_cache_size goals' tables.
+    """
+    goal_cache_size = 64
+
+    def __init__(self, grid: GridWorld, landmarks: int = 8, seed: int = 0):
+        self.cols = grid.cols
+        self.landmarks, self.dist = select_landmarks(grid, landmarks, seed)
+        self.cost = np.asarray(grid.grid, dtype=float).ravel()
+        self._goals: "OrderedDict[Pos, GoalTable]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, grid: GridWorld, changed):
+        """
+        Refreshes the tables after terrain changes ((ids, old, new) flat arrays): each landmark row
+        is repaired by grid._update_field around the changed cells. The landmarks stay where they are.
+        """
+        ids, old, new = changed
+        arr = np.asarray(grid.grid)
+        for k, lm in enumerate(self.landmarks):
+            self.dist[k] = _update_field(arr, [lm], self.dist[k].reshape(arr.shape), ids, old, new).ravel()
+        self.cost = arr.astype(float).ravel()
+        with self._lock:
+            self._goals.clear()
+
+    def bounds(self, goal: Pos) -> np.ndarray:
+        """The ALT lower bound from every cell to goal (flat array; inf where goal is unreachable)."""
+        g = goal[0] * self.cols + goal[1]
+        D = self.dist
+        if not len(D):
+            return np.zeros(self.cost.size)
+        to_g = D[:, g:g + 1]
+        with np.errstate(invalid="ignore"):
+            fwd = D - to_g
+            back = to_g - D + (self.cost[g] - self.cost)[None, :]
+            h = np.fmax(fwd, back)
+        # nan: neither the cell nor the goal reaches this landmark, so it says nothing
+        h = np.where(np.isnan(h), 0.0, h).max(axis=0)
+        return np.maximum(h, 0.0)
+
+    def for_goal(self, goal: Pos) -> GoalTable:
+        goal = tuple(goal)
+        with self._lock:
+            table = self._goals.get(goal)
+            if table is None:
+                table = self._goals[goal] = GoalTable(self.bounds(goal).tolist(), self.cols)
+                if len(self._goals) > self.goal_cache_size:
+                    self._goals.popitem(last=False)
+            else:
+                self._goals.move_to_end(goal)
+            return table
+
+    def __call__(self, pos: Pos, goal: Pos) -> float:
+        return self.for_goal(goal)(pos)
+
+class DifferentialHeuristic(LandmarkHeuristic):
+    """
+    Differential heuristic (Sturtevant et al. 2009): the same triangle-inequality bound from a
+    few pivots, evaluated only for the states the search actually generates instead of as a
+    whole-map table per goal. Suits streams of one-off queries to many different goals, where
+    for_goal's O(landmarks x cells) table would cost more than the search itself.
+    """
+    def __init__(self, grid: GridWorld, landmarks: int = 4, seed: int = 0):
+        super().__init__(grid, landmarks, seed)
+        self._lists = self.dist.tolist()
+        self._cost = self.cost.tolist()
+
+    def update(self, grid: GridWorld, changed):
+        super().update(grid, changed)
+        self._lists = self.dist.tolist()
+        self._cost = self.cost.tolist()
+
+    def __call__(self, pos: Pos, goal: Pos) -> float:
+        n, g = pos[0] * self.cols + pos[1], goal[0] * self.cols + goal[1]
+        inf = float('inf')
+        best = 0.0
+        for to in self._lists:
+            tn, tg = to[n], to[g]
+            if tn == inf or tg == inf:
+                if tn != tg:
+                    return inf  # exactly one of them reaches this pivot: different regions
+                continue
+            best = max(best, tn - tg, tg - tn + self._cost[g] - self._cost[n])
+        return best
+
+    def table(self, goal: Pos) -> List[float]:
+        return LandmarkHeuristic.for_goal(self, goal).flat
+
+    def for_goal(self, goal: Pos) -> "_Lazy":
+        return _Lazy(self, tuple(goal))
+
+class _Lazy:
+    """A per-state heuristic bound to one goal; its flat table is only built if a compiled planner asks."""
+    def __init__(self, h, goal: Pos):
+        self.h, self.goal = h, goal
+
+    def __call__(self, pos: Pos, goal: Pos = None) -> float:
+        return self.h(pos, self.goal)
+
+    @property
+    def flat(self) -> List[float]:
+        return self.h.table(self.goal)
+
+KINDS = {"scaled": ScaledManhattan, "alt": LandmarkHeuristic, "differential": DifferentialHeuristic}
+
+def terrain_changes(grid: GridWorld, version: int):
+    """
+    Terrain changes since `version` merged into flat (ids, old, new) arrays (each cell's cost then
+    and now); None if the change log no longer reaches back that far, () if nothing changed.
+    """
+    changes = grid.changes_since(version)
+    if changes is None:
+        return None
+    terrain = [ch for ch in changes if ch.kind == "terrain"]
+    if not terrain:
+        return ()
+    ids = np.array([r * grid.cols + c for ch in terrain for r, c in ch.cells], dtype=np.int64)
+    old = np.array([v for ch in terrain for v in ch.old], dtype=np.int64)
+    ids, first = np.unique(ids, return_index=True)
+    old = old[first]
+    new = np.asarray(grid.grid).ravel()[ids].astype(np.int64)
+    keep = new != old
+    return ids[keep], old[keep], new[keep]
+
+def get(grid: GridWorld, kind: str, **params):
+    """
+    The grid's `kind` heuristic with these params, built once and reused by every query. Terrain
+    edits (GridWorld.set_cells, batch, ...) are applied incrementally on the next call.
+    """
+    key = (kind, tuple(sorted(params.items())))
+    with grid._cache_lock:
+        h = grid._heuristics.get(key)
+        if h is not None and h.version != grid.version:
+            changed = terrain_changes(grid, h.version)
+            if changed is None:
+                h = None
+            elif changed and len(changed[0]):
+                h.update(grid, changed)
+        if h is None:
+            if kind not in KINDS:
+                raise ValueError("Unknown heuristic")
+            h = grid._heuristics[key] = KINDS[kind](grid, **params)
+        h.version = grid.version
+        return h
+
+def for_goal(grid: GridWorld, kind: str, goal: Pos, **params):
+    """
+    h(pos, goal) for one query, with a `flat` per-cell list for the compiled planners:
+    'manhattan' (None: the planners' default), 'scaled', 'alt', 'differential' or
+    'field' (exact cost-to-go, search.FieldHeuristic).
+    """
+    if kind == "manhattan":
+        return None
+    if kind == "field":
+        return search.FieldHeuristic(grid, goal)
+    return get(grid, kind, **params).for_goal(goal)
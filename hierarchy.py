@@ -0,0 +1,409 @@
+# hierarchy.py
+import heapq
+import time
+from array import array
+import numpy as np
+from typing import Dict, List, Tuple, Optional
+from grid import GridWorld
+import search
+
+Pos = Tuple[int, int]
+Cluster = Tuple[int, int]
+
+class JumpTables:
+    """
+    Precomputed jumps for jps() (the JPS+ idea): for every cell, the first column to the right/left
+    and the first row below/above where a jump in that direction stops - a wall, the map edge, or a
+    jump point. Horizontal jump points are cells with a forced neighbor; vertical ones are cells from
+    which a horizontal jump reaches a jump point. Built with NumPy in O(rows*cols); stored in flat
+    int arrays so each jump is a single lookup.
+    """
+    def __init__(self, grid: GridWorld):
+        free = grid.grid != -1
+        R, C = free.shape
+        self.rows, self.cols = R, C
+        pad = np.zeros((R + 2, C + 2), dtype=bool)
+        pad[1:-1, 1:-1] = free
+        above, below = pad[:-2, 1:-1], pad[2:, 1:-1]
+        forced_r = free & ((above & ~pad[:-2, :-2]) | (below & ~pad[2:, :-2]))
+        forced_l = free & ((above & ~pad[:-2, 2:]) | (below & ~pad[2:, 2:]))
+        cols = np.arange(C)
+        right = _next_stop(np.where(forced_r | ~free, cols, C), np.minimum, C)
+        left = _next_stop(np.where(forced_l | ~free, cols, -1)[:, ::-1], np.maximum, -1)[:, ::-1]
+        rr = np.arange(R)[:, None]
+        hits = ((right < C) & free[rr, np.minimum(right, C - 1)]) | ((left >= 0) & free[rr, np.maximum(left, 0)])
+        rows = np.arange(R)[:, None]
+        down = _next_stop(np.where(hits | ~free, rows, R).T, np.minimum, R).T
+        up = _next_stop(np.where(hits | ~free, rows, -1).T[:, ::-1], np.maximum, -1)[:, ::-1].T
+        self.free = _flat(free)
+        self.right, self.left, self.down, self.up = _flat(right), _flat(left), _flat(down), _flat(up)
+
+def _next_stop(idx, op, none):
+    """For each column j of idx, op over idx[:, j+1:] (none when empty)."""
+    acc = op.accumulate(idx[:, ::-1], axis=1)[:, ::-1]
+    out = np.full_like(acc, none)
+    out[:, :-1] = acc[:, 1:]
+    return out
+
+def _flat(a):
+    out = array('i')
+    out.frombytes(np.ascontiguousarray(a, dtype=np.int32).tobytes())
+    return out
+
+def jps(grid: GridWorld, start: Pos, goal: Pos, bounds: Tuple[int, int, int, int] = None,
+        tables: JumpTables = None):
+    """
+    Jump Point Search for 4-connected grids where every passable cell has the same cost.
+    Vertical jumps stop where a horizontal jump would find something, and horizontal jumps stop only
+    at the goal or at forced neighbors (a perpendicular cell that opens up right after a wall), so
+    long symmetric stretches are crossed without expanding the cells in between.
+    bounds: optional inclusive (r0, r1, c0, c1) window the search may not leave.
+    tables: JumpTables of the grid (built here if not given; reuse them across queries).
+    Returns (path, stats) with the full cell-by-cell path.
+    """
+    stats = search.SearchStats()
+    t0 = time.perf_counter()
+    tables = tables or JumpTables(grid)
+    C = tables.cols
+    free, right, left, down, up = tables.free, tables.right, tables.left, tables.down, tables.up
+    r0, r1, c0, c1 = bounds or (0, grid.rows - 1, 0, grid.cols - 1)
+    gr, gc = goal
+    unit = grid.cost(goal)
+
+    def jump_h(r, c, dc):
+        if dc > 0:
+            s = right[r * C + c]
+            if r == gr and c < gc < s:
+                return goal
+            if s > c1 or not free[r * C + s]:
+                return None
+        else:
+            s = left[r * C + c]
+            if r == gr and s < gc < c:
+                return goal
+            if s < c0 or not free[r * C + s]:
+                return None
+        return (r, s)
+
+    def jump_v(r, c, dr):
+        if dr > 0:
+            s = down[r * C + c]
+            crosses = r < gr < s
+            if s > r1 or not free[s * C + c]:
+                s = None
+        else:
+            s = up[r * C + c]
+            crosses = s < gr < r
+            if s < r0 or not free[s * C + c]:
+                s = None
+        if crosses and (r0 <= gr <= r1) and (gc == c or jump_h(gr, c, 1 if gc > c else -1) == goal):
+            return (gr, c)
+        return None if s is None else (s, c)
+
+    inside = lambda p: r0 <= p[0] <= r1 and c0 <= p[1] <= c1 and free[p[0] * C + p[1]]
+    if not inside(start) or not inside(goal):
+        stats.time_taken = time.perf_counter() - t0
+        return [], stats
+    frontier = [(search.manhattan(start, goal) * unit, 0, start)]
+    came_from = {start: None}
+    best = {start: 0}
+    while frontier:
+        _, g, cur = heapq.heappop(frontier)
+        if g > best[cur]:
+            continue
+        stats.nodes_expanded += 1
+        if cur == goal:
+            points = []
+            while cur is not None:
+                points.append(cur)
+                cur = came_from[cur]
+            points.reverse()
+            path = [points[0]]
+            for (ar, ac), (br, bc) in zip(points, points[1:]):
+                if ar == br:
+                    step = 1 if bc > ac else -1
+                    path.extend((ar, c) for c in range(ac + step, bc + step, step))
+                else:
+                    step = 1 if br > ar else -1
+                    path.extend((r, ac) for r in range(ar + step, br + step, step))
+            stats.time_taken = time.perf_counter() - t0
+            return path, stats
+        r, c = cur
+        for nxt in (jump_v(r, c, 1), jump_v(r, c, -1), jump_h(r, c, 1), jump_h(r, c, -1)):
+            if nxt is None:
+                continue
+            ng = g + search.manhattan(cur, nxt) * unit
+            if ng < best.get(nxt, float('inf')):
+                best[nxt] = ng
+                came_from[nxt] = cur
+                heapq.heappush(frontier, (ng + search.manhattan(nxt, goal) * unit, ng, nxt))
+    stats.time_taken = time.perf_counter() - t0
+    return [], stats
+
+class HierarchicalPlanner:
+    """
+    HPA*-style planner (Botea et al. 2004) over the static grid.
+    The map is cut into square clusters. Along every cluster border, each maximal run of cells
+    passable on both sides gets one transition (two for long runs); the transition cells are the
+    abstract nodes, linked by inter-cluster steps and by intra-cluster shortest paths computed
+    with Dijkstra restricted to one cluster. A query connects start and goal to the nodes of
+    their clusters, searches the small abstract graph, and refines each abstract edge inside its
+    cluster (with JPS when the cluster has uniform cost). Paths are near-optimal, not optimal.
+
+    Terrain edits are picked up from the grid's change log by refresh(): only the edited cell's
+    cluster borders and the intra edges of the clusters around it are rebuilt.
+    Dynamic obstacles are ignored; DeliveryAgent falls back to time-aware search while they are scheduled.
+    """
+    long_run = 6  # runs at least this long get a transition at each end
+
+    def __init__(self, grid: GridWorld, cluster_size: int = 16):
+        self.grid = grid
+        self.size = cluster_size
+        self.crows = (grid.rows + cluster_size - 1) // cluster_size
+        self.ccols = (grid.cols + cluster_size - 1) // cluster_size
+        self.borders: Dict[Tuple[Cluster, Cluster], List[Tuple[Pos, Pos]]] = {}
+        self.inter: Dict[Pos, Dict[Pos, int]] = {}
+        self.intra: Dict[Cluster, Dict[Pos, Dict[Pos, int]]] = {}
+        self.uniform: Dict[Cluster, bool] = {}
+        self._jumps: Optional[JumpTables] = None
+        self.version = grid.version
+        for cr in range(self.crows):
+            for cc in range(self.ccols):
+                if cc + 1 < self.ccols:
+                    self._build_border((cr, cc), (cr, cc + 1))
+                if cr + 1 < self.crows:
+                    self._build_border((cr, cc), (cr + 1, cc))
+        for cr in range(self.crows):
+            for cc in range(self.ccols):
+                self._build_intra((cr, cc))
+
+    def cluster_of(self, pos: Pos) -> Cluster:
+        return (pos[0] // self.size, pos[1] // self.size)
+
+    def bounds(self, cid: Cluster) -> Tuple[int, int, int, int]:
+        r0, c0 = cid[0] * self.size, cid[1] * self.size
+        return r0, min(r0 + self.size, self.grid.rows) - 1, c0, min(c0 + self.size, self.grid.cols) - 1
+
+    def nodes(self, cid: Cluster):
+        return self.intra.get(cid, {}).keys()
+
+    def _neighbor_clusters(self, cid: Cluster):
+        cr, cc = cid
+        for n in ((cr - 1, cc), (cr + 1, cc), (cr, cc - 1), (cr, cc + 1)):
+            if 0 <= n[0] < self.crows and 0 <= n[1] < self.ccols:
+                yield n
+
+    def _border_key(self, a: Cluster, b: Cluster):
+        return (a, b) if a < b else (b, a)
+
+    def _build_border(self, a: Cluster, b: Cluster):
+        a, b = self._border_key(a, b)
+        for p, q in self.borders.get((a, b), []):
+            self.inter.get(p, {}).pop(q, None)
+            self.inter.get(q, {}).pop(p, None)
+        ar0, ar1, ac0, ac1 = self.bounds(a)
+        br0, br1, bc0, bc1 = self.bounds(b)
+        if a[0] == b[0]:  # side by side: border between columns ac1 and bc0
+            pairs = [((r, ac1), (r, bc0)) for r in range(ar0, ar1 + 1)]
+        else:             # stacked: border between rows ar1 and br0
+            pairs = [((ar1, c), (br0, c)) for c in range(ac0, ac1 + 1)]
+        passable = self.grid.passable
+        transitions = []
+        run = []
+        for p, q in pairs + [(None, None)]:
+            if p is not None and passable(p) and passable(q):
+                run.append((p, q))
+                continue
+            if run:
+                if len(run) >= self.long_run:
+                    transitions += [run[0], run[-1]]
+                else:
+                    transitions.append(run[len(run) // 2])
+                run = []
+        self.borders[(a, b)] = transitions
+        for p, q in transitions:
+            self.inter.setdefault(p, {})[q] = self.grid.cost(q)
+            self.inter.setdefault(q, {})[p] = self.grid.cost(p)
+
+    def _cluster_nodes(self, cid: Cluster):
+        nodes = set()
+        for n in self._neighbor_clusters(cid):
+            for p, q in self.borders.get(self._border_key(cid, n), []):
+                nodes.add(p if self.cluster_of(p) == cid else q)
+        return nodes
+
+    def _dijkstra(self, src: Pos, cid: Cluster, targets, reverse: bool = False) -> Dict[Pos, int]:
+        """
+        Costs from src (or to src if reverse) to the reachable targets, staying inside cluster cid.
+        Stops as soon as every target is settled.
+        """
+        r0, r1, c0, c1 = self.bounds(cid)
+        block = self.grid.grid[r0:r1 + 1, c0:c1 + 1].tolist()
+        left = set(targets)
+        found = {}
+        dist = {src: 0}
+        frontier = [(0, src)]
+        while frontier and left:
+            d, u = heapq.heappop(frontier)
+            if d > dist[u]:
+                continue
+            if u in left:
+                left.discard(u)
+                found[u] = d
+            r, c = u
+            here = block[r - r0][c - c0]
+            for v in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                if not (r0 <= v[0] <= r1 and c0 <= v[1] <= c1):
+                    continue
+                there = block[v[0] - r0][v[1] - c0]
+                if there == -1:
+                    continue
+                nd = d + (here if reverse else there)
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    heapq.heappush(frontier, (nd, v))
+        return found
+
+    def _build_intra(self, cid: Cluster):
+        r0, r1, c0, c1 = self.bounds(cid)
+        block = self.grid.grid[r0:r1 + 1, c0:c1 + 1]
+        costs = block[block != -1]
+        self.uniform[cid] = costs.size == 0 or costs.min() == costs.max()
+        edges = {}
+        nodes = self._cluster_nodes(cid)
+        for a in nodes:
+            dist = self._dijkstra(a, cid, nodes)
+            edges[a] = {b: d for b, d in dist.items() if b != a}
+        self.intra[cid] = edges
+
+    def update_cell(self, pos: Pos):
+        """Rebuilds the borders of pos's cluster and the intra edges of it and its neighbors."""
+        cid = self.cluster_of(pos)
+        around = list(self._neighbor_clusters(cid))
+        stale = set(self.nodes(cid))
+        for n in around:
+            stale |= set(self.nodes(n))
+            self._build_border(cid, n)
+        for cluster in [cid] + around:
+            self._build_intra(cluster)
+        self._jumps = None
+        # drop inter entries of nodes that stopped being transitions
+        for p in stale:
+            if p not in self.intra.get(self.cluster_of(p), {}) and not self.inter.get(p):
+                self.inter.pop(p, None)
+
+    def refresh(self):
+        """Applies terrain edits recorded in the grid's change log since the last refresh."""
+        changes = self.grid.changes_since(self.version)
+        if changes is None:
+            self.__init__(self.grid, self.size)
+            return
+        dirty = {self.cluster_of(p) for ch in changes if ch.kind == "terrain" for p in ch.cells}
+        for cid in dirty:
+            self.update_cell((cid[0] * self.size, cid[1] * self.size))
+        self.version = self.grid.version
+
+    def _refine(self, a: Pos, b: Pos, stats) -> List[Pos]:
+        """Concrete path for one abstract edge: a border step, or a route inside a single cluster."""
+        if search.manhattan(a, b) == 1 and self.cluster_of(a) != self.cluster_of(b):
+            return [a, b]
+        cid = self.cluster_of(a)
+        bounds = self.bounds(cid)
+        if self.uniform[cid]:
+            if self._jumps is None:
+                self._jumps = JumpTables(self.grid)
+            path, s = jps(self.grid, a, b, bounds, self._jumps)
+        else:
+            path, s = _bounded_astar(self.grid, a, b, bounds)
+        stats.nodes_expanded += s.nodes_expanded
+        return path
+
+    def plan(self, start: Pos, goal: Pos):
+        """Returns (path, stats) for a static query."""
+        stats = search.SearchStats()
+        t0 = time.perf_counter()
+        self.refresh()
+        if not (self.grid.passable(start) and self.grid.passable(goal)):
+            stats.time_taken = time.perf_counter() - t0
+            return [], stats
+        sc, gc = self.cluster_of(start), self.cluster_of(goal)
+        from_start = self._dijkstra(start, sc, list(self.nodes(sc)) + [goal])
+        to_goal = self._dijkstra(goal, gc, self.nodes(gc), reverse=True)
+
+        def successors(u):
+            if u == start:
+                for v in self.nodes(sc):
+                    if v in from_start:
+                        yield v, from_start[v]
+                if goal in from_start:
+                    yield goal, from_start[goal]
+                yield from self.inter.get(u, {}).items()
+                return
+            for v, w in self.intra.get(self.cluster_of(u), {}).get(u, {}).items():
+                yield v, w
+            for v, w in self.inter.get(u, {}).items():
+                yield v, w
+            if self.cluster_of(u) == gc and u in to_goal:
+                yield goal, to_goal[u]
+
+        frontier = [(search.manhattan(start, goal), 0, start)]
+        best = {start: 0}
+        came_from = {start: None}
+        while frontier:
+            _, g, u = heapq.heappop(frontier)
+            if g > best[u]:
+                continue
+            stats.nodes_expanded += 1
+            if u == goal:
+                break
+            for v, w in successors(u):
+                ng = g + w
+                if ng < best.get(v, float('inf')):
+                    best[v] = ng
+                    came_from[v] = u
+                    heapq.heappush(frontier, (ng + search.manhattan(v, goal), ng, v))
+        if goal not in came_from:
+            stats.time_taken = time.perf_counter() - t0
+            return [], stats
+        abstract = []
+        u = goal
+        while u is not None:
+            abstract.append(u)
+            u = came_from[u]
+        abstract.reverse()
+
+        path = [start]
+        for a, b in zip(abstract, abstract[1:]):
+            seg = self._refine(a, b, stats)
+            path.extend(seg[1:])
+        stats.time_taken = time.perf_counter() - t0
+        return path, stats
+
+def _bounded_astar(grid: GridWorld, start: Pos, goal: Pos, bounds):
+    """Static A* that never leaves the inclusive (r0, r1, c0, c1) window."""
+    stats = search.SearchStats()
+    r0, r1, c0, c1 = bounds
+    frontier = [(search.manhattan(start, goal), 0, start)]
+    came_from = {start: None}
+    best = {start: 0}
+    while frontier:
+        _, g, u = heapq.heappop(frontier)
+        if g > best[u]:
+            continue
+        stats.nodes_expanded += 1
+        if u == goal:
+            path = []
+            while u is not None:
+                path.append(u)
+                u = came_from[u]
+            path.reverse()
+            return path, stats
+        for v in grid.neighbors(u):
+            if not (r0 <= v[0] <= r1 and c0 <= v[1] <= c1):
+                continue
+            ng = g + grid.cost(v)
+            if ng < best.get(v, float('inf')):
+                best[v] = ng
+                came_from[v] = u
+                heapq.heappush(frontier, (ng + search.manhattan(v, goal), ng, v))
+    return [], stats
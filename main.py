@@ -3,9 +3,10 @@ import argparse
 import numpy as np
 import json
 from grid import GridWorld, DynamicObstacle
-from agent import DeliveryAgent
+from agent import DeliveryAgent, write_metrics
+from simulation import SurpriseGenerator, simulate, record
+import render
 import time
-import matplotlib.pyplot as plt
 import os
 
 def load_dynamic(json_path):
@@ -13,63 +14,58 @@ def load_dynamic(json_path):
         j = json.load(f)
     obstacles = []
     for o in j.get("moving_obstacles", []):
-        obstacles.append(DynamicObstacle(o["id"], o["path"], o.get("start_time", 0)))
+        obstacles.append(DynamicObstacle.from_json(o))
     return obstacles
 
 def print_ascii(grid: GridWorld, agent_pos=None, goal=None, occupied_positions=None):
-    rows, cols = grid.rows, grid.cols
-    for r in range(rows):
-        line = ""
-        for c in range(cols):
-            if agent_pos == (r,c):
-                ch = "A"
-            elif goal == (r,c):
-                ch = "G"
-            elif grid.grid[r,c] == -1:
-                ch = "#"
-            elif occupied_positions and (r,c) in occupied_positions:
-                ch = "X"
-            elif grid.grid[r,c] == 1:
-                ch = "."
-            else:
-                ch = str(int(grid.grid[r,c]))
-            line += ch + " "
-        print(line)
+    print(render.ascii_frame(grid, agent_pos, goal, occupied_positions))
     print()
 
 def visualize_path(grid: GridWorld, path, out_file="path.png"):
-    fig, ax = plt.subplots(figsize=(6,6))
-    ax.set_xticks([])
-    ax.set_yticks([])
-    arr = grid.grid.copy()
-    rows, cols = grid.rows, grid.cols
-    # show grid as image
-    ax.imshow(arr, cmap='gray_r', origin='upper')
-    # plot obstacles from dynamic as red crosses
-    for obs in grid.dynamic_obstacles:
-        for i,p in enumerate(obs.path):
-            ax.plot(p[1], p[0], marker='x')
-    if path:
-        ys = [p[0] for p in path]
-        xs = [p[1] for p in path]
-        ax.plot(xs, ys, marker='o', linestyle='-')
-    plt.savefig(out_file)
+    # one RGB frame built with array ops, about 600 px on its long side
+    scale = max(1, 600 // max(grid.rows, grid.cols))
+    goal = path[-1] if path else None
+    render.save_image(render.render_frame(grid, path, goal=goal, scale=scale), out_file)
     print(f"Saved visualization to {out_file}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--map", required=True, help="map file (txt)")
-    parser.add_argument("--algo", default="astar", choices=["bfs","ucs","astar"])
+    parser.add_argument("--algo", default="astar", choices=["bfs","ucs","astar","compact","sipp","hpa","wastar","ara"])
     parser.add_argument("--start", type=int, nargs=2, required=True)
     parser.add_argument("--goal", type=int, nargs=2, required=True)
     parser.add_argument("--dynamic", help="path to dynamic json schedule OR 'unpredictable' for random surprises", default=None)
     parser.add_argument("--visualize", action="store_true", help="Save visualization PNG")
+    parser.add_argument("--compiled", action="store_true", help="Plan on the array-backed compiled grid")
+    parser.add_argument("--replanner", default="repair", choices=["repair","dstar"],
+                        help="local replanner for unpredictable obstacles")
+    parser.add_argument("--heuristic", default="manhattan", choices=["manhattan","scaled","alt","differential","field"],
+                        help="A* heuristic: manhattan, terrain-scaled manhattan, ALT landmarks, differential "
+                             "heuristic or exact cached distance field")
+    parser.add_argument("--landmarks", type=int, default=8, help="landmarks for the alt/differential heuristics")
+    parser.add_argument("--epsilon", type=float, default=1.5,
+                        help="heuristic weight for wastar (cost <= epsilon x optimal), starting weight for ara")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds per plan for astar/wastar/ara; ara returns its best path so far")
+    parser.add_argument("--profile", action="store_true", help="Collect hot-path counters and timings per plan")
+    parser.add_argument("--metrics", default=None, help="Append per-plan metrics to this JSON Lines file")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the unpredictable surprise obstacles")
+    parser.add_argument("--surprise-rate", type=float, default=0.1,
+                        help="chance per step that a surprise obstacle appears (unpredictable mode)")
+    parser.add_argument("--events", default=None,
+                        help="stream step/plan events to this JSON Lines file (.gz to compress) instead of "
+                             "keeping the run in memory")
+    parser.add_argument("--animate", default=None, help="write the run as an animated GIF to this file")
+    parser.add_argument("--frame-stride", type=int, default=1, help="animate every n-th timestep")
     args = parser.parse_args()
 
     # load grid
     grid = GridWorld.from_file(args.map, dynamic_json=(args.dynamic if args.dynamic and args.dynamic!="unpredictable" else None))
-    # if unpredictable, we'll not load schedule (but main will simulate surprises by marking random occupied cells using a seed)
-    agent = DeliveryAgent(grid, algo=args.algo)
+    # if unpredictable, we'll not load schedule; seeded surprise obstacles appear while the agent drives
+    surprises = SurpriseGenerator(rate=args.surprise_rate, seed=args.seed) if args.dynamic == "unpredictable" else None
+    agent = DeliveryAgent(grid, algo=args.algo, replanner=args.replanner, compiled=args.compiled,
+                           heuristic=args.heuristic, profile=args.profile, epsilon=args.epsilon,
+                           time_budget=args.time_budget, landmarks=args.landmarks)
 
     start = tuple(args.start)
     goal = tuple(args.goal)
@@ -81,7 +77,24 @@ if __name__ == "__main__":
             grid.add_dynamic_obstacle(o)
 
     print("Map loaded. Start:", start, "Goal:", goal, "Algo:", args.algo, "Dynamic:", args.dynamic)
-    logs = agent.follow_and_replan(start, goal, dynamic_unpredictable=(args.dynamic=="unpredictable"))
+    if args.events or args.animate:
+        events = simulate(agent, [("agent", start, goal)], surprises)
+        recorder = render.FrameRecorder() if args.animate else None
+        if recorder is not None:
+            events = recorder.tap(events)
+        summary = record(events, args.events)
+        print("Success:", summary["deliveries"] == 1)
+        print("Steps: {steps}, plans: {plans}, surprises: {surprises}, nodes expanded: {nodes_expanded}, "
+              "planning time: {plan_time:.3f} s".format(**summary))
+        if args.events:
+            print("Events written to", args.events)
+        if recorder is not None:
+            frames = render.export_animation(grid, recorder, args.animate, start={"agent": start},
+                                             stride=args.frame_stride)
+            print(f"Saved {frames} frames to {args.animate}")
+        raise SystemExit(0)
+    logs = agent.follow_and_replan(start, goal, dynamic_unpredictable=(args.dynamic=="unpredictable"),
+                                   surprises=surprises)
 
     # print summary
     print("Success:", logs.get("success"))
@@ -89,6 +102,19 @@ if __name__ == "__main__":
     print("Total planning time (s):", logs.get("total_plan_time"))
     print("Number of plans made:", len(logs.get("plans",[])))
     print("Final path length (steps):", len(logs.get("final_path",[])))
+    if surprises is not None:
+        print("Surprise obstacles:", logs.get("surprises"))
+    bounds = [p["stats"].get("suboptimality") for p in logs.get("plans", [])]
+    if args.algo in ("wastar", "ara") and bounds and None not in bounds:
+        print("Solution-quality bound (worst plan, cost / optimal <=):", max(bounds))
+    if logs.get("profile"):
+        prof = logs["profile"]
+        print("Profile: generated {nodes_generated}, stale pops {stale_pops}, peak frontier {peak_frontier}, "
+              "occupied_at {occ:.2f} ms, neighbors {nbr:.2f} ms, frontier {fr:.2f} ms".format(
+                  occ=prof["occupied_ns"] / 1e6, nbr=prof["neighbors_ns"] / 1e6, fr=prof["frontier_ns"] / 1e6, **prof))
+    if args.metrics:
+        write_metrics(logs, args.metrics, map=args.map, algo=args.algo, dynamic=args.dynamic)
+        print("Appended metrics to", args.metrics)
     print()
 
     # show first plan and final path
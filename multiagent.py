@@ -0,0 +1,269 @@
+# multiagent.py
+import heapq
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+from grid import GridWorld, DynamicObstacle, ReservationTable
+import search
+
+Pos = Tuple[int, int]
+
+class AgentTask:
+    def __init__(self, aid: str, start: Pos, goal: Pos, start_time: int = 0, priority: int = 0):
+        self.id = aid
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.start_time = int(start_time)
+        self.priority = priority  # higher plans first when order="priority"
+
+class CooperativePlanner:
+    """
+    Cooperative A* (Silver 2005) for a fleet sharing one grid. Agents are planned one at a time in
+    priority order with a space-time A* (moves plus a wait action) against a shared
+    ReservationTable: every committed path reserves its cells per timestep, its moves as edges
+    (so later agents cannot swap through it) and its goal from the arrival time on (parking).
+    The grid's own dynamic obstacle schedule is avoided as well.
+
+    Every agent holds its start cell at its start time, so later-planned agents have to move off
+    before someone drives through. When an agent finds no path, the committed paths that cross its
+    start are released and the agent is retried ahead of them (up to max_bumps times). If it still
+    fails (or the time budget runs out first) it stays parked at its start and the released paths
+    are replanned around it. The returned paths therefore never conflict with each other, even
+    when some agents could not be routed.
+    """
+    def __init__(self, grid: GridWorld, max_time: int = 400, time_budget: float = 1.0,
+                 max_expansions: int = 20000, order: str = "distance", wait_cost: int = 1, max_bumps: int = 2):
+        """
+        max_time: max timesteps after its start_time an agent may take to reach its goal
+        time_budget: wall-clock seconds for a whole plan() call (all agents, including replans)
+        order: 'distance' (farthest static distance first), 'traffic' (agents whose start lies on many
+               other agents' static routes first, whose goal does last), 'priority' (AgentTask.priority,
+               high first) or 'given' (list order)
+        max_bumps: how often an agent blocked at its start may jump ahead of the agents blocking it
+        """
+        self.grid = grid
+        self.max_time = max_time
+        self.time_budget = time_budget
+        self.max_expansions = max_expansions
+        self.order = order
+        self.wait_cost = wait_cost
+        self.max_bumps = max_bumps
+        self.reservations = ReservationTable(grid.rows, grid.cols)
+        self.paths: Dict[str, List[Pos]] = {}
+        self.failed: List[str] = []   # no path found; parked at start
+        self.skipped: List[str] = []  # not planned before the time budget ran out; parked at start
+        self._fields = {}
+        self._limit = int(grid.grid[grid.grid != -1].sum())
+        self._version = grid.version
+
+    def _heuristic(self, goal: Pos):
+        """Exact static cost-to-go (distance field) to goal, as a flat list; above _limit = unreachable."""
+        if self._version != self.grid.version:
+            changes = self.grid.changes_since(self._version)
+            if changes is None or any(ch.kind == "terrain" for ch in changes):
+                self._fields.clear()  # the grid keeps its own fields up to date; these are list copies
+                self._limit = int(self.grid.grid[self.grid.grid != -1].sum())
+            self._version = self.grid.version
+        h = self._fields.get(goal)
+        if h is None:
+            h = self._fields[goal] = self.grid.distance_field(goal).ravel().tolist()
+        return h
+
+    def _static_route(self, task: AgentTask) -> List[int]:
+        """Cell ids of an optimal route that ignores time and other agents ([] if unreachable)."""
+        cg = self.grid.compile()
+        h, adjacency, cost = self._heuristic(task.goal), cg.adjacency, cg.cost_list
+        u = cg.cell_id(task.start)
+        if h[u] > self._limit:
+            return []
+        route = [u]
+        while h[u] > 0:
+            u = min(adjacency[u], key=lambda v: cost[v] + h[v])
+            route.append(u)
+        return route
+
+    def _ordered(self, tasks: List[AgentTask]) -> List[AgentTask]:
+        if self.order == "given":
+            return list(tasks)
+        if self.order == "priority":
+            return sorted(tasks, key=lambda a: -a.priority)
+        cg = self.grid.compile()
+        if self.order == "traffic":
+            # agents whose start lies on many static routes leave first; agents whose goal does park last
+            load: Dict[int, int] = {}
+            for a in tasks:
+                for v in self._static_route(a):
+                    load[v] = load.get(v, 0) + 1
+            return sorted(tasks, key=lambda a: load.get(cg.cell_id(a.goal), 0) - load.get(cg.cell_id(a.start), 0))
+        return sorted(tasks, key=lambda a: -self._heuristic(a.goal)[cg.cell_id(a.start)])
+
+    def plan(self, tasks: List[AgentTask]):
+        """
+        Plans every task; returns (paths, stats) with paths: id -> list of positions from the task's
+        start_time (agents stay at the last position afterwards) and the summed search stats.
+        """
+        stats = search.SearchStats()
+        t0 = time.perf_counter()
+        deadline = t0 + self.time_budget
+        self.reservations = res = ReservationTable(self.grid.rows, self.grid.cols)
+        self.paths, self.failed, self.skipped = {}, [], []
+        by_id = {a.id: a for a in tasks}
+        visits: Dict[int, set] = {}  # cell -> ids of committed agents whose path uses it
+        for a in tasks:
+            res.reserve(a.start, a.start_time)
+        queue = deque(self._ordered(tasks))
+        bumps = {a.id: 0 for a in tasks}
+        while queue:
+            a = queue.popleft()
+            path = self.plan_agent(a, deadline, stats) if time.perf_counter() < deadline else None
+            if not path:
+                # paths committed earlier that drive through a's start after it should have left
+                cell = res.cell_id(a.start)
+                crossers = [by_id[b] for b in visits.get(cell, ()) if self._crosses(by_id[b], a.start, a.start_time)]
+                for b in crossers:
+                    self.release(b, visits)
+                    queue.appendleft(b)
+                if path is not None and crossers and bumps[a.id] < self.max_bumps:
+                    # give a priority over the agents that blocked it and try again
+                    bumps[a.id] += 1
+                    queue.appendleft(a)
+                    continue
+                # a stays where it is; the released paths are replanned around it
+                (self.failed if path is not None else self.skipped).append(a.id)
+                path = [a.start]
+            self.commit(a, path)
+            self.paths[a.id] = path
+            for p in path:
+                visits.setdefault(res.cell_id(p), set()).add(a.id)
+        stats.time_taken = time.perf_counter() - t0
+        return self.paths, stats
+
+    def _crosses(self, task: AgentTask, pos: Pos, t: int) -> bool:
+        """True if task's committed path is at pos at some time after t (parking included)."""
+        path = self.paths[task.id]
+        if path[-1] == pos:
+            return True
+        return any(p == pos and task.start_time + i > t for i, p in enumerate(path))
+
+    def release(self, task: AgentTask, visits: Dict[int, set] = None):
+        """Drops a committed path's reservations (its start stays reserved at its start time)."""
+        res = self.reservations
+        path = self.paths.pop(task.id)
+        for i, p in enumerate(path):
+            t = task.start_time + i
+            if i > 0:
+                res.cells[t].discard(res.cell_id(p))
+            if i + 1 < len(path) and path[i + 1] != p:
+                res.edges[t].discard((res.cell_id(p), res.cell_id(path[i + 1])))
+            if visits is not None:
+                visits.get(res.cell_id(p), set()).discard(task.id)
+        res.unpark(path[-1])
+        # res.latest may now overstate a cell's last use; that only makes goal stops wait longer
+
+    def commit(self, task: AgentTask, path: List[Pos]):
+        """Turns a path into reservations for the agents planned after it."""
+        res = self.reservations
+        for i, p in enumerate(path):
+            res.reserve(p, task.start_time + i)
+            if i + 1 < len(path) and path[i + 1] != p:
+                res.reserve_edge(p, path[i + 1], task.start_time + i)
+        res.park(path[-1], task.start_time + len(path) - 1)
+
+    def plan_agent(self, task: AgentTask, deadline: float = float('inf'), stats: search.SearchStats = None):
+        """Space-time A* for one agent against the current reservations; [] if none found."""
+        stats = stats or search.SearchStats()
+        cg = self.grid.compile()
+        adjacency, cost = cg.adjacency, cg.cost_list
+        T0 = task.start_time
+        tmax = T0 + self.max_time
+        schedule = self.grid.reservations
+        schedule.materialize(T0, tmax + 1)
+        res, obstacles = self.reservations, schedule.cells
+        cells, edges, parked = res.cells, res.edges, res.parked
+        h = self._heuristic(task.goal)
+        s, g = cg.cell_id(task.start), cg.cell_id(task.goal)
+        # the agent parks at its goal, so it may only stop there after every other visit to it
+        goal_after = max(res.latest.get(g, -1), schedule.latest.get(g, -1))
+        if cost[s] == -1 or cost[g] == -1 or h[s] > self._limit or g in parked or goal_after >= tmax:
+            return []
+        wait = self.wait_cost
+
+        # every step (move or wait) costs at least 1, so an agent at time t still pays at least
+        # goal_after + 1 - t before it may stop: max() with that keeps h admissible and much tighter
+        # when the goal is only free late. Ties go to the deeper state (larger g).
+        frontier = [(max(h[s], goal_after + 1 - T0), 0, T0, s)]
+        best = {(s, T0): 0}
+        parent = {(s, T0): None}
+        expanded = 0
+        while frontier:
+            _, gc, t, u = heapq.heappop(frontier)
+            gc = -gc
+            if gc > best[(u, t)]:
+                continue
+            expanded += 1
+            if u == g and t > goal_after:
+                stats.nodes_expanded += expanded
+                path = []
+                state = (u, t)
+                while state is not None:
+                    path.append(cg.pos_of(state[0]))
+                    state = parent[state]
+                path.reverse()
+                return path
+            if expanded > self.max_expansions or (not expanded & 1023 and time.perf_counter() > deadline):
+                break
+            if t >= tmax:
+                continue
+            nt = t + 1
+            taken, moving, busy = cells.get(nt, ()), edges.get(t, ()), obstacles.get(nt, ())
+            late = goal_after + 1 - nt
+            for v in adjacency[u] + (u,):
+                if v in taken or v in busy or parked.get(v, nt + 1) <= nt:
+                    continue
+                if v != u and (v, u) in moving:
+                    continue  # would swap places with an agent moving v -> u
+                ng = gc + (cost[v] if v != u else wait)
+                key = (v, nt)
+                if ng < best.get(key, float('inf')):
+                    best[key] = ng
+                    parent[key] = (u, t)
+                    heapq.heappush(frontier, (ng + max(h[v], late), -ng, nt, v))
+        stats.nodes_expanded += expanded
+        return []
+
+    def as_obstacles(self, tasks: List[AgentTask]) -> List[DynamicObstacle]:
+        """The planned fleet as DynamicObstacles, e.g. to add to the grid for single-agent planners."""
+        by_id = {a.id: a for a in tasks}
+        return [DynamicObstacle(aid, path, by_id[aid].start_time) for aid, path in self.paths.items()]
+
+def find_conflicts(paths: Dict[str, List[Pos]], start_times: Dict[str, int] = None):
+    """
+    Vertex and swap conflicts between timed paths (each agent waits at its last cell afterwards).
+    Returns a list of (t, id_a, id_b, kind) with kind 'vertex' or 'edge'.
+    """
+    start_times = start_times or {}
+    def at(aid, t):
+        path, t0 = paths[aid], start_times.get(aid, 0)
+        if t < t0:
+            return None
+        return path[min(t - t0, len(path) - 1)]
+    end = max((start_times.get(a, 0) + len(p) for a, p in paths.items()), default=0)
+    ids = sorted(paths)
+    conflicts = []
+    for t in range(end + 1):
+        seen = {}
+        for aid in ids:
+            p = at(aid, t)
+            if p is None:
+                continue
+            if p in seen:
+                conflicts.append((t, seen[p], aid, "vertex"))
+            seen[p] = aid
+        moves = {}
+        for aid in ids:
+            a, b = at(aid, t), at(aid, t + 1)
+            if a is not None and b is not None and a != b:
+                if (b, a) in moves:
+                    conflicts.append((t, moves[(b, a)], aid, "edge"))
+                moves[(a, b)] = aid
+    return conflicts
@@ -0,0 +1,154 @@
+# render.py
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+from grid import GridWorld
+
+Pos = Tuple[int, int]
+
+# RGB colors of the frame layers, bottom to top
+WALL = (20, 20, 20)
+TRAIL = (250, 200, 200)     # every cell a scheduled obstacle ever visits
+PATH = (60, 120, 230)
+OBSTACLE = (220, 40, 40)    # obstacles at the frame's timestep
+GOAL = (240, 190, 0)
+AGENT = (30, 170, 60)
+
+def terrain_rgb(grid: GridWorld) -> np.ndarray:
+    """rows x cols x 3 uint8 image of the static map: cost 1 is white, costlier cells darker, walls WALL."""
+    arr = np.asarray(grid.grid)
+    passable = arr != -1
+    top = max(int(arr.max()), 2) if arr.size else 2
+    shade = np.where(passable, 255 - (np.clip(arr, 1, None) - 1) * 150 // (top - 1), 0).astype(np.uint8)
+    rgb = np.repeat(shade[:, :, None], 3, axis=2)
+    rgb[~passable] = WALL
+    return rgb
+
+def _paint(rgb: np.ndarray, cells, color):
+    """Colors a batch of (r, c) cells (any sequence or an n x 2 array) in one indexing op."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    if len(cells):
+        rgb[cells[:, 0], cells[:, 1]] = color
+
+def obstacle_cells(grid: GridWorld, t: int) -> np.ndarray:
+    """n x 2 array of the cells scheduled obstacles occupy at t (periodic ones included)."""
+    res = grid.reservations
+    res.materialize(t, t)
+    ids = np.fromiter(res.cells.get(t, ()), dtype=np.int64)
+    return np.stack(np.divmod(ids, grid.cols), axis=1)
+
+def trail_cells(grid: GridWorld) -> np.ndarray:
+    """n x 2 array of every cell on a scheduled obstacle's path (one cycle for periodic ones)."""
+    paths = [o.path for o in grid.dynamic_obstacles if o.path]
+    return np.concatenate([np.asarray(p, dtype=np.int64) for p in paths]) if paths else np.empty((0, 2), np.int64)
+
+def render_frame(grid: GridWorld, path: List[Pos] = None, t: int = None, agents: Iterable[Pos] = (),
+                 goal: Pos = None, trails: bool = True, scale: int = 1, base: np.ndarray = None) -> np.ndarray:
+    """
+    RGB frame (uint8, rows*scale x cols*scale x 3) built with array ops only: terrain, obstacle
+    trails, the path, obstacles at timestep t, the goal and the agents. Pass `base` (an unscaled
+    frame rendered once without t/agents) to reuse the static layers across many frames.
+    """
+    if base is not None:
+        rgb = base.copy()
+    else:
+        rgb = terrain_rgb(grid)
+        if trails:
+            _paint(rgb, trail_cells(grid), TRAIL)
+        if path:
+            _paint(rgb, path, PATH)
+        if goal is not None:
+            _paint(rgb, [goal], GOAL)
+    if t is not None:
+        _paint(rgb, obstacle_cells(grid, t), OBSTACLE)
+    _paint(rgb, list(agents), AGENT)
+    if scale > 1:
+        rgb = rgb.repeat(scale, axis=0).repeat(scale, axis=1)
+    return rgb
+
+def ascii_frame(grid: GridWorld, agent_pos: Pos = None, goal: Pos = None, occupied_positions=None) -> str:
+    """The print_ascii text of the map: '#' wall, '.' cost 1, the cost digit otherwise, X/G/A on top."""
+    arr = np.asarray(grid.grid)
+    # symbol of every cost value, looked up for the whole map at once (index 0 is the wall -1)
+    symbols = np.array(["#", "0", "."] + [str(v) for v in range(2, max(int(arr.max(initial=1)), 1) + 1)], dtype=object)
+    chars = symbols[arr.astype(np.int64) + 1]
+    if occupied_positions:
+        cells = np.asarray(list(occupied_positions), dtype=np.int64).reshape(-1, 2)
+        free = arr[cells[:, 0], cells[:, 1]] != -1
+        chars[cells[free, 0], cells[free, 1]] = "X"
+    if goal is not None:
+        chars[goal] = "G"
+    if agent_pos is not None:
+        chars[agent_pos] = "A"
+    return "\n".join(" ".join(row) + " " for row in chars.tolist())
+
+def save_image(rgb: np.ndarray, out_file: str):
+    import matplotlib.pyplot as plt  # only needed when an image is actually written
+    plt.imsave(out_file, rgb)
+
+class FrameRecorder:
+    """
+    Taps an event stream (DeliveryAgent.run / simulation.simulate) and keeps only what an
+    animation needs, as flat int arrays: (t, agent, r, c) per step and (start, end, r, c) per
+    surprise obstacle. Use record = FrameRecorder(); for ev in record.tap(events): ...
+    """
+    def __init__(self):
+        self.steps = array('i')
+        self.surprises = array('i')
+        self.agents: Dict[str, int] = {}
+        self.goals: Dict[str, Pos] = {}
+
+    def tap(self, events: Iterable[dict]) -> Iterator[dict]:
+        for ev in events:
+            kind = ev["event"]
+            aid = self.agents.setdefault(ev.get("agent", "agent"), len(self.agents))
+            if kind == "step":
+                self.steps.extend((ev["t"], aid, ev["pos"][0], ev["pos"][1]))
+            elif kind == "surprise":
+                o = ev["obstacle"]
+                for i, p in enumerate(o.path):
+                    self.surprises.extend((o.start_time + i, o.start_time + i, p[0], p[1]))
+            elif kind == "plan" and ev["path"]:
+                self.goals[ev.get("agent", "agent")] = ev["path"][-1]
+            yield ev
+
+def export_animation(grid: GridWorld, recorder: FrameRecorder, out_file: str, start: Dict[str, Pos] = None,
+                     stride: int = 1, scale: int = 4, fps: int = 20, trails: bool = True):
+    """
+    Writes the recorded run as an animated GIF. The static layers are rendered once; each frame is
+    a copy with the obstacles and agents of its timestep painted in by index arrays, and frames
+    are generated lazily while the file is written, so thousands of steps need no replotting and
+    no frame list in memory. stride keeps every n-th timestep; scale enlarges each cell.
+    """
+    from PIL import Image  # ships with matplotlib
+    steps = np.frombuffer(recorder.steps, dtype=np.int32).reshape(-1, 4)
+    surprises = np.frombuffer(recorder.surprises, dtype=np.int32).reshape(-1, 4)
+    base = render_frame(grid, goal=None, trails=trails)
+    _paint(base, list(recorder.goals.values()), GOAL)
+    t_end = int(steps[:, 0].max()) if len(steps) else 0
+    # agent positions at every timestep, carried forward while an agent waits or replans
+    where = np.full((t_end + 1, max(len(recorder.agents), 1), 2), -1, dtype=np.int64)
+    for aid, pos in (start or {}).items():
+        if aid in recorder.agents:
+            where[0, recorder.agents[aid]] = pos
+    where[steps[:, 0], steps[:, 1]] = steps[:, 2:]
+    for t in range(1, t_end + 1):
+        missing = where[t, :, 0] < 0
+        where[t, missing] = where[t - 1, missing]
+
+    def frames():
+        for t in range(0, t_end + 1, stride):
+            rgb = base.copy()
+            _paint(rgb, obstacle_cells(grid, t), OBSTACLE)
+            active = surprises[(surprises[:, 0] <= t) & (t <= surprises[:, 1])]
+            _paint(rgb, active[:, 2:], OBSTACLE)
+            at = where[t]
+            _paint(rgb, at[at[:, 0] >= 0], AGENT)
+            if scale > 1:
+                rgb = rgb.repeat(scale, axis=0).repeat(scale, axis=1)
+            yield Image.fromarray(rgb)
+
+    it = frames()
+    first = next(it)
+    first.save(out_file, save_all=True, append_images=it, duration=max(1, 1000 // fps), loop=0)
+    return t_end // stride + 1
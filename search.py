@@ -1,9 +1,12 @@
 # search.py
 import heapq
+import sys
 import time
+from array import array
+import numpy as np
 from collections import deque
 from typing import Tuple, Dict, List
-from grid import GridWorld, DynamicObstacle
+from grid import GridWorld, DynamicObstacle, CompiledGrid
 
 Pos = Tuple[int, int]
 
@@ -11,10 +14,175 @@ class SearchStats:
     def __init__(self):
         self.nodes_expanded = 0
         self.time_taken = 0.0
+        self.peak_memory = 0  # approx. bytes held by the search's state tables and frontier
+        self.profile = None   # SearchProfile when the planner ran with profile=True
+        self.timed_out = False  # the time budget ran out before the search finished
+        self.suboptimality = None  # proven bound on path cost / optimal cost (1.0 = optimal), if known
+
+    def as_dict(self) -> dict:
+        """Plain JSON-serializable view (the profile, if any, is nested under "profile")."""
+        out = {k: v for k, v in self.__dict__.items() if k != "profile"}
+        if self.profile is not None:
+            out["profile"] = self.profile.as_dict()
+        return out
+
+class SearchProfile:
+    """
+    Opt-in hot-path instrumentation for one search (profile=True on the time-aware planners):
+    states pushed vs expanded, stale (duplicate) pops, peak frontier size, the size of the
+    visited/cost table, and perf_counter_ns totals for occupied_at, neighbors and frontier
+    operations. The planners bind the wrappers from hooks() in place of the plain calls only
+    when profiling, so an unprofiled search runs the uninstrumented code.
+    """
+    def __init__(self):
+        self.nodes_generated = 0
+        self.stale_pops = 0
+        self.peak_frontier = 0
+        self.peak_closed = 0
+        self.occupied_ns = 0
+        self.neighbors_ns = 0
+        self.frontier_ns = 0
+        self.total_ns = 0
+        self._popped = set()
+        self._t0 = time.perf_counter_ns()
+
+    def hooks(self, grid: GridWorld, push, pop, state_of=lambda item: item):
+        """Timed stand-ins for grid.neighbors, grid.occupied_at, push(frontier, item) and pop(frontier)."""
+        clock = time.perf_counter_ns
+
+        def neighbors(pos):
+            t = clock()
+            out = list(grid.neighbors(pos))
+            self.neighbors_ns += clock() - t
+            return out
+
+        def occupied_at(pos, t):
+            t0 = clock()
+            out = grid.occupied_at(pos, t)
+            self.occupied_ns += clock() - t0
+            return out
+
+        def timed_push(frontier, item):
+            t = clock()
+            push(frontier, item)
+            self.frontier_ns += clock() - t
+            self.nodes_generated += 1
+            if len(frontier) > self.peak_frontier:
+                self.peak_frontier = len(frontier)
+
+        def timed_pop(frontier):
+            t = clock()
+            item = pop(frontier)
+            self.frontier_ns += clock() - t
+            state = state_of(item)
+            if state in self._popped:
+                self.stale_pops += 1
+            else:
+                self._popped.add(state)
+            return item
+
+        return neighbors, occupied_at, timed_push, timed_pop
+
+    def finish(self, closed: int):
+        self.peak_closed = closed
+        self.total_ns = time.perf_counter_ns() - self._t0
+        self._popped = set()
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+def _finish(stats: SearchStats, t0: float, frontier, *tables) -> SearchStats:
+    stats.peak_memory = _state_bytes(frontier, *tables)
+    stats.time_taken = time.perf_counter() - t0
+    if stats.profile is not None:
+        stats.profile.finish(len(tables[0]))
+    return stats
+
+def _deep_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        size += sum(_deep_size(x) for x in obj)
+    return size
+
+def _state_bytes(frontier, *tables) -> int:
+    """
+    Approximate bytes held by search bookkeeping, sized from one sample entry per container
+    (all states of one search have the same shape). State tuples are shared between the
+    tables and the frontier, so they are counted once; int values are counted per table.
+    """
+    total = sys.getsizeof(frontier)
+    if frontier:
+        total += len(frontier) * sys.getsizeof(frontier[-1])
+    for i, table in enumerate(tables):
+        total += sys.getsizeof(table)
+        if not table:
+            continue
+        sample = next(reversed(table)) if isinstance(table, dict) else next(iter(table))
+        if i == 0:
+            total += len(table) * _deep_size(sample)
+        if isinstance(table, dict) and isinstance(table[sample], int):
+            total += len(table) * sys.getsizeof(table[sample])
+    return total
 
 def manhattan(a: Pos, b: Pos) -> int:
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
+class FieldHeuristic:
+    """
+    Exact static cost-to-go to `goal`, read from the grid's cached distance field.
+    Ignores dynamic obstacles, so it stays admissible (and consistent) for the time-aware searches.
+    Called as h(pos, goal) like manhattan; `flat` is the per-cell table for astar_compiled.
+
+    Among states with equal f, astar_time_aware pops the lowest g first, which with an exact
+    heuristic means sweeping every tied optimal route. The callable form therefore adds
+    h / (max_h + 1) < 1 to each value: ties now favour states closer to the goal, and since
+    terrain costs are integers the returned cost is still optimal.
+    """
+    def __init__(self, grid: GridWorld, goal: Pos):
+        self.field = grid.distance_field(goal)
+        self._table = None
+        self._flat = None
+
+    @property
+    def table(self) -> List[List[float]]:
+        """The tie-broken values as nested lists, built on first use (plans read straight off the field never need it)."""
+        if self._table is None:
+            finite = self.field[np.isfinite(self.field)]
+            scale = 1.0 + 1.0 / (float(finite.max()) + 1.0) if finite.size else 1.0
+            self._table = (self.field * scale).tolist()
+        return self._table
+
+    def __call__(self, pos: Pos, goal: Pos = None) -> float:
+        table = self._table if self._table is not None else self.table
+        return table[pos[0]][pos[1]]
+
+    @property
+    def flat(self) -> List[float]:
+        if self._flat is None:
+            self._flat = self.field.ravel().tolist()
+        return self._flat
+
+    def exact(self, pos: Pos, goal: Pos = None) -> float:
+        """
+        The uninflated cost-to-go. Searches that derive a suboptimality bound from h (weighted A*,
+        ARA*) need this form: the tie-break inflation of __call__ would void their bound.
+        """
+        return self.flat[pos[0] * self.field.shape[1] + pos[1]]
+
+def follow_field(grid: GridWorld, field, start: Pos) -> List[Pos]:
+    """
+    Reads an optimal static path off a distance field: from `start`, repeatedly step to the
+    neighbor that realizes the cost-to-go. Returns [] if no goal of the field is reachable.
+    """
+    if not field[start] < float('inf'):
+        return []
+    path = [start]
+    cur = start
+    while field[cur] > 0:
+        cur = min(grid.neighbors(cur), key=lambda n: grid.cost(n) + field[n])
+        path.append(cur)
+    return path
+
 def reconstruct_time_path(came_from: Dict[Tuple[Pos,int], Tuple[Pos,int]], start_state, goal_state):
     if goal_state not in came_from:
         return []
@@ -28,128 +196,880 @@ def reconstruct_time_path(came_from: Dict[Tuple[Pos,int], Tuple[Pos,int]], start
     path.reverse()
     return path
 
-def bfs_time_aware(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000) -> (List[Pos], SearchStats):
+def bfs_time_aware(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000,
+                   profile: bool = False) -> (List[Pos], SearchStats):
     """
     BFS over (pos, time) state space. Each move increments time by 1. Avoid positions occupied at that time.
+    profile: collect a SearchProfile in stats.profile (slower; off by default)
     """
     stats = SearchStats()
-    t0 = time.time()
+    t0 = time.perf_counter()
+    neighbors, occupied_at, push, pop = grid.neighbors, grid.occupied_at, deque.append, deque.popleft
+    horizon = grid.reservations.horizon  # nothing is scheduled after it
+    if profile:
+        stats.profile = SearchProfile()
+        neighbors, occupied_at, push, pop = stats.profile.hooks(grid, push, pop)
 
     start_state = (start, start_time)
-    frontier = deque([start_state])
+    frontier = deque()
+    push(frontier, start_state)
     came_from = {start_state: None}
     visited = {start_state}
 
     while frontier:
-        current = frontier.popleft()
+        current = pop(frontier)
         stats.nodes_expanded += 1
         (pos, t) = current
         if pos == goal:
-            stats.time_taken = time.time() - t0
+            _finish(stats, t0, frontier, came_from, visited)
             return reconstruct_time_path(came_from, start_state, current), stats
         if t - start_time > max_time:
             continue
-        for nbr in grid.neighbors(pos):
+        for nbr in neighbors(pos):
             next_state = (nbr, t+1)
             # skip if occupied at arrival time
-            if grid.occupied_at(nbr, t+1):
+            if t+1 <= horizon and occupied_at(nbr, t+1):
                 continue
             if next_state not in visited:
                 visited.add(next_state)
                 came_from[next_state] = current
-                frontier.append(next_state)
+                push(frontier, next_state)
 
-    stats.time_taken = time.time() - t0
+    _finish(stats, t0, frontier, came_from, visited)
     return [], stats
 
-def ucs_time_aware(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000):
+def ucs_time_aware(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000,
+                   profile: bool = False):
     stats = SearchStats()
-    t0 = time.time()
+    t0 = time.perf_counter()
+    neighbors, occupied_at, push, pop = grid.neighbors, grid.occupied_at, heapq.heappush, heapq.heappop
+    horizon = grid.reservations.horizon  # nothing is scheduled after it
+    if profile:
+        stats.profile = SearchProfile()
+        neighbors, occupied_at, push, pop = stats.profile.hooks(grid, push, pop, lambda item: item[1])
 
     start_state = (start, start_time)
     frontier = []
-    heapq.heappush(frontier, (0, start_state))
+    push(frontier, (0, start_state))
     came_from = {start_state: None}
     cost_so_far = {start_state: 0}
 
     while frontier:
-        current_cost, current = heapq.heappop(frontier)
+        current_cost, current = pop(frontier)
         stats.nodes_expanded += 1
         (pos, t) = current
         if pos == goal:
-            stats.time_taken = time.time() - t0
+            _finish(stats, t0, frontier, came_from, cost_so_far)
             return reconstruct_time_path(came_from, start_state, current), stats
         if t - start_time > max_time:
             continue
-        for nbr in grid.neighbors(pos):
+        for nbr in neighbors(pos):
             arrival_time = t+1
-            if grid.occupied_at(nbr, arrival_time):
+            if arrival_time <= horizon and occupied_at(nbr, arrival_time):
                 continue
             new_cost = cost_so_far[current] + grid.cost(nbr)
             next_state = (nbr, arrival_time)
             if next_state not in cost_so_far or new_cost < cost_so_far[next_state]:
                 cost_so_far[next_state] = new_cost
-                heapq.heappush(frontier, (new_cost, next_state))
+                push(frontier, (new_cost, next_state))
                 came_from[next_state] = current
 
-    stats.time_taken = time.time() - t0
+    _finish(stats, t0, frontier, came_from, cost_so_far)
     return [], stats
 
-def astar_time_aware(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000):
+def astar_time_aware(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000,
+                     heuristic=manhattan, profile: bool = False, time_budget: float = None, partial: bool = False,
+                     weight: float = 1.0):
+    """
+    heuristic: h(pos, goal), manhattan by default. A FieldHeuristic gives the exact static
+    cost-to-go, so only dynamic obstacles make the search deviate from the optimal static path.
+    weight: weighted A* (f = g + weight * h). With an admissible heuristic the path costs at most
+    weight x optimal (stats.suboptimality) and far fewer states are expanded on open maps.
+    profile: collect a SearchProfile in stats.profile (slower; off by default)
+    time_budget: seconds the search may run (checked every 256 expansions). Once spent it stops
+    with stats.timed_out set and returns [] or, with partial=True, the path to the expanded
+    state closest to the goal (lowest h, then lowest cost), which a caller can start following.
+    """
     stats = SearchStats()
-    t0 = time.time()
+    t0 = time.perf_counter()
+    neighbors, occupied_at, push, pop = grid.neighbors, grid.occupied_at, heapq.heappush, heapq.heappop
+    horizon = grid.reservations.horizon  # nothing is scheduled after it
+    if profile:
+        stats.profile = SearchProfile()
+        neighbors, occupied_at, push, pop = stats.profile.hooks(grid, push, pop, lambda item: item[2])
+    deadline = t0 + time_budget if time_budget is not None else None
+    if weight != 1:
+        base = heuristic
+        heuristic = lambda pos, goal: weight * base(pos, goal)
 
     start_state = (start, start_time)
     frontier = []
-    heapq.heappush(frontier, (0 + manhattan(start, goal), 0, start_state))
+    push(frontier, (0 + heuristic(start, goal), 0, start_state))
     came_from = {start_state: None}
     cost_so_far = {start_state: 0}
+    closest, closest_key = start_state, (float('inf'), 0)
 
     while frontier:
-        _, current_cost, current = heapq.heappop(frontier)
+        priority, current_cost, current = pop(frontier)
         stats.nodes_expanded += 1
         (pos, t) = current
         if pos == goal:
-            stats.time_taken = time.time() - t0
+            _finish(stats, t0, frontier, came_from, cost_so_far)
+            stats.suboptimality = float(weight)
             return reconstruct_time_path(came_from, start_state, current), stats
+        if deadline is not None:
+            if stats.nodes_expanded & 255 == 1 and time.perf_counter() > deadline:
+                stats.timed_out = True
+                break
+            if partial and (priority - current_cost, current_cost) < closest_key:
+                closest, closest_key = current, (priority - current_cost, current_cost)
         if t - start_time > max_time:
             continue
 
-        for nbr in grid.neighbors(pos):
+        for nbr in neighbors(pos):
             arrival_time = t+1
-            if grid.occupied_at(nbr, arrival_time):
+            if arrival_time <= horizon and occupied_at(nbr, arrival_time):
                 continue
             new_cost = cost_so_far[current] + grid.cost(nbr)
             next_state = (nbr, arrival_time)
             if next_state not in cost_so_far or new_cost < cost_so_far[next_state]:
                 cost_so_far[next_state] = new_cost
-                priority = new_cost + manhattan(nbr, goal)
-                heapq.heappush(frontier, (priority, new_cost, next_state))
+                priority = new_cost + heuristic(nbr, goal)
+                push(frontier, (priority, new_cost, next_state))
                 came_from[next_state] = current
 
-    stats.time_taken = time.time() - t0
+    _finish(stats, t0, frontier, came_from, cost_so_far)
+    if stats.timed_out and partial:
+        return reconstruct_time_path(came_from, start_state, closest) or [start], stats
+    return [], stats
+
+def ara_star(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000,
+             heuristic=manhattan, epsilon: float = 3.0, epsilon_step: float = 0.5, time_budget: float = None,
+             max_expansions: int = None):
+    """
+    Anytime Repairing A* (Likhachev et al. 2003). Runs weighted A* with epsilon, then lowers epsilon
+    by epsilon_step down to 1 and repairs the previous search instead of restarting: g values are
+    kept, states that improved after being expanded (INCONS) rejoin the frontier, and each round
+    only re-expands what the tighter weight makes worth it. Once time_budget (seconds) or
+    max_expansions (a deterministic budget) is spent it returns the best path found so far, even
+    mid-round (stats.timed_out); without a budget it runs down to the optimal path.
+    stats.suboptimality holds the proven bound of the returned path:
+    min(epsilon, cost / min over the open and inconsistent states of g + h).
+    """
+    stats = SearchStats()
+    t0 = time.perf_counter()
+    deadline = t0 + time_budget if time_budget is not None else None
+    neighbors, occupied_at, push, pop = grid.neighbors, grid.occupied_at, heapq.heappush, heapq.heappop
+    horizon = grid.reservations.horizon  # nothing is scheduled after it
+    h_cache: Dict[Pos, float] = {}
+
+    def h(pos):
+        v = h_cache.get(pos)
+        if v is None:
+            v = h_cache[pos] = heuristic(pos, goal)
+        return v
+
+    start_state = (start, start_time)
+    came_from = {start_state: None}
+    cost_so_far = {start_state: 0}
+    eps = max(1.0, epsilon)
+    frontier = [(eps * h(start), 0, start_state)]
+    closed, incons = set(), set()
+    # the incumbent is set when a goal state is generated; the start state is never generated
+    best_state, best_cost = (start_state, 0) if start == goal else (None, float('inf'))
+    path = []
+
+    while True:
+        # ImprovePath: weighted A* until nothing left in the frontier can beat the incumbent
+        while frontier:
+            key, g, current = frontier[0]
+            if g != cost_so_far[current] or current in closed:
+                pop(frontier)  # stale entry
+                continue
+            if best_cost <= key:
+                break
+            # budget checks before the pop, so an unexpanded state stays in OPEN for the bound below
+            if (max_expansions is not None and stats.nodes_expanded >= max_expansions) or \
+                    (deadline is not None and stats.nodes_expanded & 255 == 0 and time.perf_counter() > deadline):
+                stats.timed_out = True
+                break
+            pop(frontier)
+            closed.add(current)
+            stats.nodes_expanded += 1
+            (pos, t) = current
+            if t - start_time > max_time:
+                continue
+            for nbr in neighbors(pos):
+                arrival_time = t+1
+                if arrival_time <= horizon and occupied_at(nbr, arrival_time):
+                    continue
+                new_cost = g + grid.cost(nbr)
+                next_state = (nbr, arrival_time)
+                if new_cost < cost_so_far.get(next_state, float('inf')):
+                    cost_so_far[next_state] = new_cost
+                    came_from[next_state] = current
+                    if nbr == goal and new_cost < best_cost:
+                        best_state, best_cost = next_state, new_cost
+                    if next_state in closed:
+                        incons.add(next_state)
+                    else:
+                        push(frontier, (new_cost + eps * h(nbr), new_cost, next_state))
+        if best_state is None:
+            break
+        live = [s for _, g, s in frontier if g == cost_so_far[s] and s not in closed]
+        lower = min((cost_so_far[s] + h(s[0]) for s in live + list(incons)), default=best_cost)
+        path = reconstruct_time_path(came_from, start_state, best_state)
+        ratio = max(1.0, best_cost / lower) if lower > 0 else 1.0
+        if stats.timed_out:
+            # an interrupted round proves only the ratio, not its eps; a finished round's bound still holds
+            stats.suboptimality = min(stats.suboptimality or ratio, ratio)
+            break
+        stats.suboptimality = min(eps, ratio)
+        if stats.suboptimality <= 1.0:
+            stats.suboptimality = 1.0
+            break
+        # next round: tighter weight, frontier = OPEN + INCONS re-keyed, CLOSED emptied
+        eps = max(1.0, eps - epsilon_step)
+        frontier = [(cost_so_far[s] + eps * h(s[0]), cost_so_far[s], s) for s in set(live) | incons]
+        heapq.heapify(frontier)
+        closed.clear()
+        incons.clear()
+
+    _finish(stats, t0, frontier, came_from, cost_so_far)
+    return path, stats
+
+# Array-backed variants over CompiledGrid. A state is a single int key, cell * T + steps
+# (steps = t - start_time, T = max_time + 2), and `best` maps key -> g * n + parent cell,
+# replacing the came_from/cost_so_far dicts of ((r, c), t) tuples. The priority queue is
+# bucketed by f (costs are integers >= 1, so f never decreases), and each bucket is a small
+# heap of g * NT + key, which orders ties by (g, cell, t) exactly like the tuple versions.
+# The returned paths are therefore identical to bfs/ucs/astar_time_aware.
+
+def reconstruct_compiled_path(cg: CompiledGrid, best: Dict[int, int], goal_key: int, T: int):
+    """Walks back through `best`. Only the start state has steps == 0."""
+    path = []
+    cur = goal_key
+    while True:
+        cell, steps = divmod(cur, T)
+        path.append(cg.pos_of(cell))
+        if steps == 0:
+            break
+        cur = (best[cur] % cg.n) * T + steps - 1
+    path.reverse()
+    return path
+
+def bfs_compiled(cg: CompiledGrid, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000):
+    stats = SearchStats()
+    t0 = time.perf_counter()
+    cg.reservations.materialize(start_time, start_time + max_time + 1)
+    n, adjacency, reserved = cg.n, cg.adjacency, cg.reservations.cells
+    goal_cell = cg.cell_id(goal)
+    T = max_time + 2
+
+    start_key = cg.cell_id(start) * T
+    frontier = deque([start_key])
+    best = {start_key: 0}
+    expanded = 0
+
+    while frontier:
+        key = frontier.popleft()
+        expanded += 1
+        cell, steps = divmod(key, T)
+        if cell == goal_cell:
+            stats.nodes_expanded = expanded
+            stats.time_taken = time.perf_counter() - t0
+            return reconstruct_compiled_path(cg, best, key, T), stats
+        if steps > max_time:
+            continue
+        occ = reserved.get(start_time + steps + 1)
+        for nbr in adjacency[cell]:
+            if occ is not None and nbr in occ:
+                continue
+            next_key = nbr * T + steps + 1
+            if next_key not in best:
+                best[next_key] = cell
+                frontier.append(next_key)
+
+    stats.nodes_expanded = expanded
+    stats.time_taken = time.perf_counter() - t0
+    return [], stats
+
+def _bucketed_search(cg: CompiledGrid, start: Pos, goal: Pos, start_time: int, max_time: int, h,
+                     manhattan: bool = False):
+    """
+    Shared core of ucs_compiled (h is None) and astar_compiled. With manhattan=True and no table,
+    h is Manhattan distance from two per-axis tables, so short queries on big maps do not pay
+    for an O(cells) table.
+
+    Past the reservation horizon nothing is ever blocked again, so a state (cell, s) is
+    dominated by (cell, s0) with s0 <= s and g0 <= g: every continuation of the later one is
+    available to the earlier one at no more cost. Such states are never pushed. In that free
+    region the cheapest known state of each cell lives in `floor[cell] = (g, steps, parent)`
+    rather than in the `best` dict, which then only holds the reserved region and the rare
+    earlier-but-dearer states. This needs h admissible with h(goal) = 0 (Manhattan, a field
+    table) and returns the same path as the unpruned search.
+    """
+    stats = SearchStats()
+    t0 = time.perf_counter()
+    cg.reservations.materialize(start_time, start_time + max_time + 1)
+    n, adjacency, cost, reserved = cg.n, cg.adjacency, cg.cost_list, cg.reservations.cells
+    goal_cell = cg.cell_id(goal)
+    push, pop = heapq.heappush, heapq.heappop
+    inf = float('inf')
+    T = max_time + 2
+    NT = n * T
+    cols = cg.cols
+    gr, gc = goal
+    # first step count whose arrival time is past the last reserved timestep
+    free_from = max(cg.reservations.horizon + 1 - start_time, 0)
+    if h is None and not manhattan:
+        h = [0] * n
+    hr = [abs(r - gr) for r in range(cg.rows)]
+    hc = [abs(c - gc) for c in range(cols)]
+
+    start_cell = cg.cell_id(start)
+    start_key = start_cell * T
+    cur_f = h[start_cell] if h is not None else hr[start[0]] + hc[start[1]]
+    bucket = [start_key]
+    buckets = {cur_f: bucket}
+    best = {}
+    floor = [None] * n
+    if free_from == 0:
+        floor[start_cell] = (0, 0, -1)
+    else:
+        best[start_key] = 0
+    expanded = 0
+
+    def path_to(key):
+        path = []
+        while True:
+            cell, steps = divmod(key, T)
+            path.append(cg.pos_of(cell))
+            if steps == 0:
+                break
+            packed = best.get(key)
+            parent = packed % n if packed is not None else floor[cell][2]
+            key = parent * T + steps - 1
+        path.reverse()
+        return path
+
+    while True:
+        if not bucket:
+            del buckets[cur_f]
+            if not buckets:
+                break
+            cur_f = min(buckets)
+            bucket = buckets[cur_f]
+        g, key = divmod(pop(bucket), NT)
+        cell, steps = divmod(key, T)
+        fl = floor[cell]
+        if fl is not None and fl[1] == steps:
+            if g > fl[0]:
+                continue  # stale entry: this state was already expanded with a lower cost
+        elif g * n > best.get(key, -1):
+            continue
+        expanded += 1
+        if cell == goal_cell:
+            stats.nodes_expanded = expanded
+            stats.time_taken = time.perf_counter() - t0
+            return path_to(key), stats
+        if steps > max_time:
+            continue
+        s1 = steps + 1
+        if s1 >= free_from:
+            for nbr in adjacency[cell]:
+                ng = g + cost[nbr]
+                fl = floor[nbr]
+                if fl is None:
+                    floor[nbr] = (ng, s1, cell)
+                elif ng < fl[0]:
+                    if fl[1] < s1:
+                        best[nbr * T + fl[1]] = fl[0] * n + fl[2]  # earlier but dearer: still live
+                    best.pop(nbr * T + s1, None)
+                    floor[nbr] = (ng, s1, cell)
+                elif fl[1] <= s1:
+                    continue  # dominated
+                else:
+                    next_key = nbr * T + s1
+                    if ng * n + n > best.get(next_key, inf):
+                        continue
+                    best[next_key] = ng * n + cell
+                f = ng + (h[nbr] if h is not None else hr[nbr // cols] + hc[nbr % cols])
+                if f == cur_f:
+                    push(bucket, ng * NT + nbr * T + s1)
+                else:
+                    b = buckets.get(f)
+                    if b is None:
+                        buckets[f] = [ng * NT + nbr * T + s1]
+                    else:
+                        push(b, ng * NT + nbr * T + s1)
+        else:
+            occ = reserved.get(start_time + s1)
+            g_best = g * n + cell
+            for nbr in adjacency[cell]:
+                if occ is not None and nbr in occ:
+                    continue
+                c = cost[nbr]
+                next_key = nbr * T + s1
+                packed = g_best + c * n
+                # strict improvement of g, whatever parent cell is packed in the old value
+                if packed - cell + n <= best.get(next_key, inf):
+                    best[next_key] = packed
+                    ng = g + c
+                    f = ng + (h[nbr] if h is not None else hr[nbr // cols] + hc[nbr % cols])
+                    b = buckets.get(f)
+                    if b is None:
+                        buckets[f] = [ng * NT + next_key]
+                    else:
+                        push(b, ng * NT + next_key)
+
+    stats.nodes_expanded = expanded
+    stats.time_taken = time.perf_counter() - t0
+    return [], stats
+
+def ucs_compiled(cg: CompiledGrid, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000):
+    return _bucketed_search(cg, start, goal, start_time, max_time, None)
+
+def astar_compiled(cg: CompiledGrid, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000,
+                   h: List[float] = None):
+    """h: optional per-cell heuristic table (e.g. FieldHeuristic.flat); Manhattan distance by default."""
+    return _bucketed_search(cg, start, goal, start_time, max_time, h, manhattan=True)
+
+def astar_compact(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000,
+                  allow_wait: bool = True, wait_cost: int = 1, h: List[float] = None):
+    """
+    Memory-bounded time-aware A*.
+    - Time is only tracked while it matters: every state at or after the schedule horizon
+      (the last reserved timestep + 1) collapses into one spatial layer, since nothing can
+      block a cell any more. Before the horizon, states are (cell, t) as usual.
+    - The agent may wait in place (cost `wait_cost`) while obstacles are still scheduled,
+      so it can let a vehicle pass instead of detouring.
+    - The spatial layer lives in flat parallel arrays (g, parent, steps) indexed by cell id;
+      the short time-expanded prefix uses int-keyed dicts. No ((r, c), t) tuples are stored.
+    max_time is checked against the step count of each state's best arrival.
+    h: optional per-cell heuristic table; Manhattan distance by default.
+    """
+    stats = SearchStats()
+    t0 = time.perf_counter()
+    cg = grid.compile()
+    cg.reservations.materialize(start_time, start_time + max_time + 1)
+    n, adjacency, cost, reserved = cg.n, cg.adjacency, cg.cost_list, cg.reservations.cells
+    cols = cg.cols
+    gr, gc = goal
+    inf = float('inf')
+    goal_cell = cg.cell_id(goal)
+    start_cell = cg.cell_id(start)
+    # layers 0..K-1 are timesteps start_time..horizon; layer K is the collapsed spatial layer.
+    # A periodic schedule never ends; then the time layers run to max_time (no later state is expanded).
+    K = max(int(min(grid.reservations.horizon, start_time + max_time + 1)) + 1 - start_time, 0)
+
+    time_g: Dict[int, float] = {}
+    time_parent: Dict[int, int] = {}
+    # spatial layer; parent >= 0 is a cell in layer K-1, <= -2 encodes cell -(p + 2) in layer K
+    space_g = None
+    space_parent = None
+    space_steps = None
+
+    def spatial_arrays():
+        return array('d', [inf]) * n, array('i', [-1]) * n, array('i', [0]) * n
+
+    if K == 0:
+        space_g, space_parent, space_steps = spatial_arrays()
+        space_g[start_cell] = 0
+    else:
+        time_g[start_cell] = 0
+        time_parent[start_cell] = -1
+    entry = (h[start_cell] if h is not None else abs(start[0] - gr) + abs(start[1] - gc), 0, 0, start_cell)
+    frontier = [entry]
+    peak_frontier = 1
+    expanded = 0
+
+    def finish(path):
+        stats.nodes_expanded = expanded
+        stats.peak_memory = _state_bytes([], time_g, time_parent) + sys.getsizeof(frontier) + peak_frontier * _deep_size(entry)
+        if space_g is not None:
+            stats.peak_memory += sum(a.buffer_info()[1] * a.itemsize for a in (space_g, space_parent, space_steps))
+        stats.time_taken = time.perf_counter() - t0
+        return path, stats
+
+    while frontier:
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
+        entry = heapq.heappop(frontier)
+        _, g, k, cell = entry
+        if k == K:
+            if g > space_g[cell]:
+                continue
+            steps = space_steps[cell]
+        else:
+            if g > time_g[k * n + cell]:
+                continue
+            steps = k
+        expanded += 1
+        if cell == goal_cell:
+            path = []
+            while True:
+                path.append(cg.pos_of(cell))
+                if k == K:
+                    p = space_parent[cell]
+                    if p == -1:
+                        break
+                    if p <= -2:
+                        cell = -p - 2
+                    else:
+                        cell, k = p, k - 1
+                else:
+                    p = time_parent[k * n + cell]
+                    if p == -1:
+                        break
+                    cell, k = p, k - 1
+            path.reverse()
+            return finish(path)
+        if steps > max_time:
+            continue
+        nk = k + 1 if k < K else K
+        occ = reserved.get(start_time + steps + 1) if nk < K else None
+        moves = adjacency[cell]
+        if allow_wait and k < K:
+            moves = moves + (cell,)
+        if nk == K and space_g is None:
+            space_g, space_parent, space_steps = spatial_arrays()
+        for nbr in moves:
+            if occ is not None and nbr in occ:
+                continue
+            ng = g + (wait_cost if nbr == cell else cost[nbr])
+            if nk == K:
+                if ng < space_g[nbr]:
+                    space_g[nbr] = ng
+                    space_parent[nbr] = cell if k < K else -cell - 2
+                    space_steps[nbr] = steps + 1
+                    hn = h[nbr] if h is not None else abs(nbr // cols - gr) + abs(nbr % cols - gc)
+                    heapq.heappush(frontier, (ng + hn, ng, nk, nbr))
+            else:
+                key = nk * n + nbr
+                if ng < time_g.get(key, inf):
+                    time_g[key] = ng
+                    time_parent[key] = cell
+                    hn = h[nbr] if h is not None else abs(nbr // cols - gr) + abs(nbr % cols - gc)
+                    heapq.heappush(frontier, (ng + hn, ng, nk, nbr))
+
+    return finish([])
+
+def safe_intervals(times: List[int]) -> List[Tuple[int, float]]:
+    """Maximal obstacle-free [lo, hi] timestep intervals given a cell's sorted reserved times."""
+    intervals = []
+    lo = 0
+    for t in times:
+        if t > lo:
+            intervals.append((lo, t - 1))
+        lo = max(lo, t + 1)
+    intervals.append((lo, float('inf')))
+    return intervals
+
+def sipp(grid: GridWorld, start: Pos, goal: Pos, start_time: int = 0, max_time: int = 1000):
+    """
+    Safe-interval path planning (Phillips & Likhachev 2011). Each cell's timeline is split into
+    maximal collision-free intervals from the obstacle schedules, and the search runs over
+    (cell, interval) states, reaching each at its earliest possible time (waiting in place
+    when needed). Sparse schedules give a handful of intervals per cell, so the search size no
+    longer grows with the horizon. Minimizes arrival time; terrain cost breaks ties.
+    Returns the per-timestep path (waits repeat the cell), like the other planners.
+    """
+    stats = SearchStats()
+    t0 = time.perf_counter()
+    inf = float('inf')
+    grid.reservations.materialize(start_time, start_time + max_time + 1)
+    by_cell = grid.reservations.times_by_cell()
+    cols = grid.cols
+    cache: Dict[Pos, List[Tuple[int, float]]] = {}
+
+    def intervals_of(pos):
+        iv = cache.get(pos)
+        if iv is None:
+            iv = cache[pos] = safe_intervals(by_cell.get(pos[0] * cols + pos[1], ()))
+        return iv
+
+    start_iv = next((i for i, (lo, hi) in enumerate(intervals_of(start)) if lo <= start_time <= hi), None)
+    if start_iv is None:
+        # the start is reserved right now; treat the current instant as its own interval
+        cache[start] = intervals_of(start) + [(start_time, start_time)]
+        start_iv = len(cache[start]) - 1
+
+    start_state = (start, start_iv)
+    frontier = [(manhattan(start, goal), start_time, 0, start_state)]
+    best = {start_state: (start_time, 0)}
+    came_from = {start_state: None}
+
+    while frontier:
+        _, t, c, state = heapq.heappop(frontier)
+        if best[state] < (t, c):
+            continue
+        stats.nodes_expanded += 1
+        pos, idx = state
+        if pos == goal:
+            path = []
+            while state is not None:
+                parent = came_from[state]
+                arrival = best[state][0]
+                path.append(state[0])
+                if parent is not None:
+                    # wait at the parent cell until one step before arrival
+                    path.extend([parent[0]] * (arrival - 1 - best[parent][0]))
+                state = parent
+            path.reverse()
+            stats.peak_memory = _state_bytes(frontier, best, came_from)
+            stats.time_taken = time.perf_counter() - t0
+            return path, stats
+        if t - start_time > max_time:
+            continue
+        hi_here = intervals_of(pos)[idx][1]
+        for nbr in grid.neighbors(pos):
+            move_cost = c + grid.cost(nbr)
+            for j, (lo, hi) in enumerate(intervals_of(nbr)):
+                if lo > hi_here + 1 or lo - start_time > max_time + 1:
+                    break
+                if hi < t + 1:
+                    continue
+                arrival = max(t + 1, lo)
+                nxt = (nbr, j)
+                if (arrival, move_cost) < best.get(nxt, (inf, inf)):
+                    best[nxt] = (arrival, move_cost)
+                    came_from[nxt] = state
+                    heapq.heappush(frontier, (arrival + manhattan(nbr, goal), arrival, move_cost, nxt))
+
+    stats.peak_memory = _state_bytes(frontier, best, came_from)
+    stats.time_taken = time.perf_counter() - t0
+    return [], stats
+
+def local_repair(grid: GridWorld, plan: List[Pos], index: int, t: int, radius: int = 4, window: int = None,
+                 max_time: int = None):
+    """
+    Repairs plan locally when the agent at plan[index] (time t) finds its way blocked. A time-aware
+    A* (moves and waits, checked against grid.occupied_at) runs inside the (2*radius+1)^2 box around
+    the agent and ends on a cell of the plan's next `window` steps (default 4 * radius), rejoining
+    the plan there. It minimizes detour cost + remaining plan cost, and only accepts a rejoin point
+    if the rest of the plan, delayed by the detour, is still free of known obstacles.
+    Returns (new plan from the current cell, stats); [] if no repair exists within the bounds.
+    """
+    stats = SearchStats()
+    t0 = time.perf_counter()
+    window = window if window is not None else 4 * radius
+    max_time = max_time if max_time is not None else 2 * window
+    start = plan[index]
+    r0, c0 = start
+    # remaining cost of the plan from each step; rejoin targets: cell -> latest step in the window
+    rest = [0] * len(plan)
+    for k in range(len(plan) - 2, index - 1, -1):
+        rest[k] = rest[k + 1] + (grid.cost(plan[k + 1]) if plan[k + 1] != plan[k] else 1)
+    targets = {}
+    for k in range(index + 1, min(len(plan), index + window + 1)):
+        if abs(plan[k][0] - r0) <= radius and abs(plan[k][1] - c0) <= radius:
+            targets[plan[k]] = k
+
+    def h(pos):
+        return min(manhattan(pos, p) + rest[k] for p, k in targets.items())
+
+    def rejoins(k, arrival):
+        # the plan continues from step k at time arrival; it must stay clear of known obstacles
+        return all(not grid.occupied_at(plan[m], arrival + m - k) for m in range(k + 1, len(plan)))
+
+    if not targets:
+        stats.time_taken = time.perf_counter() - t0
+        return [], stats
+    start_state = (start, t)
+    frontier = [(h(start), 0, start_state, False)]
+    came_from = {start_state: None}
+    cost_so_far = {start_state: 0}
+    while frontier:
+        _, g, current, done = heapq.heappop(frontier)
+        (pos, tt) = current
+        if done:
+            k = targets[pos]
+            path = reconstruct_time_path(came_from, start_state, current)
+            _finish(stats, t0, frontier, came_from, cost_so_far)
+            return path + plan[k + 1:], stats
+        if g > cost_so_far[current]:
+            continue
+        stats.nodes_expanded += 1
+        if pos in targets and tt > t and rejoins(targets[pos], tt):
+            k = targets[pos]
+            heapq.heappush(frontier, (g + rest[k], g, current, True))
+        if tt - t >= max_time:
+            continue
+        for nbr in list(grid.neighbors(pos)) + [pos]:
+            if abs(nbr[0] - r0) > radius or abs(nbr[1] - c0) > radius or grid.occupied_at(nbr, tt + 1):
+                continue
+            new_cost = g + (grid.cost(nbr) if nbr != pos else 1)
+            next_state = (nbr, tt + 1)
+            if new_cost < cost_so_far.get(next_state, float('inf')):
+                cost_so_far[next_state] = new_cost
+                came_from[next_state] = current
+                heapq.heappush(frontier, (new_cost + h(nbr), new_cost, next_state, False))
+    _finish(stats, t0, frontier, came_from, cost_so_far)
     return [], stats
 
-# Simple greedy hill-climbing (not time-aware by default) used for replanning in unpredictable mode
-import random
-def greedy_hill_climb(grid: GridWorld, start: Pos, goal: Pos, max_restarts=10, max_steps=500):
-    best_path = []
-    best_len = float('inf')
-    for r in range(max_restarts):
-        current = start
-        path = [current]
-        for step in range(max_steps):
-            if current == goal:
-                if len(path) < best_len:
-                    best_path = path[:]
-                    best_len = len(path)
+class DStarLite:
+    """
+    Incremental replanner (D* Lite, Koenig & Likhachev 2002) over the static spatial grid.
+    Searches backward from the goal and keeps g/rhs values across calls, so when cells become
+    blocked, unblocked or change cost only the affected part of the search is repaired.
+    Entering a cell costs its terrain value; cells in `blocked` (surprise obstacles) cost inf.
+    Terrain edits made on the grid (set_cells, block, batch, ...) are read from its change log
+    on the next plan() and repaired the same way.
+    """
+    def __init__(self, grid: GridWorld, start: Pos, goal: Pos):
+        self.grid = grid
+        self.start = start
+        self.goal = goal
+        self.last = start
+        self.km = 0
+        self.g: Dict[Pos, float] = {}
+        self.rhs: Dict[Pos, float] = {goal: 0}
+        self.blocked = set()
+        self.open: Dict[Pos, Tuple[float, float]] = {}
+        self.frontier = []
+        self.nodes_expanded = 0
+        self.version = grid.version
+        self._insert(goal)
+
+    def _h(self, a: Pos, b: Pos) -> int:
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    def _key(self, s: Pos):
+        m = min(self.g.get(s, float('inf')), self.rhs.get(s, float('inf')))
+        return (m + self._h(self.start, s) + self.km, m)
+
+    def _insert(self, s: Pos):
+        key = self._key(s)
+        self.open[s] = key
+        heapq.heappush(self.frontier, (key, s))
+
+    def _edge_cost(self, v: Pos) -> float:
+        """Cost of entering v."""
+        if v in self.blocked or not self.grid.passable(v):
+            return float('inf')
+        return self.grid.cost(v)
+
+    def _adjacent(self, s: Pos):
+        r, c = s
+        for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
+            n = (r+dr, c+dc)
+            if self.grid.in_bounds(n):
+                yield n
+
+    def _update_vertex(self, u: Pos):
+        if u != self.goal:
+            best = float('inf')
+            for s in self._adjacent(u):
+                cost = self._edge_cost(s)
+                if cost < float('inf'):
+                    best = min(best, cost + self.g.get(s, float('inf')))
+            self.rhs[u] = best
+        self.open.pop(u, None)
+        if self.g.get(u, float('inf')) != self.rhs.get(u, float('inf')):
+            self._insert(u)
+
+    def _top(self):
+        # lazy deletion: drop heap entries that no longer match the open set
+        while self.frontier:
+            key, s = self.frontier[0]
+            if self.open.get(s) == key:
+                return key, s
+            heapq.heappop(self.frontier)
+        return None, None
+
+    def compute_shortest_path(self) -> int:
+        """Repairs the search; returns the number of nodes expanded by this call."""
+        expanded = 0
+        inf = float('inf')
+        while True:
+            k_old, u = self._top()
+            if u is None:
                 break
-            nbrs = list(grid.neighbors(current))
-            if not nbrs:
+            if not (k_old < self._key(self.start) or self.rhs.get(self.start, inf) != self.g.get(self.start, inf)):
                 break
-            # choose neighbor that reduces heuristic with tie-break random
-            nbrs.sort(key=lambda n: (manhattan(n, goal), random.random()))
-            current = nbrs[0]
-            path.append(current)
-        # random restart: choose random start near original start sometimes (simulates random restart)
-    return best_path
+            expanded += 1
+            k_new = self._key(u)
+            if k_old < k_new:
+                heapq.heappop(self.frontier)
+                self._insert(u)
+            elif self.g.get(u, inf) > self.rhs.get(u, inf):
+                heapq.heappop(self.frontier)
+                del self.open[u]
+                self.g[u] = self.rhs[u]
+                for p in self._adjacent(u):
+                    if self.grid.passable(p):
+                        self._update_vertex(p)
+            else:
+                self.g[u] = inf
+                for p in list(self._adjacent(u)) + [u]:
+                    if self.grid.passable(p):
+                        self._update_vertex(p)
+        self.nodes_expanded += expanded
+        return expanded
+
+    def move_to(self, pos: Pos):
+        """Moves the search start to the agent's current cell; km keeps queued keys lower bounds."""
+        if pos != self.last:
+            self.km += self._h(self.last, pos)
+            self.last = pos
+        self.start = pos
+
+    def update_cells(self, cells):
+        """Notifies the planner that the cost or blocked state of `cells` changed."""
+        for v in cells:
+            # v's own rhs too: a reopened cell has never been evaluated
+            for u in list(self._adjacent(v)) + [v]:
+                if self.grid.passable(u):
+                    self._update_vertex(u)
+
+    def sync(self):
+        """Applies the grid's terrain changes since the last sync (a full restart if the log is too short)."""
+        if self.version == self.grid.version:
+            return
+        changes = self.grid.changes_since(self.version)
+        if changes is None:
+            self.__init__(self.grid, self.start, self.goal)
+            return
+        cells = {p for ch in changes if ch.kind == "terrain" for p in ch.cells}
+        self.version = self.grid.version
+        if cells:
+            self.update_cells(cells)
+
+    def set_blocked(self, blocked):
+        """Replaces the set of temporarily blocked cells, repairing only around the cells that changed."""
+        blocked = set(blocked)
+        changed = blocked ^ self.blocked
+        self.blocked = blocked
+        if changed:
+            self.update_cells(changed)
+
+    def path(self, max_len: int = 100000) -> List[Pos]:
+        """Greedy descent of g from the current start; [] if the goal is unreachable."""
+        inf = float('inf')
+        if self.g.get(self.start, inf) == inf:
+            return []
+        path = [self.start]
+        cur = self.start
+        while cur != self.goal and len(path) <= max_len:
+            best, nxt = inf, None
+            for s in self._adjacent(cur):
+                cost = self._edge_cost(s) + self.g.get(s, inf)
+                if cost < best:
+                    best, nxt = cost, s
+            if nxt is None:
+                return []
+            cur = nxt
+            path.append(cur)
+        return path if cur == self.goal else []
+
+    def plan(self, start: Pos):
+        """Moves to `start`, repairs the search and returns (path, stats) like the other planners."""
+        stats = SearchStats()
+        t0 = time.perf_counter()
+        self.move_to(start)
+        self.sync()
+        stats.nodes_expanded = self.compute_shortest_path()
+        path = self.path()
+        stats.time_taken = time.perf_counter() - t0
+        return path, stats
@@ -0,0 +1,146 @@
+# service.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+import numpy as np
+from grid import GridWorld
+from agent import DeliveryAgent
+import batch
+import search
+
+Pos = Tuple[int, int]
+
+def _plan_with(agent: DeliveryAgent, start: Pos, goal: Pos, start_time: int, due: float, partial: bool):
+    """
+    Runs one query with whatever is left of its budget. due is a time.monotonic() value, which
+    is one system-wide clock, so it means the same in every worker process. A request whose
+    budget ran out while it was queued fails fast without searching.
+    """
+    budget = None
+    if due is not None:
+        budget = due - time.monotonic()
+        if budget <= 0:
+            stats = search.SearchStats()
+            stats.timed_out = True
+            return ([start] if partial else []), stats
+    return agent.plan(start, goal, start_time, time_budget=budget, partial=partial)
+
+def _plan_in_process(start: Pos, goal: Pos, start_time: int, due: float, partial: bool):
+    return _plan_with(batch._worker["agent"], start, goal, start_time, due, partial)
+
+class PlanningService:
+    """
+    asyncio front end for DeliveryAgent.plan on one loaded grid. Searches run on a worker pool
+    (processes mapping the cost array from shared memory, like plan_batch, or threads), so the
+    event loop never blocks. Identical in-flight requests (start, goal, start_time, partial) share
+    one search, and every request can carry a deadline that bounds both the search (astar stops and
+    returns [] or its best partial path) and the caller's wait.
+    """
+    def __init__(self, grid: GridWorld, workers: int = None, processes: bool = True, algo: str = "astar",
+                 default_deadline: float = None, grace: float = 0.02, **agent_kwargs):
+        """
+        workers: pool size (default: CPU count)
+        processes: process pool (true parallelism) or thread pool (cheap to start; searches share the GIL,
+                   and the grid's field/heuristic caches, which are locked)
+        default_deadline: seconds per request when plan() gets none (None: no limit)
+        grace: extra seconds a caller waits past its deadline for the search's own timeout result
+        Extra keyword arguments (planning_horizon, heuristic, ...) go to DeliveryAgent.
+        """
+        self.grid = grid
+        self.workers = workers or os.cpu_count() or 1
+        self.default_deadline = default_deadline
+        self.grace = grace
+        self.requests = 0
+        self.coalesced = 0
+        self.timed_out = 0
+        self._inflight: Dict[tuple, Tuple[asyncio.Future, float]] = {}
+        self._shm = None
+        kwargs = dict(agent_kwargs, algo=algo)
+        if processes:
+            arr = np.ascontiguousarray(grid.grid)
+            self._shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=self._shm.buf)[...] = arr
+            schedules = [o.to_json() for o in grid.dynamic_obstacles]
+            self._pool = ProcessPoolExecutor(self.workers, initializer=batch._init_worker,
+                                             initargs=(self._shm.name, arr.shape, arr.dtype.str, schedules, kwargs))
+            self._call = _plan_in_process
+        else:
+            local = threading.local()
+            def call(*args):
+                agent = getattr(local, "agent", None)
+                if agent is None:
+                    agent = local.agent = DeliveryAgent(grid, **kwargs)
+                return _plan_with(agent, *args)
+            self._pool = ThreadPoolExecutor(self.workers)
+            self._call = call
+
+    async def plan(self, start: Pos, goal: Pos, start_time: int = 0, deadline: float = None,
+                   partial: bool = False) -> Tuple[List[Pos], search.SearchStats]:
+        """
+        Returns (path, stats) like DeliveryAgent.plan. deadline: seconds from now. When it passes,
+        stats.timed_out is set and path is [] or, with partial=True, the best partial path found.
+        A request joins an identical in-flight search if that search's deadline is not tighter than
+        its own (deadlines compared as given, so equal-deadline requests share); if the shared
+        search times out while this request still has time left, it runs its own.
+        """
+        start, goal, start_time = tuple(start), tuple(goal), int(start_time)
+        deadline = self.default_deadline if deadline is None else deadline
+        limit = deadline if deadline is not None else float('inf')
+        due = time.monotonic() + limit
+        self.requests += 1
+        key = (start, goal, start_time, partial)
+        entry = self._inflight.get(key)
+        shared = entry is not None and entry[1] >= limit
+        if shared:
+            fut = entry[0]
+            self.coalesced += 1
+        else:
+            fut = self._submit(key, limit, due)
+        path, stats = await self._wait(fut, key, due)
+        if shared and stats.timed_out and time.monotonic() < due:
+            # the shared search started earlier and ran out first
+            path, stats = await self._wait(self._submit(key, limit, due), key, due)
+        if stats.timed_out:
+            self.timed_out += 1
+        return list(path), stats
+
+    def _submit(self, key: tuple, limit: float, due: float) -> asyncio.Future:
+        start, goal, start_time, partial = key
+        fut = asyncio.get_running_loop().run_in_executor(self._pool, self._call, start, goal, start_time,
+                                                         due if limit != float('inf') else None, partial)
+        self._inflight[key] = (fut, limit)
+        fut.add_done_callback(lambda f: self._forget(key, f))
+        return fut
+
+    async def _wait(self, fut: asyncio.Future, key: tuple, due: float):
+        try:
+            # shield: a caller giving up must not cancel the search other callers share
+            return await asyncio.wait_for(asyncio.shield(fut), due - time.monotonic() + self.grace
+                                          if due != float('inf') else None)
+        except asyncio.TimeoutError:
+            stats = search.SearchStats()
+            stats.timed_out = True
+            return ([key[0]] if key[3] else []), stats
+
+    def _forget(self, key: tuple, fut: asyncio.Future):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is fut:
+            del self._inflight[key]
+
+    async def close(self):
+        """Waits for running searches, then stops the pool and frees the shared grid."""
+        await asyncio.get_running_loop().run_in_executor(None, self._pool.shutdown)
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,147 @@
+# simulation.py
+import gzip
+import json
+import random
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from grid import GridWorld, DynamicObstacle
+from agent import DeliveryAgent
+
+Pos = Tuple[int, int]
+
+class SurpriseGenerator:
+    """
+    Seeded unpredictable obstacles for DeliveryAgent.run / follow_and_replan. Before each move, with
+    probability `rate` an obstacle appears from the next timestep on for `duration` steps: with
+    probability `on_route` on the cell the agent is about to enter (forcing a replan), otherwise on
+    a random passable cell within `radius` of the agent. Never on the agent's own cell.
+    """
+    def __init__(self, rate: float = 0.1, duration: int = 3, on_route: float = 0.5, radius: int = 3, seed: int = 0):
+        self.rate = rate
+        self.duration = duration
+        self.on_route = on_route
+        self.radius = radius
+        self.rng = random.Random(seed)
+        self.count = 0
+
+    def __call__(self, grid: GridWorld, t: int, pos: Pos, next_pos: Pos) -> List[DynamicObstacle]:
+        rng = self.rng
+        if rng.random() >= self.rate:
+            return []
+        if next_pos != pos and rng.random() < self.on_route:
+            cell = next_pos
+        else:
+            r, c = pos
+            cell = (r + rng.randint(-self.radius, self.radius), c + rng.randint(-self.radius, self.radius))
+            if cell == pos or not grid.in_bounds(cell) or not grid.passable(cell):
+                return []
+        self.count += 1
+        return [DynamicObstacle(f"surprise{self.count}", [cell] * self.duration, start_time=t + 1)]
+
+def simulate(agent: DeliveryAgent, tasks: Iterable[Tuple[str, Pos, Pos]], surprises: Callable = None,
+             max_steps: int = 1000, next_goal: Callable = None, prune_every: int = 256) -> Iterator[dict]:
+    """
+    Runs several vehicles in lockstep on agent.grid and yields their events as they happen (the
+    event dicts of DeliveryAgent.run plus "agent": id). Every vehicle plans with `agent`'s settings
+    but on its own; they do not avoid each other.
+    next_goal(id, pos, t) -> goal or None: hands a vehicle that finished (reached its goal or gave
+    up) a new goal, so one run can cover hours of deliveries; None retires it.
+    Every prune_every ticks, obstacles and reservations that are already in the past are dropped,
+    so memory stays flat however long the run is.
+    """
+    grid = agent.grid
+    runs = {}
+    for aid, start, goal in tasks:
+        runs[aid] = agent.run(tuple(start), tuple(goal), max_steps=max_steps, surprises=surprises)
+    clock = {aid: 0 for aid in runs}
+    tick = 0
+    while runs:
+        for aid in list(runs):
+            # advance this vehicle by one timestep (or until its run ends)
+            for ev in runs[aid]:
+                ev["agent"] = aid
+                yield ev
+                if ev["event"] == "step":
+                    clock[aid] = ev["t"]
+                    break
+                if ev["event"] == "end":
+                    goal = next_goal(aid, ev["pos"], ev["t"]) if next_goal else None
+                    if goal is None:
+                        del runs[aid]
+                        del clock[aid]
+                    else:
+                        runs[aid] = agent.run(ev["pos"], tuple(goal), max_steps=max_steps, surprises=surprises,
+                                              start_time=ev["t"])
+                    break
+        tick += 1
+        if clock and tick % prune_every == 0:
+            grid.forget_before(min(clock.values()))
+
+def compact(ev: dict, paths: bool = False) -> dict:
+    """Flat JSON-ready form of an event: paths shrink to their length unless paths=True."""
+    out = {"e": ev["event"], "a": ev.get("agent"), "t": ev["t"]}
+    kind = ev["event"]
+    if kind == "plan":
+        stats = ev["stats"]
+        out.update(src=ev["source"], len=len(ev["path"]), nodes=stats.nodes_expanded,
+                   ms=round(1000 * stats.time_taken, 3))
+        if paths:
+            out["path"] = [list(p) for p in ev["path"]]
+    elif kind == "surprise":
+        obs = ev["obstacle"]
+        out.update(p=list(obs.path[0]), start=obs.start_time, until=obs.last_time)
+    elif kind in ("step", "end"):
+        out["p"] = list(ev["pos"])
+        if kind == "end":
+            out["ok"] = ev["success"]
+    return out
+
+class EventLog:
+    """
+    Incremental JSON Lines event log (gzip-compressed if the name ends in .gz; no file if file_path
+    is None). Writes go through a buffered file, so the log costs constant memory; summary holds
+    running totals. steps=False leaves the per-step events out, which is most of the volume.
+    """
+    def __init__(self, file_path: Optional[str], steps: bool = True, paths: bool = False):
+        self.file = None
+        if file_path is not None:
+            self.file = gzip.open(file_path, "wt") if file_path.endswith(".gz") else open(file_path, "w")
+        self.steps = steps
+        self.paths = paths
+        self.summary = {"steps": 0, "plans": 0, "surprises": 0, "deliveries": 0, "failures": 0,
+                        "nodes_expanded": 0, "plan_time": 0.0}
+
+    def write(self, ev: dict):
+        kind = ev["event"]
+        s = self.summary
+        if kind == "step":
+            s["steps"] += 1
+        elif kind == "plan":
+            s["plans"] += 1
+            s["nodes_expanded"] += ev["stats"].nodes_expanded
+            s["plan_time"] += ev["stats"].time_taken
+        elif kind == "surprise":
+            s["surprises"] += 1
+        elif kind == "end":
+            s["deliveries" if ev["success"] else "failures"] += 1
+        if self.file is not None and (self.steps or kind != "step"):
+            self.file.write(json.dumps(compact(ev, self.paths), separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def record(events: Iterable[dict], file_path: Optional[str] = None, steps: bool = True) -> Dict:
+    """Drains an event stream, writing it to file_path if given; returns the running totals."""
+    t0 = time.perf_counter()
+    with EventLog(file_path, steps) as log:
+        for ev in events:
+            log.write(ev)
+    log.summary["wall_time"] = time.perf_counter() - t0
+    return log.summary
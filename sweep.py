@@ -0,0 +1,207 @@
+# sweep.py
+# Parameter sweeps: the cross product of maps x algos x DeliveryAgent params x seeds, run on a
+# process pool, checkpointed per cell to JSON Lines (an interrupted sweep resumes where it stopped)
+# and aggregated into one columnar .npz file.
+# Run from the repo root: python sweep.py maps/sweep.json --out sweep_results.npz --workers 4
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import statistics
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List
+import numpy as np
+from grid import GridWorld
+from agent import DeliveryAgent
+from simulation import SurpriseGenerator
+
+# cell keys that describe the run rather than DeliveryAgent arguments
+RUN_KEYS = ("map", "seed", "repeats", "warmup", "surprise_rate", "max_steps")
+METRICS = ("success", "path_len", "plans", "nodes", "plan_time", "surprises", "wall_time", "error")
+
+def expand(spec: Dict) -> List[Dict]:
+    """
+    Every cell of a declarative grid: list values are swept, anything else is fixed for all cells.
+    "map" entries are {"file", "start", "goal", "dynamic"} dicts ("dynamic" is a schedule JSON path,
+    "unpredictable" for seeded surprise obstacles, or absent). All other keys except seed, repeats,
+    warmup, surprise_rate and max_steps go to DeliveryAgent (algo, planning_horizon, replanner, ...).
+    """
+    names = sorted(spec)
+    axes = [spec[n] if isinstance(spec[n], list) else [spec[n]] for n in names]
+    return [dict(zip(names, values)) for values in itertools.product(*axes)]
+
+def cell_key(cell: Dict) -> str:
+    """Stable id of a cell: the hash of its canonical JSON, so reordering the spec keeps checkpoints valid."""
+    return hashlib.sha1(json.dumps(cell, sort_keys=True).encode()).hexdigest()[:16]
+
+def run_cell(cell: Dict) -> Dict:
+    """Runs one cell (warmup + repeats x follow_and_replan on a freshly loaded map) and returns its metrics."""
+    m = cell["map"]
+    dynamic = m.get("dynamic")
+    unpredictable = dynamic == "unpredictable"
+    kwargs = {k: v for k, v in cell.items() if k not in RUN_KEYS}
+    t0 = time.perf_counter()
+    runs = []
+    try:
+        warmup = cell.get("warmup", 0)
+        for i in range(warmup + cell.get("repeats", 1)):
+            # surprises are added to the grid while the agent drives, so every repeat starts from the file
+            grid = GridWorld.from_file(m["file"], dynamic_json=None if unpredictable else dynamic)
+            surprises = None
+            if unpredictable:
+                surprises = SurpriseGenerator(rate=cell.get("surprise_rate", 0.1), seed=cell.get("seed", 0))
+            agent = DeliveryAgent(grid, **kwargs)
+            logs = agent.follow_and_replan(tuple(m["start"]), tuple(m["goal"]), dynamic_unpredictable=unpredictable,
+                                           max_steps=cell.get("max_steps", 1000), surprises=surprises)
+            if i >= warmup:
+                runs.append(logs)
+    except Exception as e:  # a bad cell is recorded, not fatal to the sweep
+        return {"success": False, "path_len": 0, "plans": 0, "nodes": 0, "plan_time": float('nan'), "surprises": 0,
+                "wall_time": time.perf_counter() - t0, "error": f"{type(e).__name__}: {e}"}
+    logs = runs[-1]
+    return {
+        "success": bool(logs.get("success")),
+        "path_len": len(logs.get("final_path", [])),
+        "plans": len(logs.get("plans", [])),
+        "nodes": logs["total_nodes_expanded"],
+        "plan_time": statistics.median(r["total_plan_time"] for r in runs),
+        "surprises": logs.get("surprises", 0),
+        "wall_time": time.perf_counter() - t0,
+        "error": "",
+    }
+
+def _run_keyed(item):
+    key, cell = item
+    return key, cell, run_cell(cell)
+
+def load_checkpoint(path: str) -> Dict[str, Dict]:
+    """key -> record of every finished cell in a checkpoint file (a torn last line is ignored)."""
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[rec["key"]] = rec
+    return done
+
+def run_sweep(spec: Dict, checkpoint: str = None, workers: int = None) -> Iterator[Dict]:
+    """
+    Runs every cell of spec not already in the checkpoint and yields
+    {"key", "cell", "result"} records as cells finish (checkpointed ones first). Each finished
+    cell is appended to the checkpoint right away, so a killed sweep loses at most the cells
+    that were running; cells that raised are retried on resume. workers=1 runs in the calling process.
+    """
+    done = {k: r for k, r in load_checkpoint(checkpoint).items() if not r["result"]["error"]}
+    todo, queued = [], set()
+    for cell in expand(spec):
+        key = cell_key(cell)
+        if key in done:
+            yield done.pop(key)
+        elif key not in queued:
+            queued.add(key)
+            todo.append((key, cell))
+    workers = min(workers or os.cpu_count() or 1, max(len(todo), 1))
+    out = None
+    if checkpoint:
+        torn = False
+        if os.path.getsize(checkpoint) if os.path.exists(checkpoint) else 0:
+            with open(checkpoint, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        out = open(checkpoint, "a")
+        if torn:
+            out.write("\n")  # end a line cut off by a killed sweep, so the next record is not glued to it
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(_run_keyed, todo) if pool else map(_run_keyed, todo)
+        for key, cell, result in results:
+            rec = {"key": key, "cell": cell, "result": result}
+            if out is not None:
+                out.write(json.dumps(rec) + "\n")
+                out.flush()
+            yield rec
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if out is not None:
+            out.close()
+
+def _column(values: list) -> np.ndarray:
+    if all(isinstance(v, bool) for v in values):
+        return np.array(values, dtype=bool)
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return np.array(values, dtype=np.int64)
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) or v is None for v in values):
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    return np.array(["" if v is None else str(v) for v in values])
+
+def to_columns(records: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """
+    One array per column, one row per cell, sorted by key: "key", the cell's parameters (the map
+    split into map/start/goal/dynamic columns) and the METRICS.
+    """
+    records = sorted(records, key=lambda r: r["key"])
+    rows = []
+    for r in records:
+        row = {"key": r["key"]}
+        for name, value in r["cell"].items():
+            if name == "map":
+                row.update(map=value["file"], start=str(value["start"]), goal=str(value["goal"]),
+                           dynamic=value.get("dynamic") or "")
+            else:
+                row[name] = value
+        row.update({m: r["result"].get(m) for m in METRICS})
+        rows.append(row)
+    names = list(dict.fromkeys(n for row in rows for n in row))
+    return {n: _column([row.get(n) for row in rows]) for n in names}
+
+def save_results(records: Iterable[Dict], out_file: str) -> Dict[str, np.ndarray]:
+    columns = to_columns(records)
+    np.savez_compressed(out_file, **columns)
+    return columns
+
+def load_results(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {n: data[n] for n in data.files}
+
+def pivot(columns: Dict[str, np.ndarray], index: str, by: str, value: str, agg=np.median):
+    """(row labels, column labels, table) of agg(value) per (index, by) pair; NaN where a pair has no cells."""
+    rows, cols = np.unique(columns[index]), np.unique(columns[by])
+    table = np.full((len(rows), len(cols)), np.nan)
+    ri = np.searchsorted(rows, columns[index])
+    ci = np.searchsorted(cols, columns[by])
+    vals = columns[value].astype(float)
+    for i, j in {(a, b) for a, b in zip(ri.tolist(), ci.tolist())}:
+        table[i, j] = agg(vals[(ri == i) & (ci == j)])
+    return rows, cols, table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spec", help="JSON parameter grid (see sweep.expand)")
+    parser.add_argument("--out", default="sweep_results.npz", help="columnar results")
+    parser.add_argument("--checkpoint", default=None, help="JSON Lines of finished cells (default: OUT with .jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    checkpoint = args.checkpoint or os.path.splitext(args.out)[0] + ".jsonl"
+    cells = expand(spec)
+    finished = {k for k, r in load_checkpoint(checkpoint).items() if not r["result"]["error"]}
+    resumed = len({cell_key(c) for c in cells} & finished)
+    print(f"{len(cells)} cells, {resumed} already in {checkpoint}")
+    records = []
+    for i, rec in enumerate(run_sweep(spec, checkpoint, args.workers), 1):
+        records.append(rec)
+        res = rec["result"]
+        if i > resumed:
+            status = res["error"] or f"nodes {res['nodes']}, plan {1000 * res['plan_time']:.2f} ms"
+            print(f"[{i}/{len(cells)}] {rec['key']} {rec['cell']['map']['file']} {rec['cell'].get('algo', 'astar')}: {status}",
+                  flush=True)
+    save_results(records, args.out)
+    print(f"Saved {len(records)} cells to {args.out}")
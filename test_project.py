@@ -22,3 +22,522 @@ def test_dynamic_blocking():
     # planner should avoid (1,2) at time 2 etc.
     path, stats = search.astar_time_aware(gw, (0,0), (2,2), start_time=0)
     assert path != []  # some path should exist
+
+def test_reservation_index_matches_schedules():
+    gw = GridWorld(np.ones((4,4), dtype=int), [DynamicObstacle("o1", [(0,1),(1,1)], start_time=2)])
+    gw.add_dynamic_obstacle(DynamicObstacle("o2", [(3,3)], start_time=0))
+    assert gw.occupied_at((0,1), 2)
+    assert gw.occupied_at((1,1), 3)
+    assert not gw.occupied_at((1,1), 2)
+    assert gw.occupied_at((3,3), 0)
+    assert not gw.occupied_at((4,0), 0)
+
+def test_compiled_planners_match_dict_planners():
+    rng = np.random.default_rng(7)
+    grid_data = rng.integers(1, 4, size=(8,8))
+    grid_data[rng.random((8,8)) < 0.2] = -1
+    grid_data[0,0] = grid_data[7,7] = 1
+    dyn = [DynamicObstacle("o1", [(0,1),(1,1),(2,1),(3,1)], start_time=1)]
+    gw = GridWorld(grid_data, dyn)
+    cg = gw.compile()
+    for plain, compiled in ((search.bfs_time_aware, search.bfs_compiled),
+                            (search.ucs_time_aware, search.ucs_compiled),
+                            (search.astar_time_aware, search.astar_compiled)):
+        p1, _ = plain(gw, (0,0), (7,7), start_time=0, max_time=40)
+        p2, _ = compiled(cg, (0,0), (7,7), start_time=0, max_time=40)
+        assert p1 == p2
+    # Manhattan is computed inline by default; an explicit table gives the same search
+    table = cg.manhattan_to((7,7))
+    assert search.astar_compiled(cg, (0,0), (7,7), max_time=40, h=table)[0] == p2
+    assert search.astar_compact(gw, (0,0), (7,7), max_time=40, h=table)[0] == search.astar_compact(gw, (0,0), (7,7), max_time=40)[0]
+
+def test_distance_field_heuristic_is_exact():
+    grid_data = np.array([
+        [1,1,1,1],
+        [1,-1,-1,1],
+        [1,5,1,1],
+        [1,1,1,1]
+    ])
+    gw = GridWorld(grid_data, [])
+    field = gw.distance_field((3,3))
+    assert field[3,3] == 0
+    assert field[0,0] == 6
+    assert np.isinf(field[1,1])
+    assert gw.distance_field([(3,3)]) is field  # cached
+    path = search.follow_field(gw, field, (0,0))
+    assert path[0] == (0,0) and path[-1] == (3,3)
+    assert sum(gw.cost(p) for p in path[1:]) == 6
+    h = search.FieldHeuristic(gw, (3,3))
+    assert h.flat[0] == field[0,0] and h.flat[-1] == 0  # the raw field, row-major
+    assert h.exact((0,0)) == 6 and 6 <= h((0,0), (3,3)) < 7  # tie-break inflation stays below 1
+    assert h((3,3), (3,3)) == 0 and np.isinf(h((1,1), (3,3)))
+    p1, s1 = search.astar_time_aware(gw, (0,0), (3,3), heuristic=h)
+    p2, s2 = search.astar_time_aware(gw, (0,0), (3,3))
+    assert sum(gw.cost(p) for p in p1[1:]) == sum(gw.cost(p) for p in p2[1:])
+    assert s1.nodes_expanded <= s2.nodes_expanded
+    p3, _ = search.astar_compiled(gw.compile(), (0,0), (3,3), h=h.flat)
+    assert sum(gw.cost(p) for p in p3[1:]) == 6
+
+def test_multi_goal_distance_field():
+    gw = GridWorld(np.ones((1,7), dtype=int), [])
+    field = gw.distance_field([(0,0), (0,6)])
+    assert list(field[0]) == [0,1,2,3,2,1,0]
+
+def test_plan_batch_matches_serial_plans():
+    from batch import plan_batch
+    from agent import DeliveryAgent
+    gw = GridWorld(np.ones((6,6), dtype=int), [DynamicObstacle("o1", [(2,2),(2,3)], start_time=1)])
+    queries = [((0,0),(5,5)), ((5,0),(0,5),2), ((3,3),(3,3))]
+    agent = DeliveryAgent(gw)
+    results = {idx: path for idx, path, _ in plan_batch(gw, queries, "astar", workers=2)}
+    assert sorted(results) == [0, 1, 2]
+    for i, q in enumerate(queries):
+        start_time = q[2] if len(q) > 2 else 0
+        assert results[i] == agent.plan(q[0], q[1], start_time)[0]
+
+def test_dstar_lite_repairs_around_blocked_cells():
+    grid_data = np.ones((6,6), dtype=int)
+    grid_data[2,1:5] = -1
+    gw = GridWorld(grid_data, [])
+    dstar = search.DStarLite(gw, (0,0), (5,5))
+    path, stats = dstar.plan((0,0))
+    assert path[0] == (0,0) and path[-1] == (5,5)
+    first = stats.nodes_expanded
+    dstar.move_to((1,5))
+    dstar.set_blocked({(2,5)})
+    path, stats = dstar.plan((1,5))
+    assert (2,5) not in path and path[-1] == (5,5)
+    walled = grid_data.copy()
+    walled[2,5] = -1
+    expected, _ = search.astar_time_aware(GridWorld(walled, []), (1,5), (5,5))
+    assert sum(gw.cost(p) for p in path[1:]) == sum(gw.cost(p) for p in expected[1:])
+    assert stats.nodes_expanded > 0 and first > 0
+    dstar.set_blocked(set())
+    path, _ = dstar.plan((1,5))
+    assert path == [(1,5),(2,5),(3,5),(4,5),(5,5)]
+
+def test_dstar_lite_moves_between_changes():
+    # plans from new starts without changes in between must still advance km
+    gw = GridWorld(np.ones((6,6), dtype=int), [])
+    dstar = search.DStarLite(gw, (0,0), (5,5))
+    blocked = set()
+    for step, arg in [("block", (0,3)), ("plan", (0,0)), ("plan", (1,0)), ("block", (4,2)),
+                      ("plan", (3,0)), ("block", (5,3)), ("plan", (4,0))]:
+        if step == "block":
+            blocked.add(arg)
+            dstar.set_blocked(blocked)
+        else:
+            path, _ = dstar.plan(arg)
+    assert path[0] == (4,0) and path[-1] == (5,5) and len(path) - 1 == 8
+    assert not blocked & set(path)
+
+def test_route_cache_hits_and_invalidation():
+    from agent import DeliveryAgent
+    gw = GridWorld(np.ones((5,5), dtype=int), [])
+    agent = DeliveryAgent(gw, cache_size=8)
+    p1, s1 = agent.plan((0,0), (4,4))
+    p2, s2 = agent.plan((0,0), (4,4))
+    assert p1 == p2 and s2.nodes_expanded == 0
+    assert (agent.cache.hits, agent.cache.misses) == (1, 1)
+    # an obstacle elsewhere in space-time keeps the entry
+    gw.add_dynamic_obstacle(DynamicObstacle("far", [(0,4)], start_time=0))
+    agent.plan((0,0), (4,4))
+    assert agent.cache.hits == 2
+    # an obstacle on the cached route at the right time evicts it
+    gw.add_dynamic_obstacle(DynamicObstacle("hit", [p1[2]], start_time=2))
+    p3, _ = agent.plan((0,0), (4,4))
+    assert agent.cache.misses == 2 and not gw.occupied_at(p3[2], 2)
+    # blocking a cell off the route keeps it, blocking one on it evicts it
+    off = next((r, c) for r in range(5) for c in range(5) if (r, c) not in p3)
+    gw.set_cost(off, -1)
+    agent.plan((0,0), (4,4))
+    assert agent.cache.hits == 3
+    gw.set_cost(p3[1], 3)
+    agent.plan((0,0), (4,4))
+    assert agent.cache.misses == 3
+    logs = agent.follow_and_replan((0,0), (4,4))
+    assert "cache_hits" in logs and "cache_misses" in logs
+    # every knob that shapes the route is part of the key
+    arr = np.ones((12,12), dtype=int)
+    arr[2:10, 5] = -1
+    arr[6, 0:4] = 4
+    gw = GridWorld(arr)
+    for algo, knob, values in (("hpa", "cluster_size", (6, 3)), ("wastar", "heuristic", ("manhattan", "field"))):
+        agent = DeliveryAgent(gw, algo=algo, cache_size=8, epsilon=3)
+        for value in values:
+            setattr(agent, knob, value)
+            fresh = DeliveryAgent(gw, algo=algo, epsilon=3, **{knob: value})
+            assert agent.plan((11,0), (0,11))[0] == fresh.plan((11,0), (0,11))[0]
+        assert (agent.cache.hits, agent.cache.misses) == (0, 2)
+
+def test_compact_search_waits_for_passing_obstacle():
+    gw = GridWorld(np.ones((1,3), dtype=int), [DynamicObstacle("car", [(0,1)], start_time=1)])
+    path, _ = search.astar_time_aware(gw, (0,0), (0,2))
+    assert path == []  # no wait action: the only move is blocked at t=1
+    path, stats = search.astar_compact(gw, (0,0), (0,2))
+    assert path == [(0,0),(0,0),(0,1),(0,2)]
+    assert stats.peak_memory > 0
+
+def test_compact_search_matches_astar_cost_without_waits():
+    rng = np.random.default_rng(3)
+    grid_data = rng.integers(1, 4, size=(9,9))
+    grid_data[rng.random((9,9)) < 0.2] = -1
+    grid_data[0,0] = grid_data[8,8] = 1
+    gw = GridWorld(grid_data, [DynamicObstacle("o1", [(1,0),(1,1),(2,1),(2,2)], start_time=0)])
+    p1, _ = search.astar_time_aware(gw, (0,0), (8,8))
+    p2, _ = search.astar_compact(gw, (0,0), (8,8), allow_wait=False)
+    assert sum(gw.cost(p) for p in p1[1:]) == sum(gw.cost(p) for p in p2[1:])
+
+def test_sipp_waits_out_parked_obstacle():
+    grid_data = np.ones((3,5), dtype=int)
+    grid_data[1,:] = -1
+    grid_data[1,2] = 1  # single gap
+    gw = GridWorld(grid_data, [DynamicObstacle("parked", [(1,2)] * 6, start_time=0)])
+    path, stats = search.sipp(gw, (0,2), (2,2))
+    assert path[0] == (0,2) and path[-1] == (2,2)
+    assert len(path) - 1 == 7  # gap clears at t=6, then two moves
+    for t, p in enumerate(path):
+        assert not gw.occupied_at(p, t)
+    compact, _ = search.astar_compact(gw, (0,2), (2,2))
+    assert len(compact) == len(path)
+    assert search.safe_intervals([2, 3, 7]) == [(0, 1), (4, 6), (8, float('inf'))]
+
+def test_jps_and_hierarchical_planner():
+    import hierarchy
+    rng = np.random.default_rng(1)
+    grid_data = np.ones((24,24), dtype=int)
+    grid_data[rng.random((24,24)) < 0.25] = -1
+    grid_data[0,0] = grid_data[23,23] = 1
+    gw = GridWorld(grid_data)
+    ref, _ = search.astar_time_aware(gw, (0,0), (23,23))
+    path, _ = hierarchy.jps(gw, (0,0), (23,23))
+    assert ref and len(path) == len(ref)
+    hpa = hierarchy.HierarchicalPlanner(gw, cluster_size=6)
+    path, _ = hpa.plan((0,0), (23,23))
+    assert path[0] == (0,0) and path[-1] == (23,23)
+    assert all(gw.passable(p) for p in path)
+    # blocking a cell on the route is picked up from the change log
+    gw.set_cost(path[len(path) // 2], -1)
+    rerouted, _ = hpa.plan((0,0), (23,23))
+    assert path[len(path) // 2] not in rerouted
+    assert hpa.intra == hierarchy.HierarchicalPlanner(gw, cluster_size=6).intra
+
+def test_binary_map_roundtrip(tmp_path):
+    grid_data = np.array([[1,2,-1],[1,1,300]])
+    gw = GridWorld(grid_data, [DynamicObstacle("o1", [(0,0),(1,0)], start_time=2)])
+    path = str(tmp_path / "map.gridb")
+    gw.to_binary(path)
+    loaded = GridWorld.from_file(path)
+    assert loaded.grid.dtype == np.int16
+    assert (loaded.grid == grid_data).all()
+    assert loaded.occupied_at((1,0), 3)
+    loaded.set_cost((0,0), 7)  # copy-on-write: the file is untouched
+    assert GridWorld.from_binary(path, mmap=False).cost((0,0)) == 1
+    small = GridWorld(np.array([[1,2],[3,-1]]))
+    small.to_binary(path)
+    narrow = GridWorld.from_binary(path)
+    assert narrow.grid.dtype == np.int8
+    narrow.set_cells([(0,0), (0,1)], [200, 70000])  # would wrap in int8
+    assert narrow.cost((0,0)) == 200 and narrow.cost((0,1)) == 70000 and narrow.grid.dtype == np.int32
+    assert narrow.compile().cost_list[:2] == [200, 70000]
+
+def test_search_profile_and_metrics_export(tmp_path):
+    import json
+    from agent import DeliveryAgent, write_metrics
+    rng = np.random.default_rng(4)
+    grid_data = rng.integers(1, 4, size=(8,8))
+    gw = GridWorld(grid_data, [DynamicObstacle("o1", [(1,0),(1,1),(1,2)], start_time=0)])
+    plain, stats = search.ucs_time_aware(gw, (0,0), (7,7))
+    assert stats.profile is None
+    path, stats = search.ucs_time_aware(gw, (0,0), (7,7), profile=True)
+    prof = stats.profile
+    assert path == plain
+    assert prof.nodes_generated == prof.peak_closed
+    assert stats.nodes_expanded <= prof.nodes_generated
+    assert prof.total_ns >= prof.occupied_ns + prof.neighbors_ns + prof.frontier_ns
+    logs = DeliveryAgent(gw, algo="astar", profile=True).follow_and_replan((0,0), (7,7))
+    assert logs["profile"]["nodes_generated"] > 0
+    out = tmp_path / "metrics.jsonl"
+    write_metrics(logs, str(out), map="test")
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert records[-1]["kind"] == "run" and records[0]["map"] == "test"
+    assert "profile.occupied_ns" in records[0]
+
+def test_cooperative_planner_paths_do_not_conflict():
+    from multiagent import AgentTask, CooperativePlanner, find_conflicts
+    gw = GridWorld(np.ones((6,6), dtype=int), [DynamicObstacle("o1", [(2,2),(2,3),(2,4)], start_time=1)])
+    tasks = [AgentTask("a", (0,0), (5,5)), AgentTask("b", (5,5), (0,0)), AgentTask("c", (0,5), (5,0)),
+             AgentTask("d", (5,0), (0,5), start_time=2), AgentTask("e", (2,0), (2,5))]
+    planner = CooperativePlanner(gw, time_budget=5)
+    paths, stats = planner.plan(tasks)
+    assert not planner.failed and not planner.skipped
+    assert find_conflicts(paths, {"d": 2}) == []
+    for a in tasks:
+        assert paths[a.id][0] == a.start and paths[a.id][-1] == a.goal
+        for i, p in enumerate(paths[a.id]):
+            assert not gw.occupied_at(p, a.start_time + i)
+
+def test_search_deadline_and_planning_service():
+    import asyncio
+    from service import PlanningService
+    from agent import DeliveryAgent
+    gw = GridWorld(np.ones((20,20), dtype=int))
+    path, stats = search.astar_time_aware(gw, (0,0), (19,19), time_budget=0, partial=True)
+    assert stats.timed_out and path == [(0,0)]
+    path, stats = search.astar_time_aware(gw, (0,0), (19,19), time_budget=0)
+    assert stats.timed_out and path == []
+    full, _ = search.astar_time_aware(gw, (0,0), (19,19))
+
+    async def run():
+        async with PlanningService(gw, workers=2, processes=False) as svc:
+            results = await asyncio.gather(*(svc.plan((0,0), (19,19)) for _ in range(3)),
+                                           svc.plan((0,0), (19,19), start_time=1, deadline=0))
+            return results, svc.coalesced
+    results, coalesced = asyncio.run(run())
+    assert coalesced == 2
+    assert [p for p, _ in results[:3]] == [full] * 3
+    assert results[3][0] == [] and results[3][1].timed_out
+
+    async def run_with_deadlines():
+        async with PlanningService(gw, workers=2, processes=False, default_deadline=5) as svc:
+            results = await asyncio.gather(*(svc.plan((0,0), (19,19)) for _ in range(4)),
+                                           svc.plan((0,0), (19,19), deadline=1))
+            return results, svc.coalesced
+    results, coalesced = asyncio.run(run_with_deadlines())
+    assert coalesced == 4  # equal deadlines share, and a looser search serves a tighter one
+    assert [p for p, _ in results] == [full] * 5
+
+    # thread workers share the grid's field/heuristic caches; churn their LRUs from several threads
+    arr = np.ones((20,20), dtype=int)
+    arr[5:15, 8] = -1
+    arr[3:7, 3:17] = 3
+    goals = [(r, c) for r in (0, 10, 19) for c in range(0, 20, 2) if arr[r, c] != -1]
+    for kind, compiled in (("field", False), ("alt", True)):
+        tw = GridWorld(arr)
+        tw.distance_field_cache_size = 2
+        serial = DeliveryAgent(GridWorld(arr), heuristic=kind, compiled=compiled)
+        expected = [serial.plan((19,0), g)[0] for g in goals]
+
+        async def run_threads():
+            async with PlanningService(tw, workers=4, processes=False, heuristic=kind, compiled=compiled) as svc:
+                return await asyncio.gather(*(svc.plan((19,0), g) for g in goals))
+        assert [p for p, _ in asyncio.run(run_threads())] == expected
+
+def test_weighted_astar_and_ara_bounds():
+    from agent import DeliveryAgent
+    rng = np.random.default_rng(7)
+    grid_data = rng.integers(1, 5, size=(15,15))
+    gw = GridWorld(grid_data, [DynamicObstacle("o1", [(3,c) for c in range(10)], start_time=0)])
+    cost = lambda p: sum(gw.cost(x) for x in p[1:])
+    opt, stats = search.astar_time_aware(gw, (0,0), (14,14))
+    assert stats.suboptimality == 1.0
+    path, stats = search.astar_time_aware(gw, (0,0), (14,14), weight=2.0)
+    assert path[-1] == (14,14) and cost(path) <= 2.0 * cost(opt) and stats.suboptimality == 2.0
+    path, stats = search.ara_star(gw, (0,0), (14,14), epsilon=3.0)
+    assert cost(path) == cost(opt) and stats.suboptimality == 1.0
+    path, stats = DeliveryAgent(gw, algo="ara", epsilon=2.5, time_budget=0).plan((0,0), (14,14))
+    assert stats.timed_out and (path == [] or cost(path) <= stats.suboptimality * cost(opt))
+    # out of budget in the first round, after the goal was reached: the incumbent is still returned
+    for algo in ("wastar", "ara"):  # field h for bounded searches: the uninflated cost-to-go
+        path, stats = DeliveryAgent(gw, algo=algo, heuristic="field", epsilon=1.2).plan((0,0), (14,14))
+        assert cost(path) <= stats.suboptimality * cost(opt)
+    field = search.FieldHeuristic(gw, (14,14))
+    assert field.exact((0,0)) == gw.distance_field((14,14))[0,0] < field((0,0))
+    for algo in ("astar", "wastar", "ara"):
+        path, stats = DeliveryAgent(gw, algo=algo, epsilon=2.5).plan((5,5), (5,5))
+        assert path == [(5,5)]  # start == goal: no round trip
+    assert stats.suboptimality == 1.0
+    path, stats = search.ara_star(gw, (0,0), (14,14), epsilon=3.0, max_expansions=40)
+    assert stats.timed_out and path[-1] == (14,14)
+    assert 1.0 < stats.suboptimality < 3.0 and cost(path) <= stats.suboptimality * cost(opt)
+
+def test_local_repair_detours_and_rejoins_plan():
+    import pytest
+    from agent import DeliveryAgent
+    gw = GridWorld(np.ones((7,7), dtype=int))
+    plan, _ = search.astar_time_aware(gw, (3,0), (3,6))
+    assert plan == [(3,c) for c in range(7)]
+    # a surprise parks on the plan two steps ahead while the agent is at (3,1), t=1
+    gw.add_dynamic_obstacle(DynamicObstacle("s", [(3,2)] * 3, start_time=2))
+    repaired, stats = search.local_repair(gw, plan, 1, 1, radius=2)
+    assert repaired[0] == (3,1) and repaired[-1] == (3,6)
+    assert repaired[-3:] == plan[-3:]  # rejoined the original plan
+    assert all(not gw.occupied_at(p, 1 + i) for i, p in enumerate(repaired))
+    assert all(search.manhattan(a, b) <= 1 for a, b in zip(repaired, repaired[1:]))
+    logs = DeliveryAgent(gw).follow_and_replan((3,0), (3,6), dynamic_unpredictable=True)
+    assert logs["success"]
+    with pytest.raises(ValueError):
+        DeliveryAgent(gw, replanner="hill")  # rejected up front, not at the first surprise
+
+def test_periodic_obstacles_are_compact_and_respected(tmp_path):
+    import json
+    loop = {"id": "bus", "path": [[2,1],[2,2],[2,3],[2,2]], "loop": True}
+    shuttle = {"id": "shuttle", "path": [[1,4],[2,4],[3,4]], "start_time": 5, "period": 10, "end_time": 500}
+    dyn = tmp_path / "dyn.json"
+    dyn.write_text(json.dumps({"moving_obstacles": [loop, shuttle]}))
+    map_file = tmp_path / "map.txt"
+    np.savetxt(map_file, np.ones((6,6), dtype=int), fmt="%d")
+    gw = GridWorld.from_file(str(map_file), str(dyn))
+    bus, sh = gw.dynamic_obstacles
+    assert bus.period == 4 and len(bus.path) == 4
+    assert gw.reservations.horizon == float('inf') and not gw.reservations.cells
+    assert bus.position_at(10**6 + 1) == (2,2) and gw.occupied_at((2,2), 10**6 + 1)
+    assert gw.occupied_at((2,4), 496) and not gw.occupied_at((2,4), 497) and not gw.occupied_at((2,4), 506)
+    # every planner avoids the loops, even far into the schedule
+    for t0 in (0, 100003):
+        for path, _ in (search.astar_time_aware(gw, (0,2), (5,3), t0), search.astar_compiled(gw.compile(), (0,2), (5,3), t0),
+                        search.astar_compact(gw, (0,2), (5,3), t0), search.sipp(gw, (0,2), (5,3), t0)):
+            assert path[-1] == (5,3)
+            assert all(not gw.occupied_at(p, t0 + i) for i, p in enumerate(path))
+    binary = str(tmp_path / "map.gridb")
+    gw.to_binary(binary)
+    again = GridWorld.from_file(binary)
+    assert [o.to_json() for o in again.dynamic_obstacles] == [o.to_json() for o in gw.dynamic_obstacles]
+
+def test_streaming_simulation_with_surprises(tmp_path):
+    import json
+    from agent import DeliveryAgent
+    from simulation import SurpriseGenerator, simulate, EventLog
+    gw = GridWorld(np.ones((12,12), dtype=int))
+    agent = DeliveryAgent(gw)
+    goals = iter([(0,0), (11,0)])
+    log = EventLog(str(tmp_path / "events.jsonl"), steps=False)
+    for ev in simulate(agent, [("v1", (0,0), (11,11)), ("v2", (11,11), (0,11))], SurpriseGenerator(rate=0.5, seed=3),
+                       next_goal=lambda aid, pos, t: next(goals, None), prune_every=8):
+        if ev["event"] == "step":
+            assert not gw.occupied_at(ev["pos"], ev["t"])
+        log.write(ev)
+    log.close()
+    s = log.summary
+    assert s["deliveries"] == 4 and s["failures"] == 0 and s["surprises"] > 0
+    records = [json.loads(line) for line in (tmp_path / "events.jsonl").read_text().splitlines()]
+    assert len(records) == s["plans"] + s["surprises"] + 4 and not any(r["e"] == "step" for r in records)
+    assert len(gw.dynamic_obstacles) < s["surprises"]  # expired surprises were pruned
+    # same seed, same run
+    a = DeliveryAgent(GridWorld(np.ones((12,12), dtype=int))).follow_and_replan((0,0), (11,11), surprises=SurpriseGenerator(0.5, seed=3))
+    b = DeliveryAgent(GridWorld(np.ones((12,12), dtype=int))).follow_and_replan((0,0), (11,11), surprises=SurpriseGenerator(0.5, seed=3))
+    assert a["success"] and a["final_path"] == b["final_path"] and a["surprises"] == b["surprises"] > 0
+
+def test_vectorized_renderer(tmp_path):
+    import render
+    from agent import DeliveryAgent
+    from simulation import SurpriseGenerator, simulate
+    from PIL import Image
+    arr = np.ones((6,6), dtype=int)
+    arr[2,1:4] = -1
+    arr[4,4] = 3
+    gw = GridWorld(arr, [DynamicObstacle("bus", [(0,5),(1,5),(2,5)], start_time=1)])
+    text = render.ascii_frame(gw, (0,0), (5,5), {(1,5), (2,2)})
+    assert text.splitlines()[1] == ". . . . . X "
+    assert text.splitlines()[2] == ". # # # . . " and text.splitlines()[4][8] == "3"
+    frame = render.render_frame(gw, [(0,0),(1,0)], t=2, agents=[(0,0)], goal=(5,5), scale=2)
+    assert frame.shape == (12,12,3) and frame.dtype == np.uint8
+    assert tuple(frame[0,0]) == render.AGENT and tuple(frame[2,0]) == render.PATH
+    assert tuple(frame[4,2]) == render.WALL and tuple(frame[2,10]) == render.OBSTACLE
+    assert tuple(frame[0,10]) == render.TRAIL and tuple(frame[10,10]) == render.GOAL
+    # a recorded run becomes one GIF frame per timestep
+    rec = render.FrameRecorder()
+    agent = DeliveryAgent(gw)
+    events = list(rec.tap(simulate(agent, [("v", (0,0), (5,0))], SurpriseGenerator(rate=0.5, seed=1))))
+    steps = sum(ev["event"] == "step" for ev in events)
+    out = str(tmp_path / "run.gif")
+    assert render.export_animation(gw, rec, out, start={"v": (0,0)}, scale=3) == steps + 1
+    assert Image.open(out).size == (18,18)
+
+def test_sweep_checkpoint_resume(tmp_path):
+    import sweep
+    (tmp_path / "map.txt").write_text("1 1 1\n1 -1 1\n1 1 1\n")
+    spec = {"map": [{"file": str(tmp_path / "map.txt"), "start": [0,0], "goal": [2,2]}],
+            "algo": ["bfs", "astar", "nope"], "planning_horizon": [10, 50]}
+    assert len(sweep.expand(spec)) == 6
+    ckpt = str(tmp_path / "sweep.jsonl")
+    # interrupted after two cells
+    for i, _ in enumerate(sweep.run_sweep(spec, ckpt, workers=1)):
+        if i == 1:
+            break
+    with open(ckpt, "a") as f:
+        f.write('{"key": "torn')
+    records = list(sweep.run_sweep(spec, ckpt, workers=2))
+    assert len(records) == 6 and len({r["key"] for r in records}) == 6
+    assert len(open(ckpt).read().splitlines()) == 2 + 1 + 4  # only the missing cells ran again
+    cols = sweep.save_results(records, str(tmp_path / "out.npz"))
+    again = sweep.load_results(str(tmp_path / "out.npz"))
+    assert again["nodes"].dtype == np.int64 and list(again["algo"]) == list(cols["algo"])
+    ok = again["error"] == ""
+    assert ok.sum() == 4 and again["success"][ok].all() and (again["path_len"][ok] == 4).all()
+    algos, horizons, table = sweep.pivot(again, "algo", "planning_horizon", "path_len")
+    assert list(algos) == ["astar", "bfs", "nope"] and table.shape == (3, 2)
+
+def test_terrain_aware_heuristics():
+    import heuristics
+    from agent import DeliveryAgent
+    from benchmarks.heuristics import terrain_map
+    gw = GridWorld(terrain_map(30, 0.15, 1))
+    gw.grid[0,0] = gw.grid[29,29] = gw.grid[5,20] = 3
+    exact = gw.distance_field((29,29))
+    for kind in ("scaled", "alt", "differential"):
+        h = heuristics.for_goal(gw, kind, (29,29))
+        flat = np.array(h.flat).reshape(30, 30)
+        ok = np.isfinite(exact)
+        assert (flat[ok] <= exact[ok] + 1e-9).all()  # admissible
+        assert h((0,0), (29,29)) == flat[0,0] >= 2 * 58  # at least min cost x manhattan
+    scaled = heuristics.get(gw, "scaled")
+    h = heuristics.for_goal(gw, "scaled", (3,4))
+    assert h((0,0)) == 2 * 7 and (3,4) not in scaled._goals  # per-state queries build no table
+    assert h.flat is h.flat and (3,4) in scaled._goals
+    alt = heuristics.get(gw, "alt", landmarks=8)
+    assert heuristics.get(gw, "alt", landmarks=8) is alt and len(alt.landmarks) == 8
+    results = {}
+    for kind in ("manhattan", "scaled", "alt", "differential", "field"):
+        for compiled in (False, True):
+            agent = DeliveryAgent(gw, heuristic=kind, compiled=compiled, planning_horizon=200)
+            path, stats = agent.plan((0,0), (29,29))
+            results[kind, compiled] = (sum(gw.cost(p) for p in path[1:]), stats.nodes_expanded)
+    assert len({cost for cost, _ in results.values()}) == 1  # every heuristic finds an optimal route
+    assert results["alt", False][1] < results["scaled", False][1] < results["manhattan", False][1]
+    gw.set_cost((5,20), 1)  # terrain changed: the tables are patched in place
+    assert heuristics.get(gw, "alt", landmarks=8) is alt and alt.version == gw.version
+
+def test_incremental_grid_mutations():
+    import pytest
+    import heuristics
+    from grid import CompiledGrid, _relax_distance_field
+    from agent import DeliveryAgent
+    gw = GridWorld(np.full((12, 12), 2))
+    cg = gw.compile()
+    field = gw.distance_field((11,11))
+    alt = heuristics.get(gw, "alt", landmarks=4)
+    agent = DeliveryAgent(gw, planning_horizon=100, cache_size=8)
+    agent.plan((0,0), (11,11))
+    dstar = search.DStarLite(gw, (0,0), (11,11))
+    dstar.plan((0,0))
+    v = gw.version
+    with gw.batch():
+        gw.set_rect((0,5), (10,5), -1)   # a wall with a gap at the bottom
+        gw.set_rect((2,2), (3,3), 7)
+        gw.unblock([(4,5), (0,0)])       # reopens only the wall cell
+        gw.set_cells([(2,2)], 1)
+    changes = gw.changes_since(v)
+    assert gw.version == v + 1 and len(changes) == 1 and changes[0].region == (0, 2, 10, 5)
+    cells = dict(zip(changes[0].cells, zip(changes[0].old, changes[0].new)))
+    assert cells[(2,2)] == (2, 1) and cells[(4,5)] == (2, 1) and (0,0) not in cells
+    fresh = CompiledGrid(gw)
+    assert gw.compile() is cg and cg.cost_list == fresh.cost_list
+    assert cg.adjacency == fresh.adjacency and np.array_equal(cg.nbr_ids, fresh.nbr_ids)
+    assert gw.distance_field((11,11)) is not field
+    assert np.array_equal(gw.distance_field((11,11)), _relax_distance_field(gw.grid, [(11,11)]))
+    assert heuristics.get(gw, "alt", landmarks=4) is alt
+    for k, lm in enumerate(alt.landmarks):
+        assert np.array_equal(alt.dist[k], _relax_distance_field(gw.grid, [lm]).ravel())
+    path, _ = agent.plan((0,0), (11,11))  # the cached route crossed the new wall
+    assert agent.cache.invalidations >= 1 and all(gw.cost(p) != -1 for p in path)
+    d_path, _ = dstar.plan((0,0))
+    cost = lambda p: sum(gw.cost(q) for q in p[1:])
+    assert cost(d_path) == cost(path) == gw.distance_field((11,11))[0,0]
+    with pytest.raises(ValueError):
+        gw.set_cells([(1,1)], 0)
+    for bad in (lambda: gw.set_cells([(-1,0)], -1), lambda: gw.block([(0,12)]),
+                lambda: gw.set_rect((10,10), (12,11), 3), lambda: gw.unblock([(-1,-1)])):
+        with pytest.raises(ValueError):
+            bad()
+    assert gw.version == v + 1 and (gw.grid[-1] != -1).all() and not gw._pending